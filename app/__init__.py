@@ -7,6 +7,16 @@ def create_app() -> Flask:
     app = Flask(__name__)
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['DATABASE'] = 'app.db'
+    # Ожидание блокировки записи (секунды): с потоковыми воркерами писателей больше
+    app.config['DATABASE_TIMEOUT'] = float(os.environ.get('DATABASE_TIMEOUT', '5'))
+    
+    # Реплика для тяжелых чтений (если настроена)
+    from app import db
+    db.init_app(app)
+    
+    # Применяем изменения схемы к существующей БД
+    from app.schema import upgrade_database
+    upgrade_database(app.config['DATABASE'])
     
     # Безопасная обработка static_folder
     static_folder = app.static_folder or 'static'
@@ -19,6 +29,62 @@ def create_app() -> Flask:
     login_manager.login_message = 'Пожалуйста, войдите в систему'
     login_manager.login_message_category = 'info'
     
+    # Ограничение частоты попыток входа
+    from app import ratelimit
+    ratelimit.init_app(app)
+    
+    # Кеш байткода шаблонов
+    from app import templating
+    templating.init_app(app)
+    
+    # Кеш фрагментов шаблонов (сетки каталога и т.п.)
+    from app import cache
+    cache.init_app(app)
+    
+    # Пул для блокирующих операций (хеширование паролей, сборка XLSX)
+    from app import blocking
+    blocking.init_app(app)
+    
+    # Фоновые задачи
+    from app import jobs
+    jobs.init_app(app)
+    
+    # Снимок каталога и изменения для кеша в браузере
+    from app import catalogue
+    catalogue.init_app(app)
+    
+    # Мягкое удаление и очистка помеченных записей
+    from app import cleanup
+    cleanup.init_app(app)
+    
+    # PDF заявок и листов сборки
+    from app import pdf
+    pdf.init_app(app)
+    
+    # Собранная статика с хешами в именах
+    from app import assets
+    assets.init_app(app)
+    
+    # Сводные таблицы спроса
+    from app import analytics
+    analytics.init_app(app)
+    
+    # Перенос завершенных заявок в заказы
+    from app import orders
+    orders.init_app(app)
+    
+    # Статистика планировщика и каталог планов запросов
+    from app import planner
+    planner.init_app(app)
+    
+    # Резервные копии и обслуживание БД
+    from app import backups
+    backups.init_app(app)
+    
+    # Лента изменений заявок (SSE)
+    from app import events
+    events.init_app(app)
+    
     from app.models import User
     
     @login_manager.user_loader
@@ -30,11 +96,13 @@ def create_app() -> Flask:
     from app.routes.admin import admin_bp
     from app.routes.supplier import supplier_bp
     from app.routes.main import main_bp
+    from app.routes.api import api_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(supplier_bp, url_prefix='/supplier')
     app.register_blueprint(main_bp)
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
     
     # Обработка закрытия БД
     from app.models import close_db
@@ -43,4 +111,8 @@ def create_app() -> Flask:
     def close_db_error(error: Optional[BaseException]) -> None:
         close_db(error)
     
+    # Прогрев шаблонов, чтобы первый запрос после рестарта воркера не ждал загрузки
+    if app.config['JINJA_WARMUP']:
+        templating.warm_templates(app)
+    
     return app
\ No newline at end of file
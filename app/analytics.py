@@ -0,0 +1,142 @@
+"""Аналитика спроса по сводной таблице demand_daily.
+
+demand_daily хранит спрос по товару, торговому и дню (сумма количества
+и число позиций заявок, включая заявки, перенесенные в заказы). Таблица
+поддерживается триггерами на request_items (см. schema.py), поэтому
+отчеты не сканируют позиции заявок. Для сверки и восстановления есть `flask rebuild-analytics`
+(можно запускать по cron).
+"""
+import sqlite3
+import time
+import click
+from datetime import datetime, timedelta, timezone
+from flask import Flask
+from typing import Any, Dict, List, Optional, Tuple
+from app.models import get_db
+
+# Заявки, перенесенные в заказы, учитываются по order_items (дата - дата заявки)
+REBUILD_SQL = '''
+    DELETE FROM demand_daily;
+    INSERT INTO demand_daily (product_id, supplier_id, day, quantity, lines)
+    SELECT product_id, supplier_id, day, SUM(quantity), COUNT(*)
+    FROM (
+        SELECT ri.product_id, r.supplier_id, date(r.created_at) as day, ri.quantity
+        FROM request_items ri
+        JOIN requests r ON r.id = ri.request_id
+        UNION ALL
+        SELECT oi.product_id, o.supplier_id, date(o.created_at), oi.quantity
+        FROM order_items oi
+        JOIN orders o ON o.id = oi.order_id
+        WHERE o.request_id IS NOT NULL
+    )
+    GROUP BY product_id, supplier_id, day;
+'''
+
+
+def rebuild_demand_rollup(conn: sqlite3.Connection) -> int:
+    """Пересчитать demand_daily из request_items в одной транзакции"""
+    try:
+        conn.executescript(f'BEGIN IMMEDIATE; {REBUILD_SQL} COMMIT;')
+        # Таблица пересоздана целиком - статистику планировщика обновляем сразу
+        conn.execute('ANALYZE demand_daily')
+        conn.commit()
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    return conn.execute('SELECT COUNT(*) FROM demand_daily').fetchone()[0]
+
+
+def _range_sql(date_from: Optional[str], date_to: Optional[str]) -> Tuple[str, List[Any]]:
+    conditions, params = [], []
+    if date_from:
+        conditions.append('d.day >= ?')
+        params.append(date_from)
+    if date_to:
+        conditions.append('d.day <= ?')
+        params.append(date_to)
+    return (' AND '.join(conditions) or '1 = 1'), params
+
+
+def product_demand(product_id: int) -> Dict[str, int]:
+    """Число заявок и общее количество по товару"""
+    # Без реплики: страница товара кешируется по ETag из версий основной БД
+    row = get_db().execute(
+        '''SELECT COALESCE(SUM(lines), 0) as requests_count, COALESCE(SUM(quantity), 0) as total_quantity
+           FROM demand_daily WHERE product_id = ?''',
+        (product_id,)
+    ).fetchone()
+    return dict(row)
+
+
+def top_products(limit: int = 10, date_from: Optional[str] = None,
+                 date_to: Optional[str] = None, supplier_id: Optional[int] = None) -> List[Any]:
+    """Самые востребованные товары за период"""
+    where, params = _range_sql(date_from, date_to)
+    if supplier_id:
+        where += ' AND d.supplier_id = ?'
+        params.append(supplier_id)
+    return get_db(readonly=True).execute(
+        f'''SELECT p.id, p.name, c.name as category_name,
+                   SUM(d.quantity) as total_quantity, SUM(d.lines) as requests_count
+            FROM demand_daily d
+            JOIN products p ON p.id = d.product_id
+            LEFT JOIN categories c ON c.id = p.category_id
+            WHERE {where}
+            GROUP BY p.id, c.id
+            ORDER BY total_quantity DESC
+            LIMIT ?''',
+        (*params, limit)
+    ).fetchall()
+
+
+def demand_trend(days: int = 30, product_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Спрос по дням за последние days дней (дни без заявок - нули)"""
+    # Дни demand_daily - date(created_at), то есть по UTC (CURRENT_TIMESTAMP), а не по часам сервера
+    start = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+    where, params = _range_sql(start.isoformat(), None)
+    if product_id:
+        where += ' AND d.product_id = ?'
+        params.append(product_id)
+    totals = {
+        row['day']: row for row in get_db(readonly=True).execute(
+            f'''SELECT d.day, SUM(d.quantity) as quantity, SUM(d.lines) as lines
+                FROM demand_daily d WHERE {where} GROUP BY d.day''',
+            params
+        )
+    }
+    trend = []
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).isoformat()
+        row = totals.get(day)
+        trend.append({'day': day, 'quantity': row['quantity'] if row else 0,
+                      'lines': row['lines'] if row else 0})
+    return trend
+
+
+def supplier_volume(date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Any]:
+    """Объем заявок по торговым за период"""
+    where, params = _range_sql(date_from, date_to)
+    return get_db(readonly=True).execute(
+        f'''SELECT s.id, s.name, SUM(d.quantity) as total_quantity, SUM(d.lines) as lines,
+                   COUNT(DISTINCT d.product_id) as products_count
+            FROM demand_daily d
+            JOIN suppliers s ON s.id = d.supplier_id
+            WHERE {where}
+            GROUP BY s.id
+            ORDER BY total_quantity DESC''',
+        params
+    ).fetchall()
+
+
+def init_app(app: Flask) -> None:
+    @app.cli.command('rebuild-analytics')
+    def rebuild_analytics_command() -> None:
+        """Пересчитать сводные таблицы спроса из позиций заявок"""
+        conn = sqlite3.connect(app.config['DATABASE'], timeout=30)
+        try:
+            started = time.perf_counter()
+            rows = rebuild_demand_rollup(conn)
+            click.echo(f'demand_daily: {rows} строк за {(time.perf_counter() - started) * 1000:.0f} мс')
+        finally:
+            conn.close()
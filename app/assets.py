@@ -0,0 +1,183 @@
+"""Сборка статических файлов: бандлы, минификация, хеши в именах и
+предварительное сжатие (.gz/.br) для gzip_static в nginx.
+
+Результат сборки лежит в static/dist, соответствие логических имен и
+файлов с хешем хранится в static/dist/manifest.json. Шаблоны получают
+URL через asset_url(), который принимает те же аргументы, что url_for.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import click
+from flask import Flask, current_app, url_for
+from typing import Any, Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # .br собираются только при установленном пакете brotli
+    brotli = None
+
+# Логическое имя бандла -> исходные файлы относительно static/
+BUNDLES: Dict[str, List[str]] = {
+    'css/app.css': ['css/style.css'],
+    'js/app.js': ['js/main.js'],
+    'js/create_request.js': ['js/pages/catalogue_cache.js', 'js/pages/create_request.js'],
+    'js/edit_request.js': ['js/pages/edit_request.js'],
+    'js/request_detail.js': ['js/pages/request_detail.js'],
+    'js/request_feed.js': ['js/pages/request_feed.js'],
+}
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+COMPRESS_MIN_SIZE = 1024
+
+
+def minify_js(source: str) -> str:
+    """Консервативная минификация: отступы, пустые строки и строки-комментарии.
+
+    Переводы строк сохраняются, поэтому автоматическая расстановка точек
+    с запятой в JS не ломается.
+    """
+    lines = []
+    for line in source.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('//'):
+            continue
+        lines.append(stripped)
+    return '\n'.join(lines) + '\n'
+
+
+def minify_css(source: str) -> str:
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    return source.replace(';}', '}').strip() + '\n'
+
+
+def _write_compressed(path: str, data: bytes) -> None:
+    if len(data) < COMPRESS_MIN_SIZE:
+        return
+    with open(path + '.gz', 'wb') as f:
+        # mtime=0: одинаковый результат при повторной сборке
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=9, mtime=0) as gz:
+            gz.write(data)
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build_assets(static_folder: str) -> Dict[str, str]:
+    """Собрать все бандлы и записать манифест"""
+    dist_dir = os.path.join(static_folder, DIST_DIR)
+    manifest_path = os.path.join(dist_dir, MANIFEST_NAME)
+    previous = _read_manifest(manifest_path) or {}
+
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+                parts.append(f.read())
+        content = '\n'.join(parts)
+        content = minify_css(content) if name.endswith('.css') else minify_js(content)
+        data = content.encode('utf-8')
+
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        base, ext = os.path.splitext(name)
+        hashed_name = f'{DIST_DIR}/{base}.{digest}{ext}'
+        path = os.path.join(static_folder, hashed_name)
+        if not os.path.exists(path):
+            # Временное имя с pid: сборку могут одновременно запустить несколько воркеров
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            _write_compressed(tmp_path, data)
+            for suffix in ('.gz', '.br'):
+                if os.path.exists(tmp_path + suffix):
+                    os.replace(tmp_path + suffix, path + suffix)
+            os.replace(tmp_path, path)
+        manifest[name] = hashed_name
+
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+    # Файлы предыдущей сборки оставляем для воркеров, которые еще не перезапущены
+    _prune(static_folder, set(manifest.values()) | set(previous.values()))
+    return manifest
+
+
+def _prune(static_folder: str, keep: set) -> None:
+    dist_dir = os.path.join(static_folder, DIST_DIR)
+    for root, _, files in os.walk(dist_dir):
+        for filename in files:
+            path = os.path.join(root, filename)
+            relative = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            if filename == MANIFEST_NAME or '.tmp' in filename:
+                continue
+            if re.sub(r'\.(gz|br)$', '', relative) not in keep:
+                os.remove(path)
+
+
+def _read_manifest(path: str) -> Optional[Dict[str, str]]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _sources_mtime(static_folder: str) -> float:
+    return max(
+        os.path.getmtime(os.path.join(static_folder, source))
+        for sources in BUNDLES.values() for source in sources
+    )
+
+
+def get_manifest() -> Dict[str, str]:
+    """Манифест сборки; при отсутствии (или изменении исходников в debug) собирается заново"""
+    app = current_app._get_current_object()
+    manifest = app.extensions.get('asset_manifest')
+    static_folder = app.static_folder or 'static'
+    manifest_path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+
+    if manifest is not None and not app.debug:
+        return manifest
+
+    if manifest is None:
+        manifest = _read_manifest(manifest_path)
+    if manifest is None or set(manifest) != set(BUNDLES) or (
+            app.debug and _sources_mtime(static_folder) > os.path.getmtime(manifest_path)):
+        manifest = build_assets(static_folder)
+
+    app.extensions['asset_manifest'] = manifest
+    return manifest
+
+
+def asset_url(endpoint: str, **values: Any) -> str:
+    """url_for с подстановкой собранного файла с хешем в имени"""
+    if endpoint == 'static':
+        hashed = get_manifest().get(values.get('filename', ''))
+        if hashed:
+            values['filename'] = hashed
+    return url_for(endpoint, **values)
+
+
+def init_app(app: Flask) -> None:
+    app.jinja_env.globals['asset_url'] = asset_url
+
+    @app.cli.command('build-assets')
+    def build_assets_command() -> None:
+        """Собрать бандлы статики с хешами в именах и сжатыми копиями"""
+        static_folder = app.static_folder or 'static'
+        manifest = build_assets(static_folder)
+        for name, hashed_name in sorted(manifest.items()):
+            path = os.path.join(static_folder, hashed_name)
+            sizes = [os.path.getsize(p) for p in (path, path + '.gz', path + '.br') if os.path.exists(p)]
+            click.echo(f'{name:<28} -> {hashed_name:<44} ' + ' / '.join(f'{size} B' for size in sizes))
+        if brotli is None:
+            click.echo('Пакет brotli не установлен: .br файлы не созданы')
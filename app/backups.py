@@ -0,0 +1,189 @@
+"""Резервные копии и обслуживание SQLite без остановки приложения.
+
+Копия снимается backup API по N страниц за шаг с паузами между шагами:
+блокировка на чтение держится только на время шага, и запись из воркеров
+не ждет. Если БД меняется во время копирования, SQLite начинает копию
+заново; после нескольких перезапусков копия снимается за один шаг (в WAL
+это одна транзакция чтения, запись она тоже не блокирует).
+
+Команды (cron, см. SERVER_COMMANDS.md):
+    flask backup-db [--vacuum] [--keep 14]   копия + проверка + ротация
+    flask check-db [ФАЙЛ]                     проверка целостности
+    flask analyze-db                          обновление статистики планировщика
+"""
+import glob
+import os
+import sqlite3
+import time
+import click
+from datetime import datetime
+from flask import Flask
+from typing import Any, Dict, List
+
+BACKUP_PREFIX = 'app-'
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def backup_database(source: str, dest: str, pages: int = 256, pause: float = 0.05,
+                    max_restarts: int = 3, timeout: float = 30) -> Dict[str, Any]:
+    """Копия source в dest через backup API с паузами между шагами"""
+    started = time.perf_counter()
+    restarts = 0
+    state = {'remaining': None}
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        nonlocal restarts
+        # Остаток вырос - SQLite начал копию заново из-за записи в источник
+        if state['remaining'] is not None and remaining > state['remaining']:
+            restarts += 1
+            if restarts > max_restarts:
+                raise _TooManyRestarts()
+        state['remaining'] = remaining
+        time.sleep(pause)
+
+    src = sqlite3.connect(source, timeout=timeout)
+    dst = sqlite3.connect(dest)
+    try:
+        try:
+            src.backup(dst, pages=pages, progress=progress)
+        except _TooManyRestarts:
+            src.backup(dst)
+        dst.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        dst.close()
+        src.close()
+    return {'path': dest, 'size': os.path.getsize(dest), 'restarts': restarts,
+            'seconds': time.perf_counter() - started}
+
+
+def vacuum_into(source: str, dest: str, timeout: float = 30) -> Dict[str, Any]:
+    """Сжатая копия (VACUUM INTO): без пустых страниц, с перестроенными индексами"""
+    started = time.perf_counter()
+    conn = sqlite3.connect(source, timeout=timeout)
+    try:
+        conn.execute('VACUUM INTO ?', (dest,))
+    finally:
+        conn.close()
+    return {'path': dest, 'size': os.path.getsize(dest), 'restarts': 0,
+            'seconds': time.perf_counter() - started}
+
+
+def check_integrity(path: str, quick: bool = False) -> List[str]:
+    """Ошибки целостности файла БД (пустой список - все в порядке)"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        pragma = 'quick_check' if quick else 'integrity_check'
+        problems = [row[0] for row in conn.execute(f'PRAGMA {pragma}')]
+    finally:
+        conn.close()
+    return [problem for problem in problems if problem != 'ok']
+
+
+def foreign_key_violations(path: str) -> Dict[str, int]:
+    """Число строк со ссылками на несуществующие записи по таблицам.
+
+    Это не повреждение файла: такие строки остались от старых физических
+    удалений (до мягкого удаления), копия с ними годна для восстановления.
+    """
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        violations: Dict[str, int] = {}
+        for row in conn.execute('PRAGMA foreign_key_check'):
+            violations[row[0]] = violations.get(row[0], 0) + 1
+    finally:
+        conn.close()
+    return violations
+
+
+def prune_backups(directory: str, keep: int) -> List[str]:
+    """Удалить старые копии, оставив keep последних, и не прошедшие проверку, кроме последней"""
+    paths = sorted(glob.glob(os.path.join(directory, f'{BACKUP_PREFIX}*.db')))
+    removed = paths[:-keep] if keep > 0 else []
+    # Последняя испорченная копия остается для разбора, остальные - полноразмерные файлы без пользы
+    removed += sorted(glob.glob(os.path.join(directory, f'{BACKUP_PREFIX}*.db.corrupt')))[:-1]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def warn_foreign_keys(path: str) -> None:
+    violations = foreign_key_violations(path)
+    if violations:
+        details = ', '.join(f'{table}: {count}' for table, count in sorted(violations.items()))
+        click.echo(f'Предупреждение: ссылки на удаленные записи ({details})', err=True)
+
+
+def analyze_database(path: str, analysis_limit: int = 1000, timeout: float = 30) -> None:
+    """Обновить статистику планировщика; analysis_limit ограничивает число читаемых строк на индекс"""
+    conn = sqlite3.connect(path, timeout=timeout)
+    try:
+        conn.execute(f'PRAGMA analysis_limit={int(analysis_limit)}')
+        conn.execute('ANALYZE')
+        conn.commit()
+        # Возврат WAL к небольшому размеру; PASSIVE не ждет читателей
+        conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+    finally:
+        conn.close()
+
+
+def init_app(app: Flask) -> None:
+    app.config.setdefault('BACKUP_DIR', os.environ.get('BACKUP_DIR', os.path.join(app.instance_path, 'backups')))
+    app.config.setdefault('BACKUP_KEEP', int(os.environ.get('BACKUP_KEEP', '14')))
+
+    @app.cli.command('backup-db')
+    @click.option('--dir', 'directory', default=None, help='Каталог копий (по умолчанию BACKUP_DIR)')
+    @click.option('--keep', default=None, type=int, help='Сколько последних копий хранить (BACKUP_KEEP)')
+    @click.option('--vacuum', is_flag=True, help='Сжатая копия через VACUUM INTO')
+    @click.option('--pages', default=256, show_default=True, help='Страниц за шаг копирования')
+    @click.option('--pause', default=0.05, show_default=True, help='Пауза между шагами, секунды')
+    def backup_db_command(directory: str, keep: int, vacuum: bool, pages: int, pause: float) -> None:
+        """Онлайн-копия БД с проверкой целостности и ротацией"""
+        source = app.config['DATABASE']
+        directory = directory or app.config['BACKUP_DIR']
+        keep = app.config['BACKUP_KEEP'] if keep is None else keep
+        os.makedirs(directory, exist_ok=True)
+
+        name = f'{BACKUP_PREFIX}{datetime.now().strftime("%Y%m%d-%H%M%S")}.db'
+        dest = os.path.join(directory, name)
+        tmp_path = dest + '.tmp'
+        if vacuum:
+            result = vacuum_into(source, tmp_path)
+        else:
+            result = backup_database(source, tmp_path, pages=pages, pause=pause)
+
+        problems = check_integrity(tmp_path)
+        if problems:
+            os.rename(tmp_path, dest + '.corrupt')
+            prune_backups(directory, keep)
+            raise click.ClickException('Копия не прошла проверку: ' + '; '.join(problems[:10]))
+        warn_foreign_keys(tmp_path)
+        # Файл с итоговым именем появляется только после проверки
+        os.replace(tmp_path, dest)
+
+        click.echo(f'{dest}: {result["size"] / 1024 / 1024:.1f} МБ за {result["seconds"]:.1f} с'
+                   f', перезапусков {result["restarts"]}')
+        for path in prune_backups(directory, keep):
+            click.echo(f'Удалена старая копия {path}')
+
+    @app.cli.command('check-db')
+    @click.argument('path', required=False)
+    @click.option('--quick', is_flag=True, help='Быстрая проверка (quick_check)')
+    def check_db_command(path: str, quick: bool) -> None:
+        """Проверка целостности БД или файла копии"""
+        path = path or app.config['DATABASE']
+        problems = check_integrity(path, quick=quick)
+        if problems:
+            raise click.ClickException('Найдены ошибки: ' + '; '.join(problems[:10]))
+        warn_foreign_keys(path)
+        click.echo('ok')
+
+    @app.cli.command('analyze-db')
+    @click.option('--limit', default=1000, show_default=True, help='PRAGMA analysis_limit')
+    def analyze_db_command(limit: int) -> None:
+        """Обновить статистику планировщика запросов"""
+        started = time.perf_counter()
+        analyze_database(app.config['DATABASE'], limit)
+        click.echo(f'ANALYZE за {(time.perf_counter() - started) * 1000:.0f} мс')
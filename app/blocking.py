@@ -0,0 +1,44 @@
+"""Пул для блокирующих CPU-операций (хеширование паролей, сборка XLSX).
+
+С потоковыми воркерами Gunicorn (gthread) несколько запросов
+выполняются в одном процессе одновременно. Тяжелые операции
+отправляются в небольшой общий пул, поэтому одновременно их идет не
+больше BLOCKING_MAX_WORKERS на процесс, а остальным потокам хватает
+процессора на обычные страницы. hashlib и zlib отпускают GIL, так что
+работа пула не останавливает другие потоки.
+
+Функции выполняются вне контекста запроса: передавать можно только
+готовые данные, но не курсоры и не get_db().
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, current_app
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar('T')
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    with _lock:
+        # После fork потоки родителя не существуют, пул создается заново
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['BLOCKING_MAX_WORKERS'], thread_name_prefix='blocking'
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Выполнить func в пуле и дождаться результата"""
+    return _get_executor().submit(func, *args, **kwargs).result()
+
+
+def init_app(app: Flask) -> None:
+    app.config.setdefault('BLOCKING_MAX_WORKERS', int(os.environ.get('BLOCKING_MAX_WORKERS', '2')))
@@ -0,0 +1,141 @@
+"""Кеш отрендеренных фрагментов шаблонов.
+
+Фрагменты хранятся в файлах и общие для всех воркеров. Ключ фрагмента
+включает версию данных (например, версию каталога), поэтому
+инвалидация сводится к увеличению версии в models.bump_version().
+
+Использование в шаблоне:
+
+    {% cache 'catalogue_grid', catalogue_version() %}
+        ... разметка, одинаковая для всех пользователей ...
+    {% endcache %}
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from flask import Flask, g
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from typing import Any, List, Optional
+
+
+class FragmentCache:
+    def __init__(self, directory: str, memory_items: int = 16):
+        self.directory = directory
+        self.memory_items = memory_items
+        # Небольшой кеш в памяти процесса поверх файлов
+        self._memory: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(parts: List[Any]) -> str:
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', str(parts[0]))
+        digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:16]
+        return f'{name}-{digest}'
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.html')
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                value = f.read()
+        except OSError:
+            return None
+        self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        # Атомарная запись: другие воркеры не увидят недописанный файл
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(value)
+        os.replace(tmp_path, self._path(key))
+        self._remember(key, value)
+        self._remove_stale(key)
+
+    def _remember(self, key: str, value: str) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _remove_stale(self, key: str) -> None:
+        """Удалить фрагменты с тем же именем, но старой версией"""
+        prefix = key.rsplit('-', 1)[0] + '-'
+        for filename in os.listdir(self.directory):
+            if filename.startswith(prefix) and filename != key + '.html' and filename.endswith('.html'):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.html'):
+                os.remove(os.path.join(self.directory, filename))
+
+
+class FragmentCacheExtension(Extension):
+    """Тег {% cache имя, версия... %} ... {% endcache %}"""
+    tags = {'cache'}
+
+    def __init__(self, environment: Any):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser: Any) -> Any:
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_cache_support', [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache_support(self, parts: List[Any], caller: Any) -> Markup:
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+
+        key = cache.make_key(parts)
+        value = cache.get(key)
+        if value is None:
+            value = caller()
+            cache.set(key, value)
+        return Markup(value)
+
+
+def catalogue_version() -> int:
+    """Версия каталога, один запрос к БД на HTTP-запрос"""
+    if 'catalogue_version' not in g:
+        from app.models import get_version
+        g.catalogue_version = get_version('catalogue')
+    return g.catalogue_version
+
+
+def init_app(app: Flask) -> None:
+    app.config.setdefault('FRAGMENT_CACHE_DIR', os.environ.get(
+        'FRAGMENT_CACHE_DIR', os.path.join(app.instance_path, 'fragment_cache')))
+    app.config.setdefault('FRAGMENT_CACHE_ENABLED', os.environ.get('FRAGMENT_CACHE_ENABLED', '1') == '1')
+
+    extensions = list(app.jinja_options.get('extensions', ()))
+    extensions.append(FragmentCacheExtension)
+    app.jinja_options = dict(app.jinja_options, extensions=extensions)
+
+    app.jinja_env.globals['catalogue_version'] = catalogue_version
+    if app.config['FRAGMENT_CACHE_ENABLED']:
+        app.jinja_env.fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_DIR'])
@@ -0,0 +1,127 @@
+"""Снимок каталога и изменения с заданной версии для кеша в браузере.
+
+Клиент хранит каталог (IndexedDB) вместе с токеном версии и запрашивает
+только изменения: GET /catalogue?since=<токен>. Токен содержит номер
+версии каталога (versions) и время выдачи минус CATALOGUE_SYNC_OVERLAP
+секунд: транзакция, которая еще не закоммичена, могла записать updated_at
+чуть раньше момента выдачи, и такой товар не должен потеряться.
+
+- версия не изменилась - пустой ответ без выборки товаров;
+- иначе - товары с updated_at >= времени токена и ID удаленных товаров
+  из tombstones (повторно присланный товар просто перезаписывается,
+  восстановленный импортом товар приходит и в `deleted`, и в `products`);
+- токен неверный или старше срока хранения tombstones - полный снимок
+  (`full: true`), клиент заменяет свою копию целиком.
+
+Клиент сначала удаляет `deleted`, затем записывает `products`.
+Категории небольшие и всегда передаются целиком.
+
+Формат - компактный JSON (товары - массивы в порядке `columns`) или
+MessagePack (Accept: application/x-msgpack), если установлен пакет msgpack.
+"""
+import base64
+import json
+import os
+import click
+from datetime import datetime
+from flask import Flask, current_app
+from typing import Any, Dict, List, Optional, Tuple
+from app.db import connect
+from app.models import get_db, get_versions
+from app.queries import timestamp_ago
+
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+PRODUCT_COLUMNS = ('id', 'name', 'description', 'price', 'wholesale_price', 'category_id', 'image_url')
+# Описание нужно только для поиска и карточки, там показываются первые 60 символов
+DESCRIPTION_LENGTH = 60
+
+PRODUCTS_SQL = '''
+    SELECT id, name, substr(description, 1, ?) as description, price, wholesale_price,
+           category_id, image_url
+    FROM products
+    WHERE deleted_at IS NULL {where}
+    ORDER BY id
+'''
+
+
+def encode_token(version: int, server_time: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([version, server_time]).encode()).decode().rstrip('=')
+
+
+def decode_token(value: str) -> Optional[Tuple[int, str]]:
+    """(версия, время) из токена или None, если токен неверный"""
+    try:
+        version, server_time = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+        datetime.strptime(server_time, '%Y-%m-%d %H:%M:%S')
+        return int(version), server_time
+    except (ValueError, TypeError):
+        return None
+
+
+def _products(where: str = '', params: Tuple[Any, ...] = ()) -> List[List[Any]]:
+    rows = get_db().execute(PRODUCTS_SQL.format(where=where), (DESCRIPTION_LENGTH, *params))
+    return [list(row) for row in rows]
+
+
+def _categories() -> List[List[Any]]:
+    return [list(row) for row in get_db().execute('SELECT id, name FROM categories ORDER BY name')]
+
+
+def changes(since: Optional[str]) -> Dict[str, Any]:
+    """Снимок каталога или изменения после токена since"""
+    config = current_app.config
+    version = get_versions('catalogue')['catalogue'][0]
+    synced_at = timestamp_ago(seconds=config['CATALOGUE_SYNC_OVERLAP'])
+    result: Dict[str, Any] = {'version': encode_token(version, synced_at), 'columns': PRODUCT_COLUMNS}
+
+    token = decode_token(since) if since else None
+    horizon = timestamp_ago(days=config['CATALOGUE_TOMBSTONE_DAYS'])
+    if token is None or token[1] < horizon:
+        result.update(full=True, products=_products(), deleted=[], categories=_categories())
+        return result
+
+    since_version, since_time = token
+    if since_version == version:
+        # Токен остается прежним: время в нем не сдвигается, пока каталог не изменится
+        result.update(version=since, full=False, products=[], deleted=[], categories=None)
+        return result
+
+    deleted = [row[0] for row in get_db().execute(
+        "SELECT entity_id FROM tombstones WHERE entity = 'product' AND deleted_at >= ?", (since_time,)
+    )]
+    result.update(full=False, products=_products('AND updated_at >= ?', (since_time,)),
+                  deleted=deleted, categories=_categories())
+    return result
+
+
+def encode(data: Dict[str, Any], accept: str) -> Tuple[bytes, str]:
+    """Тело ответа и mimetype по заголовку Accept"""
+    if MSGPACK_MIMETYPE in accept:
+        # Импорт при первом запросе MessagePack, а не при старте воркера
+        try:
+            import msgpack
+        except ImportError:  # MessagePack отдается только при установленном пакете msgpack
+            pass
+        else:
+            return msgpack.packb(data, use_bin_type=True, default=str), MSGPACK_MIMETYPE
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8'), \
+        'application/json'
+
+
+def init_app(app: Flask) -> None:
+    # Токен старше срока хранения tombstones заменяется полным снимком
+    app.config.setdefault('CATALOGUE_TOMBSTONE_DAYS', int(os.environ.get('CATALOGUE_TOMBSTONE_DAYS', '90')))
+    app.config.setdefault('CATALOGUE_SYNC_OVERLAP', int(os.environ.get('CATALOGUE_SYNC_OVERLAP', '120')))
+
+    @app.cli.command('prune-tombstones')
+    @click.option('--days', default=None, type=int, help='Хранить записи N дней (CATALOGUE_TOMBSTONE_DAYS)')
+    def prune_tombstones_command(days: Optional[int]) -> None:
+        """Удалить старые записи об удаленных товарах"""
+        days = app.config['CATALOGUE_TOMBSTONE_DAYS'] if days is None else days
+        conn = connect(app)
+        try:
+            cursor = conn.execute('DELETE FROM tombstones WHERE deleted_at < ?', (timestamp_ago(days=days),))
+            conn.commit()
+            click.echo(f'Удалено записей: {cursor.rowcount}')
+        finally:
+            conn.close()
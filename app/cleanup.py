@@ -0,0 +1,89 @@
+"""Мягкое удаление товаров и магазинов и отложенная очистка.
+
+Удаление товара или магазина - один UPDATE deleted_at: строка остается,
+поэтому позиции заявок и заказов по-прежнему показывают название и цену,
+а ID удаленной записи попадает в tombstones (триггер в app/schema.py) -
+по ним кеш каталога в браузере узнает об удалении. Рабочие запросы
+читают только deleted_at IS NULL (частичные индексы).
+
+collect-garbage (cron) физически удаляет записи, помеченные больше
+SOFT_DELETE_RETENTION_DAYS дней назад, на которые больше ничего не
+ссылается. Удаление идет пачками по GC_BATCH_SIZE строк, каждая пачка -
+отдельная короткая транзакция с паузой, чтобы не держать блокировку
+записи SQLite.
+"""
+import os
+import time
+import click
+from flask import Flask
+from typing import Any, Dict, Optional
+from app.db import connect
+from app.queries import timestamp_ago
+
+# Помеченные записи без ссылок из заявок и заказов
+PURGE_SQL = {
+    'products': '''
+        DELETE FROM products WHERE id IN (
+            SELECT id FROM products p
+            WHERE p.deleted_at IS NOT NULL AND p.deleted_at < ?
+              AND NOT EXISTS (SELECT 1 FROM request_items ri WHERE ri.product_id = p.id)
+              AND NOT EXISTS (SELECT 1 FROM order_items oi WHERE oi.product_id = p.id)
+            LIMIT ?
+        )
+    ''',
+    'shops': '''
+        DELETE FROM shops WHERE id IN (
+            SELECT id FROM shops sh
+            WHERE sh.deleted_at IS NOT NULL AND sh.deleted_at < ?
+              AND NOT EXISTS (SELECT 1 FROM requests r WHERE r.shop_id = sh.id)
+              AND NOT EXISTS (SELECT 1 FROM orders o WHERE o.shop_id = sh.id)
+            LIMIT ?
+        )
+    ''',
+}
+
+# Позиции, товар которых удален физически до перехода на мягкое удаление
+ORPHANS_SQL = '''
+    SELECT COUNT(*) FROM request_items ri
+    WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.id = ri.product_id)
+'''
+
+
+def collect_garbage(conn: Any, retention_days: int, batch_size: int = 500,
+                    pause: float = 0.05) -> Dict[str, int]:
+    """Удалить старые помеченные записи пачками. Возвращает число удаленных строк по таблицам"""
+    before = timestamp_ago(days=retention_days)
+    removed = {}
+    for table, sql in PURGE_SQL.items():
+        removed[table] = 0
+        while True:
+            cursor = conn.execute(sql, (before, batch_size))
+            conn.commit()
+            removed[table] += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+            time.sleep(pause)
+    return removed
+
+
+def init_app(app: Flask) -> None:
+    app.config.setdefault('SOFT_DELETE_RETENTION_DAYS', int(os.environ.get('SOFT_DELETE_RETENTION_DAYS', '30')))
+    app.config.setdefault('GC_BATCH_SIZE', int(os.environ.get('GC_BATCH_SIZE', '500')))
+
+    @app.cli.command('collect-garbage')
+    @click.option('--days', default=None, type=int, help='Удалять записи, помеченные больше N дней назад')
+    @click.option('--batch-size', default=None, type=int, help='Строк в одной транзакции (GC_BATCH_SIZE)')
+    @click.option('--pause', default=0.05, show_default=True, help='Пауза между пачками, секунды')
+    def collect_garbage_command(days: Optional[int], batch_size: Optional[int], pause: float) -> None:
+        """Физически удалить помеченные товары и магазины, на которые нет ссылок"""
+        days = app.config['SOFT_DELETE_RETENTION_DAYS'] if days is None else days
+        batch_size = batch_size or app.config['GC_BATCH_SIZE']
+        conn = connect(app)
+        try:
+            removed = collect_garbage(conn, days, batch_size, pause)
+            orphans = conn.execute(ORPHANS_SQL).fetchone()[0]
+        finally:
+            conn.close()
+        click.echo(f'Удалено товаров: {removed["products"]}, магазинов: {removed["shops"]}')
+        if orphans:
+            click.echo(f'Позиций заявок без товара (удален до мягкого удаления): {orphans}')
@@ -0,0 +1,126 @@
+"""Подключения к базе данных SQLite (файл DATABASE).
+
+Код приложения обращается к БД через get_db() в контексте запроса или
+connect() для отдельных подключений (фоновые потоки, CLI).
+
+Тяжелые чтения (дашборд, отчеты, аналитика) могут идти в реплику:
+get_db(readonly=True). Реплика - файл-снимок основной БД по пути
+DATABASE_REPLICA_PATH (обновляется через backup API). Если снимок
+старше DATABASE_REPLICA_MAX_LAG секунд или пользователь только что сам
+что-то изменил (read-your-writes), чтение идет в основную БД.
+"""
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+from flask import Flask, current_app, g, request, session
+from typing import Any, Optional
+
+
+class SQLiteSnapshotReplica:
+    """Реплика SQLite: снимок основной БД, который обновляется в фоне, когда устаревает"""
+
+    def __init__(self, source: str, path: str, max_lag: float, timeout: float):
+        self.source = source
+        self.path = path
+        self.max_lag = max_lag
+        self.timeout = timeout
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def taken_at(self) -> Optional[float]:
+        """Момент начала снимка (mtime файла) или None, если снимка нет"""
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def connect(self, not_before: Optional[float] = None) -> Optional[sqlite3.Connection]:
+        """Подключение к снимку или None, если читать нужно из основной БД"""
+        taken_at = self.taken_at()
+        if taken_at is None or time.time() - taken_at > self.max_lag:
+            self.refresh_async()
+            return None
+        if not_before is not None and taken_at < not_before:
+            return None
+        conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, timeout=self.timeout)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def refresh_async(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self.refresh, name='db-snapshot', daemon=True)
+            self._thread.start()
+
+    def refresh(self) -> bool:
+        """Снять снимок; False, если его уже снимает другой процесс"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + '.lock', 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+            started = time.time()
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            source = sqlite3.connect(self.source, timeout=self.timeout)
+            target = sqlite3.connect(tmp_path)
+            try:
+                # Один шаг: в WAL копия читается в одной транзакции и не блокирует запись
+                source.backup(target)
+                target.execute('PRAGMA journal_mode=DELETE')
+            except sqlite3.Error:
+                target.close()
+                os.remove(tmp_path)
+                raise
+            finally:
+                target.close()
+                source.close()
+            # Открытые подключения дочитывают старый файл, новые откроют новый
+            os.replace(tmp_path, self.path)
+            os.utime(self.path, (started, started))
+            return True
+
+
+def connect(app: Optional[Flask] = None) -> sqlite3.Connection:
+    """Отдельное подключение к основной БД; закрывает вызывающий код.
+
+    Без app берется текущее приложение; генераторы и потоки вне контекста передают app явно.
+    """
+    config = (app or current_app).config
+    conn = sqlite3.connect(config['DATABASE'], timeout=config['DATABASE_TIMEOUT'])
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def connect_readonly() -> Optional[Any]:
+    """Подключение к реплике для текущего запроса или None (читать из основной БД)"""
+    replica = current_app.extensions.get('db_replica')
+    if replica is None:
+        return None
+    return replica.connect(not_before=session.get('db_written_at'))
+
+
+def init_app(app: Flask) -> None:
+    app.config.setdefault('DATABASE_REPLICA_PATH', os.environ.get('DATABASE_REPLICA_PATH', ''))
+    app.config.setdefault('DATABASE_REPLICA_MAX_LAG', float(os.environ.get('DATABASE_REPLICA_MAX_LAG', '30')))
+    if not app.config['DATABASE_REPLICA_PATH']:
+        return
+    app.extensions['db_replica'] = SQLiteSnapshotReplica(
+        app.config['DATABASE'], app.config['DATABASE_REPLICA_PATH'],
+        app.config['DATABASE_REPLICA_MAX_LAG'], app.config['DATABASE_TIMEOUT']
+    )
+
+    @app.after_request
+    def remember_write(response: Any) -> Any:
+        # После своего изменения пользователь читает из основной БД, пока реплика его не догонит.
+        # Сессия сохраняется до close_db, поэтому единица работы коммитится здесь: отметка
+        # ставится после коммита, и снимок, начатый раньше нее, не содержит изменения
+        from app.models import commit_db
+        commit_db()
+        if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and response.status_code < 400 \
+                and g.get('db_commits'):
+            session['db_written_at'] = time.time()
+        return response
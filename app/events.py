@@ -0,0 +1,208 @@
+"""Лента изменений заявок (Server-Sent Events).
+
+Изменения пишутся в таблицу request_changes (см. Request.record_changes).
+В каждом процессе один фоновый поток опрашивает таблицу и раздает новые
+записи всем подключенным клиентам, поэтому число запросов к БД не
+зависит от числа открытых лент. Поток работает, только пока есть
+подписчики, и открывает подключение на время одного опроса.
+
+Клиент продолжает с места обрыва по заголовку Last-Event-ID (EventSource
+передает его сам) или параметру cursor.
+
+Открытый поток держит поток воркера gthread до REQUEST_FEED_MAX_DURATION
+секунд, поэтому одновременных лент в процессе не больше
+REQUEST_FEED_MAX_STREAMS. Сверх лимита клиент получает только `retry:`
+и пустой ответ - EventSource переподключится позже, остальные потоки
+воркера остаются для обычных запросов.
+"""
+import click
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from flask import Flask, current_app
+from typing import Any, Deque, Dict, Iterator, List, Optional
+from app.db import connect
+from app.queries import timestamp_ago
+
+CHANGE_COLUMNS = 'id, request_id, supplier_id, shop_id, kind, status, created_at'
+POLL_BATCH = 500
+# Пауза перед переподключением, когда все места для лент заняты (мс)
+BUSY_RETRY_MS = 30000
+
+
+def read_changes(app: Flask, after_id: int, limit: int = POLL_BATCH) -> List[Dict[str, Any]]:
+    """Изменения после after_id"""
+    conn = connect(app)
+    try:
+        rows = conn.execute(
+            f'SELECT {CHANGE_COLUMNS} FROM request_changes WHERE id > ? ORDER BY id LIMIT ?',
+            (after_id, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def last_change_id(app: Flask) -> int:
+    conn = connect(app)
+    try:
+        return conn.execute('SELECT COALESCE(MAX(id), 0) FROM request_changes').fetchone()[0]
+    finally:
+        conn.close()
+
+
+class ChangeFeed:
+    """Общий для процесса опрос request_changes с буфером последних записей"""
+
+    def __init__(self, app: Flask, interval: float, buffer_size: int):
+        # Поток опроса работает без контекста приложения: подключения открываются по app
+        self.app = app
+        self.interval = interval
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self.last_id: Optional[int] = None
+        self.subscribers = 0
+        self.streams = 0
+        self.condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def subscribe(self) -> None:
+        with self.condition:
+            self.subscribers += 1
+            # После fork поток родителя в дочернем процессе не существует
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='request-feed', daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self) -> None:
+        with self.condition:
+            self.subscribers -= 1
+
+    def acquire_stream(self, limit: int) -> bool:
+        """Занять место для ленты; False, если открыто уже limit лент"""
+        with self.condition:
+            if self.streams >= limit:
+                return False
+            self.streams += 1
+            return True
+
+    def release_stream(self) -> None:
+        with self.condition:
+            self.streams -= 1
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                if self.subscribers <= 0:
+                    # Без подписчиков поток завершается, буфер начнется заново
+                    self.last_id = None
+                    self.events.clear()
+                    self._thread = None
+                    return
+            try:
+                self.poll()
+            except sqlite3.Error:
+                pass
+            time.sleep(self.interval)
+
+    def poll(self) -> None:
+        if self.last_id is None:
+            self.last_id = last_change_id(self.app)
+            return
+        rows = read_changes(self.app, self.last_id)
+        if rows:
+            with self.condition:
+                self.events.extend(rows)
+                self.last_id = rows[-1]['id']
+                self.condition.notify_all()
+
+    def wait(self, after_id: int, timeout: float) -> List[Dict[str, Any]]:
+        """Новые записи буфера после after_id; ждет не дольше timeout"""
+        with self.condition:
+            if not self.events or self.events[-1]['id'] <= after_id:
+                self.condition.wait(timeout)
+            return [event for event in self.events if event['id'] > after_id]
+
+    def covers(self, after_id: int) -> bool:
+        """Есть ли в буфере все записи после after_id"""
+        with self.condition:
+            if self.last_id is None:
+                return False
+            oldest = self.events[0]['id'] if self.events else self.last_id + 1
+            return after_id >= oldest - 1
+
+
+def get_feed() -> ChangeFeed:
+    return current_app.extensions['request_feed']
+
+
+def format_event(change: Dict[str, Any]) -> str:
+    return f'id: {change["id"]}\nevent: request\ndata: {json.dumps(change, ensure_ascii=False)}\n\n'
+
+
+def stream(feed: ChangeFeed, after_id: Optional[int], supplier_id: Optional[int],
+           heartbeat: float, max_duration: float) -> Iterator[str]:
+    """Генератор SSE. Не использует контекст запроса и подключение g.db"""
+    feed.subscribe()
+    try:
+        yield 'retry: 3000\n\n'
+        if after_id is None:
+            after_id = last_change_id(feed.app)
+        deadline = time.monotonic() + max_duration
+        last_write = time.monotonic()
+        while time.monotonic() < deadline:
+            if feed.covers(after_id):
+                changes = feed.wait(after_id, heartbeat)
+            else:
+                # Клиент отстал от буфера (или поток еще не запущен) - догоняем из БД
+                changes = read_changes(feed.app, after_id)
+                if not changes:
+                    time.sleep(feed.interval)
+            if changes:
+                after_id = changes[-1]['id']
+                events = [format_event(change) for change in changes
+                          if supplier_id is None or change['supplier_id'] == supplier_id]
+                if events:
+                    yield ''.join(events)
+                    last_write = time.monotonic()
+                    continue
+            # Комментарий-пинг не дает прокси закрыть соединение
+            if time.monotonic() - last_write >= heartbeat:
+                yield ': ping\n\n'
+                last_write = time.monotonic()
+    finally:
+        feed.unsubscribe()
+
+
+def init_app(app: Flask) -> None:
+    # Каждый открытый поток занимает воркер: с sync-воркерами Gunicorn лента выключена
+    app.config.setdefault('REQUEST_FEED_ENABLED', os.environ.get('REQUEST_FEED_ENABLED', '0') == '1')
+    app.config.setdefault('REQUEST_FEED_POLL_INTERVAL',
+                          float(os.environ.get('REQUEST_FEED_POLL_INTERVAL', '1')))
+    app.config.setdefault('REQUEST_FEED_BUFFER', int(os.environ.get('REQUEST_FEED_BUFFER', '1000')))
+    app.config.setdefault('REQUEST_FEED_HEARTBEAT', float(os.environ.get('REQUEST_FEED_HEARTBEAT', '15')))
+    # Ограничение длительности потока (меньше --timeout Gunicorn): EventSource
+    # переподключится с Last-Event-ID
+    app.config.setdefault('REQUEST_FEED_MAX_DURATION',
+                          float(os.environ.get('REQUEST_FEED_MAX_DURATION', '50')))
+    # Одновременных лент на процесс: остальные потоки gthread обслуживают обычные запросы
+    app.config.setdefault('REQUEST_FEED_MAX_STREAMS', int(os.environ.get('REQUEST_FEED_MAX_STREAMS', '3')))
+    app.extensions['request_feed'] = ChangeFeed(
+        app, app.config['REQUEST_FEED_POLL_INTERVAL'], app.config['REQUEST_FEED_BUFFER']
+    )
+
+    @app.cli.command('prune-request-changes')
+    @click.option('--days', default=30, show_default=True, help='Хранить изменения за N дней')
+    def prune_request_changes_command(days: int) -> None:
+        """Удалить старые записи журнала изменений заявок"""
+        conn = connect(app)
+        try:
+            cursor = conn.execute('DELETE FROM request_changes WHERE created_at < ?', (timestamp_ago(days=days),))
+            conn.commit()
+            click.echo(f'Удалено записей: {cursor.rowcount}')
+        finally:
+            conn.close()
@@ -0,0 +1,190 @@
+"""Выгрузка табличных данных в CSV и XLSX без загрузки всей выборки в память.
+
+CSV отдается потоком по мере чтения курсора. XLSX пишется в режиме
+write_only во временный файл (в памяти до 8 МБ, дальше на диск).
+Оформление ячеек - именованные стили книги (add_request_styles): ячейка
+ссылается на стиль по имени, а не создает свои Font и Border.
+"""
+import csv
+import io
+import re
+import tempfile
+from flask import Response, send_file, stream_with_context
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from app.blocking import run_blocking
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def csv_response(headers: Sequence[str], rows: Iterable[Sequence[Any]], filename: str) -> Response:
+    """Потоковый CSV (UTF-8 с BOM и ';' - открывается в Excel)"""
+    def generate() -> Iterable[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=';')
+        buffer.write('\ufeff')
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    response = Response(stream_with_context(generate()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+def xlsx_response(title: str, headers: Sequence[str], rows: Iterable[Sequence[Any]], filename: str,
+                  column_widths: Sequence[int] = ()) -> Response:
+    """XLSX из потока строк (openpyxl write_only)"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title[:31])
+    for index, width in enumerate(column_widths):
+        ws.column_dimensions[get_column_letter(index + 1)].width = width
+
+    bold = Font(bold=True)
+    header_cells: List[Any] = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = bold
+        header_cells.append(cell)
+    ws.append(header_cells)
+    for row in rows:
+        ws.append(list(row))
+
+    return _send_workbook(wb, filename)
+
+
+def _send_workbook(wb: Any, filename: str) -> Response:
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    # Строки уже записаны во временные файлы листа, в пуле только упаковка в zip
+    run_blocking(wb.save, output)
+    output.seek(0)
+    return send_file(output, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=filename)
+
+
+def add_request_styles(wb: Any) -> None:
+    """Именованные стили выгрузок заявок (request_*)"""
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    center = Alignment(horizontal='center', vertical='center')
+    right = Alignment(horizontal='right')
+    bold = Font(bold=True)
+    money = '#,##0 "₸"'
+    for style in (
+        NamedStyle('request_title', font=Font(bold=True, size=16), alignment=center),
+        NamedStyle('request_section', font=Font(bold=True, size=12)),
+        NamedStyle('request_label', font=bold),
+        NamedStyle('request_header', font=Font(bold=True, size=14, color='FFFFFF'), border=border,
+                   fill=PatternFill(start_color='366092', end_color='366092', fill_type='solid'),
+                   alignment=center),
+        NamedStyle('request_cell', border=border),
+        NamedStyle('request_center', border=border, alignment=center),
+        NamedStyle('request_right', border=border, alignment=right),
+        NamedStyle('request_money', border=border, alignment=right, number_format=money),
+        NamedStyle('request_amount', number_format=money),
+        NamedStyle('request_total', font=bold, border=border),
+        NamedStyle('request_total_center', font=bold, border=border, alignment=center),
+        NamedStyle('request_total_right', font=bold, border=border, alignment=right),
+        NamedStyle('request_total_money', font=bold, border=border, alignment=right, number_format=money),
+    ):
+        wb.add_named_style(style)
+
+
+def _sheet_title(name: str, used: Dict[str, int]) -> str:
+    """Имя листа Excel: без запрещенных символов, до 31 символа, без повторов"""
+    title = re.sub(r'[\\/?*\[\]:]', ' ', name).strip()[:31] or 'Лист'
+    count = used.get(title.lower(), 0)
+    used[title.lower()] = count + 1
+    if count:
+        suffix = f' ({count + 1})'
+        title = title[:31 - len(suffix)] + suffix
+    return title
+
+
+# (заголовок, поле, ширина, стиль); ячейки без стиля пишутся простыми значениями -
+# стиль на каждой ячейке замедляет выгрузку в несколько раз
+REQUEST_ITEM_COLUMNS = [
+    ('Заявка', 'request_id', 10, None),
+    ('Создана', 'created_at', 20, None),
+    ('Статус', 'status', 12, None),
+    ('Торговый', 'supplier_name', 24, None),
+    ('Магазин', 'shop_name', 24, None),
+    ('Категория', 'category_name', 20, None),
+    ('Артикул', 'sku', 14, None),
+    ('Товар', 'product_name', 40, None),
+    ('Количество', 'quantity', 12, None),
+    ('Цена', 'price', 12, 'request_amount'),
+    ('Сумма', 'total_price', 14, 'request_amount'),
+]
+
+
+def requests_xlsx_response(items: Iterable[Any], filename: str, by_supplier: bool = False) -> Response:
+    """Позиции многих заявок в одной книге: общий лист или лист на торгового.
+
+    items - строки Request.get_export_items, упорядоченные по заявке (при
+    by_supplier - сначала по торговому). На листах торговых после каждой
+    заявки идет строка итога.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    add_request_styles(wb)
+    columns = [column for column in REQUEST_ITEM_COLUMNS if not (by_supplier and column[1] == 'supplier_name')]
+    sheet_titles: Dict[str, int] = {}
+
+    def styled(ws: Any, value: Any, style: Optional[str]) -> Any:
+        if style is None:
+            return value
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
+
+    def new_sheet(title: str) -> Any:
+        ws = wb.create_sheet(_sheet_title(title, sheet_titles))
+        for index, column in enumerate(columns):
+            ws.column_dimensions[get_column_letter(index + 1)].width = column[2]
+        # Заголовок закреплен при прокрутке, строки можно фильтровать
+        ws.freeze_panes = 'A2'
+        ws.append([styled(ws, column[0], 'request_header') for column in columns])
+        return ws
+
+    def total_row(ws: Any, request_id: int, quantity: int, total: float) -> None:
+        values = {'request_id': f'Итого {request_id}', 'quantity': quantity, 'total_price': total}
+        styles = {'quantity': 'request_total_center', 'total_price': 'request_total_money'}
+        ws.append([styled(ws, values.get(column[1]), styles.get(column[1], 'request_total'))
+                   for column in columns])
+
+    ws = None if by_supplier else new_sheet('Заявки')
+    supplier_id = request_id = None
+    quantity = total = 0
+    for item in items:
+        if by_supplier and item['request_id'] != request_id and request_id is not None:
+            total_row(ws, request_id, quantity, total)
+        if by_supplier and item['supplier_id'] != supplier_id:
+            supplier_id = item['supplier_id']
+            ws = new_sheet(item['supplier_name'])
+        if item['request_id'] != request_id:
+            request_id = item['request_id']
+            quantity = total = 0
+        quantity += item['quantity']
+        total += item['total_price'] or 0
+        ws.append([styled(ws, item[column[1]], column[3]) for column in columns])
+    if by_supplier and request_id is not None:
+        total_row(ws, request_id, quantity, total)
+    if ws is None:
+        new_sheet('Заявки')
+
+    return _send_workbook(wb, filename)
@@ -0,0 +1,107 @@
+"""Условные GET-запросы (ETag / Last-Modified) и заголовки Cache-Control.
+
+Валидаторы вычисляются из версий данных до вызова view, поэтому ответ
+304 Not Modified отдается без запросов на выборку и без рендеринга.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import make_response, request, session
+from flask_login import current_user
+from app.models import Request, get_versions
+from typing import Any, Callable, Optional, Tuple
+
+# Политики кеширования для разных типов ответов
+PRIVATE_REVALIDATE = 'private, no-cache'
+PRIVATE_SHORT = 'private, max-age=60, must-revalidate'
+
+Validator = Callable[..., Optional[Tuple[Any, Optional[str]]]]
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Преобразовать CURRENT_TIMESTAMP из SQLite в datetime (UTC)"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def make_etag(parts: Any) -> str:
+    # Ответы зависят от пользователя (меню, роль), поэтому он входит в ETag
+    user_id = current_user.get_id() if current_user.is_authenticated else None
+    return hashlib.sha1(repr((user_id, parts)).encode('utf-8')).hexdigest()
+
+
+def conditional(validator: Validator, cache_control: str = PRIVATE_REVALIDATE) -> Callable:
+    """Декоратор view с поддержкой If-None-Match / If-Modified-Since.
+
+    validator(**view_args) возвращает (части ETag, updated_at) или None,
+    если ответ нельзя кешировать (например, сущность не найдена).
+    """
+    def decorator(f: Callable) -> Callable:
+        @wraps(f)
+        def decorated_function(*args: Any, **kwargs: Any) -> Any:
+            # Отложенные flash-сообщения нужно показать, 304 их бы потерял
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return f(*args, **kwargs)
+
+            validators = validator(**kwargs)
+            if validators is None:
+                return f(*args, **kwargs)
+
+            parts, updated_at = validators
+            etag = make_etag(parts)
+            last_modified = parse_timestamp(updated_at)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            elif request.if_modified_since and last_modified:
+                not_modified = last_modified <= request.if_modified_since
+            else:
+                not_modified = False
+
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = cache_control
+            response.vary.add('Cookie')
+            return response
+        return decorated_function
+    return decorator
+
+
+# Валидаторы сущностей
+
+def catalogue_validator() -> Tuple[Any, Optional[str]]:
+    """Список товаров: версия каталога"""
+    version, updated_at = get_versions('catalogue')['catalogue']
+    return ('catalogue', version), updated_at
+
+
+def product_validator(product_id: int) -> Tuple[Any, Optional[str]]:
+    """Карточка товара: сам товар и статистика по заявкам (с названиями магазинов и торговых)"""
+    versions = get_versions('catalogue', 'requests', 'shops', 'suppliers')
+    updated_at = max((v[1] for v in versions.values() if v[1]), default=None)
+    return ('product', product_id, versions['catalogue'][0], versions['requests'][0],
+            versions['shops'][0], versions['suppliers'][0]), updated_at
+
+
+def completed_request_validator(request_id: int) -> Optional[Tuple[Any, Optional[str]]]:
+    """Завершенная заявка: меняется при возврате в работу, правке каталога или переименовании
+    магазина и торгового"""
+    row = Request.get_version(request_id)
+    if not row or row['status'] != 'completed':
+        return None
+    versions = get_versions('catalogue', 'shops', 'suppliers')
+    updated_at = max(filter(None, (row['updated_at'], *(v[1] for v in versions.values()))), default=None)
+    return ('request', request_id, row['updated_at'], versions['catalogue'][0],
+            versions['shops'][0], versions['suppliers'][0]), updated_at
@@ -0,0 +1,235 @@
+"""Массовый импорт каталога товаров из CSV/XLSX.
+
+Файл читается построчно (XLSX — в режиме read_only), строки
+проверяются и записываются пачками: одна транзакция и один
+executemany на пачку. Товары с артикулом (sku) обновляются
+(удаленный товар с тем же артикулом восстанавливается), без
+артикула — добавляются. Ошибки по строкам собираются в CSV-отчет.
+"""
+import csv
+import os
+from flask import current_app
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app import planner
+from app.jobs import JobContext
+from app.models import bump_version, commit_db, get_db, log_action
+
+BATCH_SIZE = 1000
+
+# Допустимые заголовки колонок -> поле товара
+COLUMN_ALIASES = {
+    'id': 'id',
+    'sku': 'sku', 'артикул': 'sku', 'код': 'sku',
+    'name': 'name', 'название': 'name', 'наименование': 'name', 'товар': 'name',
+    'description': 'description', 'описание': 'description',
+    'price': 'price', 'цена': 'price',
+    'wholesale_price': 'wholesale_price', 'опт. цена': 'wholesale_price',
+    'оптовая цена': 'wholesale_price', 'опт': 'wholesale_price',
+    'category': 'category', 'категория': 'category',
+    'image_url': 'image_url', 'изображение': 'image_url',
+}
+
+UPSERT_SQL = '''
+    INSERT INTO products (sku, category_id, name, description, price, wholesale_price, image_url)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (sku) WHERE sku IS NOT NULL DO UPDATE SET
+        category_id = COALESCE(excluded.category_id, products.category_id),
+        name = excluded.name,
+        description = COALESCE(excluded.description, products.description),
+        price = excluded.price,
+        wholesale_price = COALESCE(excluded.wholesale_price, products.wholesale_price),
+        image_url = COALESCE(excluded.image_url, products.image_url),
+        deleted_at = NULL,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+
+def imports_folder() -> str:
+    folder = os.path.join(current_app.instance_path, 'imports')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _normalize_header(header: Any) -> Optional[str]:
+    if header is None:
+        return None
+    return COLUMN_ALIASES.get(str(header).strip().lower())
+
+
+def iter_rows(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Построчное чтение файла: (номер строки, {поле: значение})"""
+    if path.lower().endswith('.xlsx'):
+        yield from _iter_xlsx(path)
+    else:
+        yield from _iter_csv(path)
+
+
+def _iter_csv(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        fields = [_normalize_header(h) for h in next(reader, [])]
+        for line_number, values in enumerate(reader, 2):
+            if any(v.strip() for v in values):
+                yield line_number, {field: value for field, value in zip(fields, values) if field}
+
+
+def _iter_xlsx(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        fields = [_normalize_header(h) for h in next(rows, ())]
+        for line_number, values in enumerate(rows, 2):
+            if any(v not in (None, '') for v in values):
+                yield line_number, {field: value for field, value in zip(fields, values) if field}
+    finally:
+        wb.close()
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def _price(value: Any) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return float(str(value).replace(' ', '').replace(' ', '').replace(',', '.'))
+
+
+class CategoryResolver:
+    """Категории по имени: все загружаются одним запросом, недостающие создаются"""
+
+    def __init__(self, db: Any):
+        self.db = db
+        self.by_name = {
+            row['name'].strip().lower(): row['id']
+            for row in db.execute('SELECT id, name FROM categories').fetchall()
+        }
+        self.created = 0
+
+    def resolve(self, name: Optional[str]) -> Optional[int]:
+        if not name:
+            return None
+        key = name.lower()
+        if key not in self.by_name:
+            self.by_name[key] = self.db.execute(
+                'INSERT INTO categories (name) VALUES (?) RETURNING id', (name,)
+            ).fetchone()[0]
+            self.created += 1
+        return self.by_name[key]
+
+
+def validate_row(row: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """Проверка строки файла: (данные товара или None, список ошибок)"""
+    errors = []
+    name = _text(row.get('name'))
+    if not name:
+        errors.append('Не указано название')
+
+    try:
+        price = _price(row.get('price'))
+        if price is None:
+            errors.append('Не указана цена')
+        elif price <= 0:
+            errors.append('Цена должна быть больше 0')
+    except ValueError:
+        price = None
+        errors.append('Неверный формат цены')
+
+    try:
+        wholesale_price = _price(row.get('wholesale_price'))
+        if wholesale_price is not None and wholesale_price <= 0:
+            errors.append('Оптовая цена должна быть больше 0')
+    except ValueError:
+        wholesale_price = None
+        errors.append('Неверный формат оптовой цены')
+
+    if errors:
+        return None, errors
+    return {
+        'sku': _text(row.get('sku')),
+        'name': name,
+        'description': _text(row.get('description')),
+        'price': price,
+        'wholesale_price': wholesale_price,
+        'category': _text(row.get('category')),
+        'image_url': _text(row.get('image_url')),
+    }, []
+
+
+def _write_batch(db: Any, categories: CategoryResolver, batch: List[Dict[str, Any]]) -> None:
+    params = [
+        (item['sku'], categories.resolve(item['category']), item['name'], item['description'],
+         item['price'], item['wholesale_price'], item['image_url'])
+        for item in batch
+    ]
+    db.executemany(UPSERT_SQL, params)
+    bump_version('catalogue')
+    # Каждая пачка видна сразу и не держит блокировку записи до конца импорта
+    commit_db()
+
+
+def import_products(job: JobContext, path: str, user_id: int) -> Dict[str, Any]:
+    """Фоновая задача импорта: возвращает итоги для jobs.result"""
+    try:
+        return _import_file(job, path, user_id)
+    finally:
+        # Загруженный файл удаляется и после ошибки: повторный импорт - новая загрузка
+        os.remove(path)
+
+
+def _import_file(job: JobContext, path: str, user_id: int) -> Dict[str, Any]:
+    db = get_db()
+    categories = CategoryResolver(db)
+    error_rows: List[Tuple[int, str]] = []
+    batch: List[Dict[str, Any]] = []
+    processed = imported = 0
+
+    for line_number, row in iter_rows(path):
+        item, errors = validate_row(row)
+        processed += 1
+        if errors:
+            error_rows.append((line_number, '; '.join(errors)))
+        else:
+            batch.append(item)
+
+        if len(batch) >= BATCH_SIZE:
+            _write_batch(db, categories, batch)
+            imported += len(batch)
+            batch = []
+            job.progress(processed, errors=len(error_rows))
+
+    if batch:
+        _write_batch(db, categories, batch)
+        imported += len(batch)
+    job.progress(processed, total=processed, errors=len(error_rows))
+
+    report_path = None
+    if error_rows:
+        report_path = os.path.join(imports_folder(), f'job_{job.id}_errors.csv')
+        with open(report_path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(['Строка', 'Ошибка'])
+            writer.writerows(error_rows)
+
+    log_action(user_id, 'import', 'product', job.id)
+    planner.analyze_after_bulk(('products', 'categories'), imported)
+    return {
+        'processed': processed,
+        'imported': imported,
+        'errors': len(error_rows),
+        'categories_created': categories.created,
+        'error_report': report_path,
+    }
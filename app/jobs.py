@@ -0,0 +1,160 @@
+"""Фоновые задачи (импорт, тяжелые отчеты).
+
+Задача выполняется в пуле потоков текущего воркера, а ее состояние
+и прогресс хранятся в таблице jobs, поэтому статус можно запросить
+из любого воркера. Пока в воркере есть задачи, плановый перезапуск по
+max_requests откладывается (gunicorn.conf.py, running_jobs); задачи,
+прерванные полным перезапуском, помечаются в get_job как failed.
+"""
+import json
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, current_app
+from typing import Any, Callable, Dict, Optional
+from app import db
+from app.models import commit_db, rollback_db
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_lock = threading.Lock()
+# Задачи этого процесса в очереди пула и в работе
+_active = 0
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    with _lock:
+        # После fork потоки родителя не существуют, пул создается заново
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['JOBS_MAX_WORKERS'], thread_name_prefix='job'
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def running_jobs() -> int:
+    """Число задач в очереди и в работе в текущем процессе"""
+    with _lock:
+        return _active if _executor_pid == os.getpid() else 0
+
+
+def _connect() -> Any:
+    # Отдельное подключение: обновление прогресса не должно коммитить работу задачи
+    return db.connect()
+
+
+class JobContext:
+    def __init__(self, job_id: int):
+        self.id = job_id
+
+    def _update(self, **fields: Any) -> None:
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        conn = _connect()
+        try:
+            conn.execute(
+                f'UPDATE jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                (*fields.values(), self.id)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def progress(self, processed: int, total: Optional[int] = None, errors: Optional[int] = None) -> None:
+        fields: Dict[str, Any] = {'processed': processed}
+        if total is not None:
+            fields['total'] = total
+        if errors is not None:
+            fields['errors_count'] = errors
+        self._update(**fields)
+
+
+def submit_job(kind: str, func: Callable[..., Any], *args: Any, user_id: Optional[int] = None) -> int:
+    """Создать задачу и запустить func(job, *args) в фоне.
+
+    Результат func (словарь) сохраняется в jobs.result как JSON.
+    Изменения текущего запроса коммитятся до запуска: задача читает БД своим подключением.
+    """
+    commit_db()
+    conn = _connect()
+    try:
+        job_id = conn.execute(
+            "INSERT INTO jobs (kind, status, created_by, worker_pid) VALUES (?, 'queued', ?, ?) RETURNING id",
+            (kind, user_id, os.getpid())
+        ).fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+
+    global _active
+    app = current_app._get_current_object()
+    executor = _get_executor()
+    with _lock:
+        _active += 1
+    executor.submit(_run, app, job_id, func, args)
+    return job_id
+
+
+def _run(app: Flask, job_id: int, func: Callable[..., Any], args: Any) -> None:
+    global _active
+    try:
+        _run_job(app, job_id, func, args)
+    finally:
+        with _lock:
+            _active -= 1
+
+
+def _run_job(app: Flask, job_id: int, func: Callable[..., Any], args: Any) -> None:
+    with app.app_context():
+        job = JobContext(job_id)
+        job._update(status='running')
+        try:
+            result = func(job, *args)
+            # Задача - своя единица работы: изменения видны до отметки о завершении
+            commit_db()
+        except Exception:
+            rollback_db()
+            app.logger.exception('Job %s failed', job_id)
+            job._update(status='failed', error=traceback.format_exc(limit=5))
+        else:
+            job._update(status='completed', result=json.dumps(result or {}, ensure_ascii=False))
+
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    """Состояние задачи; задачи умерших воркеров помечаются как прерванные"""
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        if job['status'] in ('queued', 'running') and not _pid_alive(job['worker_pid']):
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                ('Воркер был перезапущен до завершения задачи', job_id)
+            )
+            conn.commit()
+            job['status'] = 'failed'
+            job['error'] = 'Воркер был перезапущен до завершения задачи'
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+    finally:
+        conn.close()
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def init_app(app: Flask) -> None:
+    app.config.setdefault('JOBS_MAX_WORKERS', int(os.environ.get('JOBS_MAX_WORKERS', '2')))
@@ -1,32 +1,149 @@
+import hashlib
+import json
+import logging
+import secrets
 import sqlite3
-from flask import current_app, g
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
 from flask_login import UserMixin
 from werkzeug.security import check_password_hash, generate_password_hash
 from datetime import datetime
-from typing import Optional, Any, List, Union
+from typing import Optional, Any, Dict, Iterator, List, Tuple, Union
+from app.blocking import run_blocking
+from app.db import connect, connect_readonly
+from app.queries import REQUEST_HISTORY_SQL, timestamp_ago
 
-def get_db() -> sqlite3.Connection:
-    """Получение подключения к базе данных"""
+def get_db(readonly: bool = False) -> Any:
+    """Получение подключения к базе данных (sqlite3.Connection, см. app.db).
+
+    Подключение живет в g, то есть свое у каждого контекста приложения
+    (запроса). С потоковыми воркерами каждый поток работает со своим
+    подключением, передавать его в другие потоки нельзя.
+
+    Все изменения контекста - одна транзакция (единица работы): методы
+    моделей не коммитят, close_db при закрытии контекста коммитит ее
+    один раз или откатывает при ошибке. Вложенные операции, которые
+    нужно откатить отдельно, выполняются в savepoint().
+
+    readonly=True - только чтение, данные могут отставать от основной БД
+    (реплика, если она настроена и достаточно свежая).
+    """
+    if readonly:
+        if 'db_read' not in g:
+            g.db_read = connect_readonly()
+        if g.db_read is not None:
+            return g.db_read
     if 'db' not in g:
-        database_path = current_app.config.get('DATABASE', 'app.db')
-        g.db = sqlite3.connect(database_path)
-        g.db.row_factory = sqlite3.Row
+        g.db = connect()
+        if has_request_context():
+            # При закрытии контекста запроса уже нет, а в журнал коммитов нужен адрес
+            g.db_request = f'{request.method} {request.path}'
     return g.db
 
+def commit_db() -> None:
+    """Закоммитить единицу работы текущего контекста раньше его закрытия.
+
+    Нужно только там, где изменения должны стать видны другим
+    подключениям сразу (фоновые задачи, пачки импорта)
+    """
+    db = g.get('db')
+    if db is not None and db.in_transaction:
+        db.commit()
+        g.db_commits = g.get('db_commits', 0) + 1
+
+
+def rollback_db() -> None:
+    """Откатить незакоммиченные изменения текущего контекста"""
+    db = g.get('db')
+    if db is not None and db.in_transaction:
+        db.rollback()
+
+
+@contextmanager
+def savepoint(name: str = 'nested') -> Iterator[Any]:
+    """Вложенная операция внутри единицы работы: при исключении откатывается только она"""
+    db = get_db()
+    if isinstance(db, sqlite3.Connection) and not db.in_transaction:
+        # Иначе RELEASE внешней точки сохранения закоммитит транзакцию. IMMEDIATE: блокировка
+        # записи берется сразу (с ожиданием DATABASE_TIMEOUT), а не при первой записи после
+        # чтений, где в WAL чужой коммит дает SQLITE_BUSY без ожидания
+        db.execute('BEGIN IMMEDIATE')
+    db.execute(f'SAVEPOINT {name}')
+    try:
+        yield db
+    except BaseException:
+        db.execute(f'ROLLBACK TO SAVEPOINT {name}')
+        db.execute(f'RELEASE SAVEPOINT {name}')
+        raise
+    db.execute(f'RELEASE SAVEPOINT {name}')
+
+
+def after_commit(func: Any) -> None:
+    """Выполнить func() после успешного коммита единицы работы (в close_db, вне транзакции)"""
+    g.setdefault('after_commit', []).append(func)
+
+
 def close_db(e: Optional[BaseException] = None) -> None:
-    """Закрытие подключения к базе данных"""
-    db = g.pop('db', None)
-    if db is not None:
-        db.close()
+    """Завершение единицы работы (коммит или откат при ошибке) и закрытие подключений"""
+    committed = False
+    try:
+        if e is None:
+            commit_db()
+            committed = True
+        else:
+            rollback_db()
+    finally:
+        for name in ('db', 'db_read'):
+            db = g.pop(name, None)
+            if db is not None:
+                db.close()
+        callbacks = g.pop('after_commit', [])
+    if committed:
+        for func in callbacks:
+            func()
+    # Число коммитов за запрос: больше одного - кто-то коммитит в обход единицы работы
+    commits = g.pop('db_commits', 0)
+    label = g.pop('db_request', None)
+    if commits and label:
+        current_app.logger.log(logging.WARNING if commits > 1 else logging.DEBUG,
+                               'DB commits: %d (%s)', commits, label)
+
+def log_action(user_id: int, action: str, entity: str, entity_id: Optional[int] = None,
+               details: Optional[Dict[str, Any]] = None) -> None:
+    """Логирование действий пользователя (details - подробности пакетных операций)"""
+    db = get_db()
+    db.execute(
+        'INSERT INTO logs (user_id, action, entity, entity_id, details) VALUES (?, ?, ?, ?, ?)',
+        (user_id, action, entity, entity_id,
+         json.dumps(details, ensure_ascii=False) if details is not None else None)
+    )
+
+def get_version(name: str) -> int:
+    """Текущая версия набора данных (используется в ключах кешей)"""
+    db = get_db()
+    row = db.execute('SELECT version FROM versions WHERE name = ?', (name,)).fetchone()
+    return row['version'] if row else 0
+
+def get_versions(*names: str) -> Dict[str, Tuple[int, Optional[str]]]:
+    """Версии и время изменения нескольких наборов данных одним запросом"""
+    db = get_db()
+    placeholders = ', '.join('?' for _ in names)
+    rows = db.execute(
+        f'SELECT name, version, updated_at FROM versions WHERE name IN ({placeholders})',
+        names
+    ).fetchall()
+    versions: Dict[str, Tuple[int, Optional[str]]] = {name: (0, None) for name in names}
+    versions.update({row['name']: (row['version'], row['updated_at']) for row in rows})
+    return versions
 
-def log_action(user_id: int, action: str, entity: str, entity_id: Optional[int] = None) -> None:
-    """Логирование действий пользователя"""
+def bump_version(name: str) -> None:
+    """Увеличить версию набора данных"""
     db = get_db()
     db.execute(
-        'INSERT INTO logs (user_id, action, entity, entity_id) VALUES (?, ?, ?, ?)',
-        (user_id, action, entity, entity_id)
+        '''INSERT INTO versions (name, version) VALUES (?, 1)
+           ON CONFLICT(name) DO UPDATE SET version = versions.version + 1, updated_at = CURRENT_TIMESTAMP''',
+        (name,)
     )
-    db.commit()
 
 class User(UserMixin):
     def __init__(self, id: int, email: str, password: str, role: str, 
@@ -75,19 +192,18 @@ class User(UserMixin):
         return None
     
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password, password)
+        return run_blocking(check_password_hash, self.password, password)
     
     @staticmethod
     def create(email: str, password: str, role: str) -> Optional[int]:
         db = get_db()
-        hashed_password = generate_password_hash(password)
+        hashed_password = run_blocking(generate_password_hash, password)
         
-        cursor = db.execute(
-            'INSERT INTO users (email, password, role) VALUES (?, ?, ?)',
+        user_id = db.execute(
+            'INSERT INTO users (email, password, role) VALUES (?, ?, ?) RETURNING id',
             (email, hashed_password, role)
-        )
-        db.commit()
-        return cursor.lastrowid
+        ).fetchone()[0]
+        return user_id
     
     @staticmethod
     def get_all():
@@ -112,7 +228,6 @@ class User(UserMixin):
             'UPDATE users SET password = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
             (password_hash, user_id)
         )
-        db.commit()
         return True
 
 class Supplier:
@@ -128,12 +243,11 @@ class Supplier:
     @staticmethod
     def create(user_id: int, name: str, info: Optional[str] = None) -> Optional[int]:
         db = get_db()
-        cursor = db.execute(
-            'INSERT INTO suppliers (user_id, name, info) VALUES (?, ?, ?)',
+        supplier_id = db.execute(
+            'INSERT INTO suppliers (user_id, name, info) VALUES (?, ?, ?) RETURNING id',
             (user_id, name, info)
-        )
-        db.commit()
-        return cursor.lastrowid
+        ).fetchone()[0]
+        return supplier_id
     
     @staticmethod
     def get_by_user_id(user_id: int) -> Optional['Supplier']:
@@ -178,7 +292,8 @@ class Supplier:
             'UPDATE suppliers SET name = ?, info = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
             (name, info, supplier_id)
         )
-        db.commit()
+        # Название торгового выводится в заявках и карточках товаров (ETag, app/http_cache.py)
+        bump_version('suppliers')
         return True
     
     @staticmethod
@@ -200,7 +315,8 @@ class Supplier:
             'UPDATE suppliers SET name = ?, info = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
             (name, info, supplier_id)
         )
-        db.commit()
+        # Название торгового выводится в заявках и карточках товаров (ETag, app/http_cache.py)
+        bump_version('suppliers')
         return True
 
 class Shop:
@@ -216,18 +332,17 @@ class Shop:
     @staticmethod
     def create(supplier_id, name, info=None, business_type=None):
         db = get_db()
-        cursor = db.execute(
-            'INSERT INTO shops (supplier_id, name, info, business_type) VALUES (?, ?, ?, ?)',
+        shop_id = db.execute(
+            'INSERT INTO shops (supplier_id, name, info, business_type) VALUES (?, ?, ?, ?) RETURNING id',
             (supplier_id, name, info, business_type)
-        )
-        db.commit()
-        return cursor.lastrowid
+        ).fetchone()[0]
+        return shop_id
     
     @staticmethod
     def get_by_supplier_id(supplier_id):
         db = get_db()
         shops = db.execute(
-            'SELECT * FROM shops WHERE supplier_id = ? ORDER BY created_at DESC',
+            'SELECT * FROM shops WHERE supplier_id = ? AND deleted_at IS NULL ORDER BY created_at DESC',
             (supplier_id,)
         ).fetchall()
         
@@ -248,6 +363,7 @@ class Shop:
             '''SELECT sh.*, s.name as supplier_name 
                FROM shops sh 
                JOIN suppliers s ON sh.supplier_id = s.id 
+               WHERE sh.deleted_at IS NULL
                ORDER BY sh.created_at DESC'''
         ).fetchall()
         
@@ -260,21 +376,26 @@ class Shop:
             'UPDATE shops SET name = ?, info = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
             (name, info, shop_id)
         )
-        db.commit()
+        # Название магазина выводится в заявках и карточках товаров (ETag, app/http_cache.py)
+        bump_version('shops')
         return True
     
     @staticmethod
     def delete(shop_id):
+        """Пометить магазин удаленным; заявки и заказы магазина остаются, строку убирает collect-garbage"""
         db = get_db()
-        db.execute('DELETE FROM shops WHERE id = ?', (shop_id,))
-        db.commit()
+        db.execute(
+            '''UPDATE shops SET deleted_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+               WHERE id = ? AND deleted_at IS NULL''',
+            (shop_id,)
+        )
         return True
     
     @staticmethod
     def get_by_id(shop_id):
         db = get_db()
         shop = db.execute(
-            'SELECT * FROM shops WHERE id = ?',
+            'SELECT * FROM shops WHERE id = ? AND deleted_at IS NULL',
             (shop_id,)
         ).fetchone()
         
@@ -316,20 +437,24 @@ class Category:
     @staticmethod
     def create(name, description=None):
         db = get_db()
-        cursor = db.execute(
-            'INSERT INTO categories (name, description) VALUES (?, ?)',
+        category_id = db.execute(
+            'INSERT INTO categories (name, description) VALUES (?, ?) RETURNING id',
             (name, description)
-        )
-        db.commit()
-        return cursor.lastrowid
+        ).fetchone()[0]
+        bump_version('catalogue')
+        return category_id
 
 class Product:
     @staticmethod
     def delete(product_id):
-        """Удалить товар по ID"""
+        """Пометить товар удаленным; позиции заявок и заказов его сохраняют, строку убирает collect-garbage"""
         db = get_db()
-        db.execute('DELETE FROM products WHERE id = ?', (product_id,))
-        db.commit()
+        db.execute(
+            '''UPDATE products SET deleted_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+               WHERE id = ? AND deleted_at IS NULL''',
+            (product_id,)
+        )
+        bump_version('catalogue')
     def __init__(self, id, category_id, name, description, price, 
                  wholesale_price=None, image_url=None, 
                  created_at=None, updated_at=None):
@@ -348,14 +473,14 @@ class Product:
                wholesale_price=None, image_url=None):
         """Создает глобальный товар (только админ)"""
         db = get_db()
-        cursor = db.execute(
+        product_id = db.execute(
             '''INSERT INTO products (category_id, name, description, 
                                    price, wholesale_price, image_url) 
-               VALUES (?, ?, ?, ?, ?, ?)''',
+               VALUES (?, ?, ?, ?, ?, ?) RETURNING id''',
             (category_id, name, description, price, wholesale_price, image_url)
-        )
-        db.commit()
-        return cursor.lastrowid
+        ).fetchone()[0]
+        bump_version('catalogue')
+        return product_id
     
     @staticmethod
     def get_all():
@@ -365,11 +490,18 @@ class Product:
             '''SELECT p.*, c.name as category_name 
                FROM products p 
                LEFT JOIN categories c ON p.category_id = c.id 
+               WHERE p.deleted_at IS NULL
                ORDER BY p.created_at DESC'''
         ).fetchall()
         
         return products
     
+    @staticmethod
+    def count():
+        """Количество товаров в каталоге"""
+        db = get_db()
+        return db.execute('SELECT COUNT(*) FROM products WHERE deleted_at IS NULL').fetchone()[0]
+    
     @staticmethod
     def get_by_category(category_id=None):
         """Получить товары по категории"""
@@ -379,7 +511,7 @@ class Product:
                 '''SELECT p.*, c.name as category_name 
                    FROM products p 
                    LEFT JOIN categories c ON p.category_id = c.id 
-                   WHERE p.category_id = ?
+                   WHERE p.category_id = ? AND p.deleted_at IS NULL
                    ORDER BY p.name''',
                 (category_id,)
             ).fetchall()
@@ -388,6 +520,7 @@ class Product:
                 '''SELECT p.*, c.name as category_name 
                    FROM products p 
                    LEFT JOIN categories c ON p.category_id = c.id 
+                   WHERE p.deleted_at IS NULL
                    ORDER BY p.name'''
             ).fetchall()
         
@@ -401,12 +534,26 @@ class Product:
             '''SELECT p.*, c.name as category_name 
                FROM products p 
                LEFT JOIN categories c ON p.category_id = c.id 
-               WHERE p.id = ?''',
+               WHERE p.id = ? AND p.deleted_at IS NULL''',
             (product_id,)
         ).fetchone()
         
         return product
     
+    @staticmethod
+    def unavailable_ids(product_ids):
+        """ID из списка, которых нет среди неудаленных товаров"""
+        product_ids = set(product_ids)
+        if not product_ids:
+            return set()
+        db = get_db()
+        live = db.execute(
+            f'''SELECT id FROM products
+                WHERE id IN ({', '.join('?' for _ in product_ids)}) AND deleted_at IS NULL''',
+            list(product_ids)
+        ).fetchall()
+        return product_ids - {row['id'] for row in live}
+    
     @staticmethod
     def update(product_id, category_id, name, description, price, 
                wholesale_price=None, image_url=None):
@@ -420,7 +567,7 @@ class Product:
                WHERE id = ?''',
             (category_id, name, description, price, wholesale_price, image_url, product_id)
         )
-        db.commit()
+        bump_version('catalogue')
 
 
 class Request:
@@ -433,6 +580,32 @@ class Request:
         self.created_at = created_at
         self.updated_at = updated_at
     
+    @staticmethod
+    def create(shop_id, supplier_id, items):
+        """Создать заявку с позициями {product_id: quantity}"""
+        db = get_db()
+        request_id = db.execute(
+            'INSERT INTO requests (shop_id, supplier_id) VALUES (?, ?) RETURNING id',
+            (shop_id, supplier_id)
+        ).fetchone()[0]
+        db.executemany(
+            'INSERT INTO request_items (request_id, product_id, quantity) VALUES (?, ?, ?)',
+            [(request_id, product_id, quantity) for product_id, quantity in items.items()]
+        )
+        Request.record_changes('id = ?', (request_id,), 'created')
+        bump_version('requests')
+        return request_id
+    
+    @staticmethod
+    def record_changes(where, params, kind):
+        """Записать изменение заявок по условию в журнал request_changes"""
+        db = get_db()
+        db.execute(
+            f'''INSERT INTO request_changes (request_id, supplier_id, shop_id, kind, status)
+                SELECT id, supplier_id, shop_id, ?, status FROM requests WHERE {where}''',
+            (kind, *params)
+        )
+    
     @staticmethod
     def get_by_id(request_id):
         """Получить заявку по ID"""
@@ -447,13 +620,33 @@ class Request:
         ).fetchone()
         return request
     
+    @staticmethod
+    def get_version(request_id):
+        """Статус и время изменения заявки (для валидаторов кеша)"""
+        db = get_db()
+        return db.execute(
+            'SELECT id, status, updated_at FROM requests WHERE id = ?',
+            (request_id,)
+        ).fetchone()
+    
+    @staticmethod
+    def touch(request_id):
+        """Отметить изменение состава заявки"""
+        db = get_db()
+        db.execute(
+            'UPDATE requests SET updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+            (request_id,)
+        )
+        Request.record_changes('id = ?', (request_id,), 'items')
+        bump_version('requests')
+    
     @staticmethod
     def get_items(request_id):
-        """Получить товары заявки"""
+        """Получить товары заявки (включая удаленные из каталога товары)"""
         db = get_db()
         items = db.execute(
             '''SELECT ri.*, p.name as product_name, p.description as product_description, 
-                      p.price, p.wholesale_price, p.image_url
+                      p.price, p.wholesale_price, p.image_url, p.deleted_at as product_deleted_at
                FROM request_items ri
                JOIN products p ON ri.product_id = p.id
                WHERE ri.request_id = ?
@@ -470,7 +663,8 @@ class Request:
             'UPDATE requests SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
             (status, request_id)
         )
-        db.commit()
+        Request.record_changes('id = ?', (request_id,), 'status')
+        bump_version('requests')
     
     @staticmethod
     def add_item(request_id, product_id, quantity):
@@ -494,7 +688,7 @@ class Request:
                 'INSERT INTO request_items (request_id, product_id, quantity) VALUES (?, ?, ?)',
                 (request_id, product_id, quantity)
             )
-        db.commit()
+        Request.touch(request_id)
     
     @staticmethod
     def remove_item(request_id, product_id):
@@ -504,14 +698,216 @@ class Request:
             'DELETE FROM request_items WHERE request_id = ? AND product_id = ?',
             (request_id, product_id)
         )
-        db.commit()
+        Request.touch(request_id)
+    
+    @staticmethod
+    def get_picking_list(where, params):
+        """Сводный лист сборки: итог по каждому товару в выбранных заявках одним запросом.
+        
+        Возвращает курсор, строки упорядочены по категории и названию товара
+        """
+        db = get_db()
+        return db.execute(
+            f'''SELECT COALESCE(c.name, 'Без категории') as category_name,
+                      p.id as product_id, p.sku, p.name as product_name,
+                      SUM(ri.quantity) as total_quantity,
+                      COUNT(DISTINCT r.id) as requests_count,
+                      p.price, p.wholesale_price,
+                      SUM(ri.quantity) * p.price as total_price
+               FROM requests r
+               JOIN request_items ri ON ri.request_id = r.id
+               JOIN products p ON ri.product_id = p.id
+               LEFT JOIN categories c ON p.category_id = c.id
+               WHERE {where}
+               GROUP BY p.id, c.id
+               ORDER BY c.name IS NULL, c.name, p.name''',
+            params
+        )
+
+    @staticmethod
+    def get_export_items(where, params, by_supplier=False):
+        """Позиции выбранных заявок для общей выгрузки одним запросом.
+
+        Заявки, перенесенные в заказы, входят в выгрузку по фильтру с ценами
+        на момент переноса. Возвращает курсор, строки упорядочены по заявке
+        (при by_supplier - сначала по торговому)
+        """
+        order = 's.name, r.supplier_id, r.id' if by_supplier else 'r.id'
+        db = get_db()
+        return db.execute(
+            f'''SELECT r.id as request_id, r.status, r.created_at, r.supplier_id,
+                      s.name as supplier_name, sh.name as shop_name,
+                      COALESCE(c.name, 'Без категории') as category_name,
+                      p.sku, p.name as product_name, r.quantity,
+                      COALESCE(r.price, p.price) as price,
+                      r.quantity * COALESCE(r.price, p.price) as total_price
+               FROM {REQUEST_HISTORY_SQL} r
+               JOIN suppliers s ON r.supplier_id = s.id
+               JOIN shops sh ON r.shop_id = sh.id
+               JOIN products p ON r.product_id = p.id
+               LEFT JOIN categories c ON p.category_id = c.id
+               WHERE {where}
+               ORDER BY {order}, p.name''',
+            params
+        )
+
+    @staticmethod
+    def batch_update_status(where, params, status):
+        """Сменить статус заявок по условию одним UPDATE"""
+        db = get_db()
+        ids = [row['id'] for row in db.execute(
+            f'''UPDATE requests SET status = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE {where} AND status != ? RETURNING id''',
+            (status, *params, status)
+        ).fetchall()]
+        if ids:
+            Request.record_changes(f'id IN ({", ".join("?" for _ in ids)})', ids, 'status')
+            bump_version('requests')
+        return ids
+    
+    @staticmethod
+    def batch_delete(where, params):
+        """Удалить заявки по условию вместе с позициями"""
+        db = get_db()
+        Request.record_changes(where, params, 'deleted')
+        db.execute(
+            f'DELETE FROM request_items WHERE request_id IN (SELECT id FROM requests WHERE {where})',
+            params
+        )
+        ids = [row['id'] for row in db.execute(
+            f'DELETE FROM requests WHERE {where} RETURNING id', params
+        ).fetchall()]
+        if ids:
+            bump_version('requests')
+        return ids
     
     @staticmethod
     def delete(request_id):
         """Удалить заявку по ID"""
         db = get_db()
+        Request.record_changes('id = ?', (request_id,), 'deleted')
         # Сначала удаляем связанные позиции заявки
         db.execute('DELETE FROM request_items WHERE request_id = ?', (request_id,))
         # Потом удаляем саму заявку
         db.execute('DELETE FROM requests WHERE id = ?', (request_id,))
-        db.commit()
\ No newline at end of file
+        bump_version('requests')
+
+class Order:
+    @staticmethod
+    def get_all(limit=200):
+        """Последние заказы"""
+        db = get_db()
+        return db.execute(
+            '''SELECT o.*, sh.name as shop_name, s.name as supplier_name,
+                      (SELECT COUNT(*) FROM order_items oi WHERE oi.order_id = o.id) as items_count
+               FROM orders o
+               JOIN shops sh ON o.shop_id = sh.id
+               LEFT JOIN suppliers s ON o.supplier_id = s.id
+               ORDER BY o.created_at DESC
+               LIMIT ?''',
+            (limit,)
+        ).fetchall()
+    
+    @staticmethod
+    def get_by_id(order_id):
+        """Получить заказ по ID"""
+        db = get_db()
+        return db.execute(
+            '''SELECT o.*, sh.name as shop_name, s.name as supplier_name
+               FROM orders o
+               JOIN shops sh ON o.shop_id = sh.id
+               LEFT JOIN suppliers s ON o.supplier_id = s.id
+               WHERE o.id = ?''',
+            (order_id,)
+        ).fetchone()
+    
+    @staticmethod
+    def get_by_shop(shop_id, limit=100):
+        """Последние заказы магазина (перенесенные заявки)"""
+        db = get_db()
+        return db.execute(
+            '''SELECT o.*, (SELECT COUNT(*) FROM order_items oi WHERE oi.order_id = o.id) as items_count
+               FROM orders o
+               WHERE o.shop_id = ?
+               ORDER BY o.created_at DESC
+               LIMIT ?''',
+            (shop_id, limit)
+        ).fetchall()
+    
+    @staticmethod
+    def get_by_request_id(request_id):
+        """Заказ, в который перенесена заявка"""
+        db = get_db()
+        return db.execute(
+            'SELECT id, supplier_id FROM orders WHERE request_id = ?',
+            (request_id,)
+        ).fetchone()
+    
+    @staticmethod
+    def get_items(order_id):
+        """Позиции заказа с ценами на момент оформления"""
+        db = get_db()
+        return db.execute(
+            '''SELECT oi.*, p.name as product_name, p.sku, oi.quantity * oi.price as total
+               FROM order_items oi
+               JOIN products p ON oi.product_id = p.id
+               WHERE oi.order_id = ?
+               ORDER BY p.name''',
+            (order_id,)
+        ).fetchall()
+
+class ApiToken:
+    @staticmethod
+    def hash_token(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def create(supplier_id, name):
+        """Создать токен; открытое значение возвращается только здесь"""
+        token = secrets.token_urlsafe(32)
+        db = get_db()
+        token_id = db.execute(
+            'INSERT INTO api_tokens (supplier_id, name, token_hash) VALUES (?, ?, ?) RETURNING id',
+            (supplier_id, name, ApiToken.hash_token(token))
+        ).fetchone()[0]
+        return token_id, token
+    
+    @staticmethod
+    def get_by_token(token):
+        """Действующий токен по открытому значению"""
+        db = get_db()
+        return db.execute(
+            '''SELECT * FROM api_tokens
+               WHERE token_hash = ? AND revoked_at IS NULL''',
+            (ApiToken.hash_token(token),)
+        ).fetchone()
+    
+    @staticmethod
+    def get_by_supplier_id(supplier_id):
+        """Токены торгового"""
+        db = get_db()
+        return db.execute(
+            '''SELECT id, name, created_at, last_used_at, revoked_at FROM api_tokens
+               WHERE supplier_id = ? ORDER BY created_at DESC''',
+            (supplier_id,)
+        ).fetchall()
+    
+    @staticmethod
+    def mark_used(token_id):
+        """Отметить использование не чаще раза в 5 минут, чтобы не писать в БД на каждый запрос"""
+        db = get_db()
+        db.execute(
+            '''UPDATE api_tokens SET last_used_at = CURRENT_TIMESTAMP
+               WHERE id = ? AND (last_used_at IS NULL OR last_used_at < ?)''',
+            (token_id, timestamp_ago(minutes=5))
+        )
+    
+    @staticmethod
+    def revoke(token_id, supplier_id):
+        """Отозвать токен торгового"""
+        db = get_db()
+        db.execute(
+            '''UPDATE api_tokens SET revoked_at = CURRENT_TIMESTAMP
+               WHERE id = ? AND supplier_id = ? AND revoked_at IS NULL''',
+            (token_id, supplier_id)
+        )
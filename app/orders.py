@@ -0,0 +1,72 @@
+"""Перенос завершенных заявок в заказы.
+
+Заявки переносятся пачкой: заказы, позиции с ценами на момент переноса
+и удаление из requests/request_items выполняются несколькими
+INSERT ... SELECT / DELETE в одной точке сохранения. Рабочие таблицы заявок
+остаются небольшими, история хранится в orders/order_items.
+orders.request_id - номер исходной заявки без внешнего ключа; торговый
+видит заказы в списке заявок магазина, старые ссылки на заявку ведут
+на заказ.
+"""
+import click
+from flask import Flask
+from typing import Any, List, Optional
+from app import planner
+from app.models import Request, bump_version, log_action, savepoint
+from app.queries import timestamp_ago
+
+
+def convert_requests(where: str, params: List[Any], user_id: Optional[int] = None) -> List[int]:
+    """Перенести завершенные заявки, подходящие под условие, в заказы. Возвращает ID заявок"""
+    with savepoint('convert_requests') as db:
+        db.execute('DELETE FROM archiving_requests')
+        db.execute(
+            f'''INSERT INTO archiving_requests (request_id)
+                SELECT id FROM requests WHERE status = 'completed' AND {where}''',
+            params
+        )
+        request_ids = [row[0] for row in db.execute('SELECT request_id FROM archiving_requests')]
+        if not request_ids:
+            return []
+
+        # Сумма заказа и цены позиций - по текущим ценам товаров (снимок на момент переноса)
+        db.execute(
+            '''INSERT INTO orders (shop_id, supplier_id, request_id, status, total_price, created_at, updated_at)
+               SELECT r.shop_id, r.supplier_id, r.id, 'completed',
+                      COALESCE(SUM(ri.quantity * p.price), 0), r.created_at, CURRENT_TIMESTAMP
+               FROM requests r
+               JOIN archiving_requests a ON a.request_id = r.id
+               LEFT JOIN request_items ri ON ri.request_id = r.id
+               LEFT JOIN products p ON p.id = ri.product_id
+               GROUP BY r.id'''
+        )
+        db.execute(
+            '''INSERT INTO order_items (order_id, product_id, quantity, price)
+               SELECT o.id, ri.product_id, ri.quantity, p.price
+               FROM archiving_requests a
+               JOIN orders o ON o.request_id = a.request_id
+               JOIN request_items ri ON ri.request_id = a.request_id
+               JOIN products p ON p.id = ri.product_id'''
+        )
+        Request.record_changes('id IN (SELECT request_id FROM archiving_requests)', (), 'archived')
+        db.execute('''DELETE FROM request_items
+                      WHERE request_id IN (SELECT request_id FROM archiving_requests)''')
+        # Ссылка orders.request_id остается как номер исходной заявки
+        db.execute('DELETE FROM requests WHERE id IN (SELECT request_id FROM archiving_requests)')
+        db.execute('DELETE FROM archiving_requests')
+        bump_version('requests')
+
+    if user_id is not None:
+        log_action(user_id, 'convert', 'request', details={'orders': len(request_ids), 'requests': request_ids})
+    planner.analyze_after_bulk(('requests', 'request_items', 'orders', 'order_items'), len(request_ids))
+    return request_ids
+
+
+def init_app(app: Flask) -> None:
+    @app.cli.command('archive-requests')
+    @click.option('--older-than', default=30, show_default=True,
+                  help='Переносить заявки, завершенные больше N дней назад')
+    def archive_requests_command(older_than: int) -> None:
+        """Перенести старые завершенные заявки в заказы"""
+        request_ids = convert_requests('updated_at < ?', [timestamp_ago(days=older_than)])
+        click.echo(f'Перенесено в заказы: {len(request_ids)}')
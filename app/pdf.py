@@ -0,0 +1,275 @@
+"""PDF заявок и листов сборки (reportlab).
+
+Шрифты и стили страниц создаются один раз на процесс при первом
+документе. Готовые PDF хранятся в файлах (общие для всех воркеров),
+ключ включает версию данных: для заявки - время изменения и статус
+заявки и версию каталога, для листа сборки - версии заявок и каталога.
+Пока версии не изменились, документ повторно отдается с диска.
+
+Документы больше PDF_JOB_ROWS строк собираются фоновой задачей
+(app.jobs): reportlab пишет страницы в файл, а не в память, файл
+отдается send_file по частям.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from flask import Flask, current_app
+from functools import lru_cache
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Sequence
+from xml.sax.saxutils import escape
+from app.cache import FragmentCache
+from app.jobs import JobContext
+from app.models import Request, get_versions
+from app.queries import request_filter_sql
+
+FONT = 'DejaVuSans'
+FONT_BOLD = 'DejaVuSans-Bold'
+PROGRESS_EVERY_PAGES = 10
+
+_fonts_lock = threading.Lock()
+_fonts_registered = False
+
+
+def _register_fonts(font_dir: str) -> None:
+    """TTF со шрифтами кириллицы; регистрация в reportlab общая для процесса"""
+    global _fonts_registered
+    with _fonts_lock:
+        if _fonts_registered:
+            return
+        from reportlab.lib.fonts import addMapping
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        pdfmetrics.registerFont(TTFont(FONT, os.path.join(font_dir, f'{FONT}.ttf')))
+        pdfmetrics.registerFont(TTFont(FONT_BOLD, os.path.join(font_dir, f'{FONT_BOLD}.ttf')))
+        addMapping(FONT, 0, 0, FONT)
+        addMapping(FONT, 1, 0, FONT_BOLD)
+        _fonts_registered = True
+
+
+@lru_cache(maxsize=None)
+def _styles() -> Dict[str, Any]:
+    """Стили абзацев и таблиц (создаются один раз на процесс)"""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import TableStyle
+
+    base = ParagraphStyle('base', fontName=FONT, fontSize=9, leading=11)
+    return {
+        'title': ParagraphStyle('title', parent=base, fontName=FONT_BOLD, fontSize=16, leading=20, spaceAfter=8),
+        'text': ParagraphStyle('text', parent=base, fontSize=10, leading=13),
+        'cell': base,
+        'table': TableStyle([
+            ('FONT', (0, 0), (-1, -1), FONT, 9),
+            ('FONT', (0, 0), (-1, 0), FONT_BOLD, 9),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#366092')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
+            ('FONT', (0, -1), (-1, -1), FONT_BOLD, 9),
+        ]),
+    }
+
+
+def _money(value: Optional[float]) -> str:
+    return f'{value or 0:,.0f} ₸'.replace(',', ' ')
+
+
+def _build(out: BinaryIO, title: str, story: List[Any], progress: Optional[Callable[[int], None]]) -> int:
+    """Собрать документ A4 с колонтитулом; возвращает число страниц"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.platypus import SimpleDocTemplate
+
+    printed_at = datetime.now().strftime('%d.%m.%Y %H:%M')
+    pages = [0]
+
+    def on_page(canvas: Any, doc: Any) -> None:
+        pages[0] = doc.page
+        canvas.saveState()
+        canvas.setFont(FONT, 8)
+        canvas.drawString(15 * mm, 10 * mm, f'{title} · {printed_at}')
+        canvas.drawRightString(A4[0] - 15 * mm, 10 * mm, f'стр. {doc.page}')
+        canvas.restoreState()
+        if progress is not None and doc.page % PROGRESS_EVERY_PAGES == 0:
+            progress(doc.page)
+
+    doc = SimpleDocTemplate(out, pagesize=A4, title=title, leftMargin=15 * mm, rightMargin=15 * mm,
+                            topMargin=15 * mm, bottomMargin=18 * mm)
+    doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
+    return pages[0]
+
+
+def _table(header: Sequence[str], rows: List[List[Any]], widths: Sequence[float]) -> Any:
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Table
+
+    # Шапка таблицы повторяется на каждой странице
+    table = Table([list(header)] + rows, colWidths=[width * mm for width in widths], repeatRows=1)
+    table.setStyle(_styles()['table'])
+    return table
+
+
+def load_request(request_id: int) -> Optional[Dict[str, Any]]:
+    request_info = Request.get_by_id(request_id)
+    if not request_info:
+        return None
+    return {'request': request_info, 'items': Request.get_items(request_id)}
+
+
+def draw_request(data: Dict[str, Any], out: BinaryIO, progress: Optional[Callable[[int], None]] = None) -> int:
+    """Заявка: реквизиты и позиции с итогом"""
+    from reportlab.platypus import Paragraph, Spacer
+
+    styles = _styles()
+    request_info = data['request']
+    title = f'Заявка #{request_info["id"]}'
+    story = [
+        Paragraph(title, styles['title']),
+        Paragraph(f'Магазин: {escape(request_info["shop_name"])}', styles['text']),
+        Paragraph(f'Торговый: {escape(request_info["supplier_name"])}', styles['text']),
+        Paragraph(f'Дата отправки: {request_info["created_at"]}', styles['text']),
+        Paragraph(f'Статус: {request_info["status"]}', styles['text']),
+        Spacer(1, 12),
+    ]
+
+    rows: List[List[Any]] = []
+    total_quantity = total = 0
+    for number, item in enumerate(data['items'], 1):
+        item_total = item['price'] * item['quantity']
+        total_quantity += item['quantity']
+        total += item_total
+        # Paragraph разбирает разметку, поэтому текст из БД экранируется
+        rows.append([number, Paragraph(escape(item['product_name']), styles['cell']), f'{item["quantity"]} шт.',
+                     _money(item['price']), _money(item_total)])
+    rows.append(['', 'ИТОГО', f'{total_quantity} шт.', '', _money(total)])
+    story.append(_table(['№', 'Товар', 'Количество', 'Цена', 'Сумма'], rows, (10, 90, 25, 25, 30)))
+    return _build(out, title, story, progress)
+
+
+def load_picking(filters: Dict[str, Any], ids: Optional[List[int]]) -> Dict[str, Any]:
+    where, params = request_filter_sql(filters, ids, alias='r')
+    return {'filters': filters, 'ids': ids, 'items': Request.get_picking_list(where, params).fetchall()}
+
+
+def draw_picking(data: Dict[str, Any], out: BinaryIO, progress: Optional[Callable[[int], None]] = None) -> int:
+    """Лист сборки: товары по категориям с количеством и суммой"""
+    from reportlab.platypus import Paragraph, Spacer
+
+    styles = _styles()
+    title = 'Лист сборки'
+    if data['ids']:
+        selection = f'Отмечено заявок: {len(data["ids"])}'
+    else:
+        selection = ', '.join(f'{key}: {value}' for key, value in data['filters'].items()) or 'Все заявки'
+    story = [Paragraph(title, styles['title']), Paragraph(escape(selection), styles['text']), Spacer(1, 12)]
+
+    rows: List[List[Any]] = []
+    total_quantity = total = 0
+    for item in data['items']:
+        total_quantity += item['total_quantity']
+        total += item['total_price'] or 0
+        rows.append([item['category_name'], item['sku'] or '', Paragraph(escape(item['product_name']), styles['cell']),
+                     item['total_quantity'], item['requests_count'], _money(item['total_price'])])
+    rows.append(['ИТОГО', '', '', total_quantity, '', _money(total)])
+    story.append(_table(['Категория', 'Артикул', 'Товар', 'Кол-во', 'Заявок', 'Сумма'], rows,
+                        (30, 22, 63, 17, 15, 33)))
+    return _build(out, title, story, progress)
+
+
+DOCUMENTS = {
+    'request': (load_request, draw_request),
+    'picking': (load_picking, draw_picking),
+}
+
+
+class PdfCache:
+    """Готовые PDF в файлах; ключ из FragmentCache.make_key, старые версии удаляются"""
+
+    def __init__(self, directory: str, max_age: int, font_dir: str):
+        self.directory = directory
+        self.max_age = max_age
+        self.font_dir = font_dir
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.pdf')
+
+    def get(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        return path if os.path.exists(path) else None
+
+    def build(self, key: str, draw: Callable[..., int], data: Dict[str, Any],
+              progress: Optional[Callable[[int], None]] = None) -> int:
+        """Отрисовать документ в файл кеша; возвращает число страниц"""
+        # Вызывается и вне контекста приложения (пул run_blocking), настройки - из атрибутов
+        _register_fonts(self.font_dir)
+        # Атомарная запись: другие воркеры не отдадут недописанный файл
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pages = draw(data, f, progress)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._remove_stale(key)
+        return pages
+
+    def _remove_stale(self, key: str) -> None:
+        """Удалить прежние версии того же документа и давно не менявшиеся файлы"""
+        prefix = key.rsplit('-', 1)[0] + '-'
+        expired = time.time() - self.max_age
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            if filename == key + '.pdf':
+                continue
+            try:
+                if (filename.startswith(prefix) and filename.endswith('.pdf')) or os.path.getmtime(path) < expired:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def get_cache() -> PdfCache:
+    return current_app.extensions['pdf_cache']
+
+
+def request_key(request_id: int) -> Optional[str]:
+    """Ключ PDF заявки или None, если заявки нет"""
+    row = Request.get_version(request_id)
+    if not row:
+        return None
+    catalogue_version = get_versions('catalogue')['catalogue'][0]
+    return FragmentCache.make_key([f'request-{request_id}', row['updated_at'], row['status'], catalogue_version])
+
+
+def picking_key(filters: Dict[str, Any], ids: Optional[List[int]]) -> str:
+    """Ключ PDF листа сборки: выборка и версии заявок и каталога"""
+    selection = hashlib.sha1(repr((sorted(filters.items()), ids)).encode('utf-8')).hexdigest()[:12]
+    versions = get_versions('requests', 'catalogue')
+    return FragmentCache.make_key([f'picking-{selection}', versions['requests'][0], versions['catalogue'][0]])
+
+
+def build_job(job: JobContext, kind: str, key: str, *args: Any) -> Dict[str, Any]:
+    """Фоновая задача: собрать большой документ в кеш"""
+    load, draw = DOCUMENTS[kind]
+    data = load(*args)
+    if data is None:
+        raise ValueError('Документ не найден')
+    # Прогресс задачи - число готовых страниц
+    pages = get_cache().build(key, draw, data, job.progress)
+    return {'kind': kind, 'key': key, 'rows': len(data['items']), 'pages': pages}
+
+
+def init_app(app: Flask) -> None:
+    app.config.setdefault('PDF_CACHE_DIR', os.environ.get('PDF_CACHE_DIR', os.path.join(app.instance_path, 'pdf_cache')))
+    app.config.setdefault('PDF_CACHE_MAX_AGE', int(os.environ.get('PDF_CACHE_MAX_AGE', str(7 * 24 * 3600))))
+    app.config.setdefault('PDF_FONT_DIR', os.environ.get('PDF_FONT_DIR', '/usr/share/fonts/truetype/dejavu'))
+    app.config.setdefault('PDF_JOB_ROWS', int(os.environ.get('PDF_JOB_ROWS', '300')))
+    app.extensions['pdf_cache'] = PdfCache(app.config['PDF_CACHE_DIR'], app.config['PDF_CACHE_MAX_AGE'],
+                                             app.config['PDF_FONT_DIR'])
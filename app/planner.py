@@ -0,0 +1,164 @@
+"""Статистика планировщика SQLite и каталог планов запросов.
+
+- При выходе воркера Gunicorn выполняется PRAGMA optimize (хук
+  worker_exit в gunicorn.conf.py). В SQLite 3.40 optimize анализирует
+  только таблицы, которые планировщик использовал в этом подключении,
+  поэтому перед ним строятся планы запросов из каталога.
+- После пакетных изменений (импорт, перенос и удаление заявок)
+  затронутые таблицы анализируются сразу после коммита, отдельным
+  подключением, с ограничением analysis_limit.
+- Каталог - основные тяжелые запросы приложения. Их планы сохраняются в
+  query_plans как эталон; `flask query-plans` и ANALYZE после пакетных
+  изменений сообщают, если план стал хуже (полный просмотр таблицы или
+  временное B-дерево вместо индекса).
+"""
+import json
+import os
+import sqlite3
+import click
+from flask import Flask, current_app
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from app.db import connect
+from app.queries import (PRODUCT_RECENT_REQUESTS_SQL, REQUEST_LIST_SQL, SHOP_REQUESTS_SQL,
+                         request_filter_sql)
+
+
+def catalogue() -> Dict[str, Tuple[str, Sequence[Any]]]:
+    """Запросы каталога: имя -> (SQL, параметры для построения плана)"""
+    from app.reports import REPORTS
+    where, params = request_filter_sql({'status': 'pending', 'supplier_id': 1}, alias='r')
+    queries: Dict[str, Tuple[str, Sequence[Any]]] = {
+        'admin.requests': (REQUEST_LIST_SQL.format(where='1 = 1'), ()),
+        'admin.requests[filtered]': (REQUEST_LIST_SQL.format(where=where), params),
+        'supplier.shop_requests': (SHOP_REQUESTS_SQL, (1,)),
+        'admin.product_detail': (PRODUCT_RECENT_REQUESTS_SQL, (1,)),
+    }
+    for report in REPORTS.values():
+        sql, report_params = report.build({'date_from': '2000-01-01'})
+        queries[f'report.{report.name}'] = (sql, report_params)
+    return queries
+
+
+def capture_plan(conn: Any, sql: str, params: Sequence[Any]) -> List[str]:
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def capture_plans(conn: Any) -> Dict[str, List[str]]:
+    return {name: capture_plan(conn, sql, params) for name, (sql, params) in catalogue().items()}
+
+
+def _is_full_scan(step: str) -> bool:
+    # 'SCAN r' - полный просмотр; 'SCAN r USING INDEX ...' - просмотр по индексу
+    return step.startswith('SCAN ') and 'INDEX' not in step
+
+
+def regressions(baseline: List[str], current: List[str]) -> List[str]:
+    """Шаги плана, которых не было в эталоне и которые обычно означают замедление"""
+    problems = []
+    for step in current:
+        if step in baseline:
+            continue
+        if _is_full_scan(step) or step.startswith('USE TEMP B-TREE'):
+            problems.append(step)
+    return problems
+
+
+def load_baseline(conn: Any) -> Dict[str, List[str]]:
+    return {row[0]: json.loads(row[1]) for row in conn.execute('SELECT name, plan FROM query_plans')}
+
+
+def save_baseline(conn: Any, plans: Dict[str, List[str]]) -> None:
+    conn.execute('DELETE FROM query_plans')
+    conn.executemany(
+        'INSERT INTO query_plans (name, plan) VALUES (?, ?)',
+        [(name, json.dumps(plan, ensure_ascii=False)) for name, plan in plans.items()]
+    )
+    conn.commit()
+
+
+def check_plans(conn: Any, plans: Optional[Dict[str, List[str]]] = None) -> Dict[str, List[str]]:
+    """Регрессии планов относительно эталона: имя запроса -> новые плохие шаги"""
+    baseline = load_baseline(conn)
+    found = {}
+    for name, plan in (plans or capture_plans(conn)).items():
+        if name in baseline:
+            problems = regressions(baseline[name], plan)
+            if problems:
+                found[name] = problems
+    return found
+
+
+def analyze_after_bulk(tables: Iterable[str], rows: int) -> None:
+    """ANALYZE затронутых таблиц после пакетного изменения не меньше PLANNER_ANALYZE_ROWS строк.
+
+    Выполняется после коммита единицы работы отдельным подключением:
+    запись статистики не удлиняет транзакцию запроса и не держит блокировку.
+    """
+    if rows < current_app.config['PLANNER_ANALYZE_ROWS']:
+        return
+    from app.models import after_commit
+    tables = tuple(tables)
+    after_commit(lambda: analyze_tables(tables))
+
+
+def analyze_tables(tables: Sequence[str]) -> None:
+    conn = connect()
+    try:
+        conn.execute(f'PRAGMA analysis_limit={int(current_app.config["PLANNER_ANALYZE_LIMIT"])}')
+        for table in tables:
+            conn.execute(f'ANALYZE {table}')
+        conn.commit()
+        found = check_plans(conn)
+    except sqlite3.Error as e:
+        # БД занята - статистика обновится PRAGMA optimize при выходе воркера
+        current_app.logger.warning('ANALYZE skipped: %s', e)
+        return
+    finally:
+        conn.close()
+    for name, problems in found.items():
+        current_app.logger.warning('Query plan regression in %s: %s', name, '; '.join(problems))
+
+
+def optimize_database(app: Flask) -> None:
+    """PRAGMA optimize для таблиц из каталога (при выходе воркера)"""
+    conn = sqlite3.connect(app.config['DATABASE'], timeout=1)
+    try:
+        with app.app_context():
+            capture_plans(conn)
+        conn.execute(f'PRAGMA analysis_limit={int(app.config["PLANNER_ANALYZE_LIMIT"])}')
+        conn.execute('PRAGMA optimize')
+        conn.commit()
+    except sqlite3.Error as e:
+        # БД занята или недоступна - статистика обновится при следующем выходе
+        app.logger.warning('PRAGMA optimize skipped: %s', e)
+    finally:
+        conn.close()
+
+
+def init_app(app: Flask) -> None:
+    app.config.setdefault('PLANNER_ANALYZE_ROWS', int(os.environ.get('PLANNER_ANALYZE_ROWS', '500')))
+    app.config.setdefault('PLANNER_ANALYZE_LIMIT', int(os.environ.get('PLANNER_ANALYZE_LIMIT', '1000')))
+
+    @app.cli.command('query-plans')
+    @click.option('--accept', is_flag=True, help='Сохранить текущие планы как эталон')
+    def query_plans_command(accept: bool) -> None:
+        """Сравнить планы запросов каталога с эталоном"""
+        conn = sqlite3.connect(app.config['DATABASE'], timeout=30)
+        try:
+            plans = capture_plans(conn)
+            baseline = load_baseline(conn)
+            if accept or not baseline:
+                save_baseline(conn, plans)
+                click.echo(f'Эталон сохранен: {len(plans)} запросов')
+                return
+            found = check_plans(conn, plans)
+            for name, plan in plans.items():
+                status = 'РЕГРЕССИЯ' if name in found else ('изменен' if plan != baseline.get(name) else 'ok')
+                click.echo(f'{name}: {status}')
+                for step in found.get(name, ()):
+                    click.echo(f'    + {step}')
+        finally:
+            conn.close()
+        if found:
+            raise click.ClickException(f'Планы ухудшились: {len(found)}. '
+                                       'Если это ожидаемо, сохраните эталон: flask query-plans --accept')
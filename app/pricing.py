@@ -0,0 +1,149 @@
+"""Массовое изменение цен каталога.
+
+Все изменения пакета выполняются одним UPDATE (или UPDATE ... FROM для
+файла цен) в одной точке сохранения: при ошибке пакет откатывается
+целиком. Пакет получает одну новую версию каталога, поэтому кеши
+сбрасываются один раз на весь пакет.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from app.importer import iter_rows, _price, _text
+from app.models import bump_version, get_db, get_versions, savepoint
+
+PRICE_FIELDS = {
+    'price': ['price'],
+    'wholesale_price': ['wholesale_price'],
+    'both': ['price', 'wholesale_price'],
+}
+
+
+class RepriceError(ValueError):
+    pass
+
+
+def _filter_sql(category_ids: Optional[List[int]] = None,
+                product_ids: Optional[List[int]] = None) -> Tuple[str, List[Any]]:
+    """WHERE-условие для набора товаров (удаленные товары не меняются)"""
+    conditions, params = ['deleted_at IS NULL'], []
+    if category_ids:
+        conditions.append(f'category_id IN ({", ".join("?" for _ in category_ids)})')
+        params.extend(category_ids)
+    if product_ids:
+        conditions.append(f'id IN ({", ".join("?" for _ in product_ids)})')
+        params.extend(product_ids)
+    return ' AND '.join(conditions), params
+
+
+def _record_change(kind: str, details: Dict[str, Any], affected: int, user_id: Optional[int]) -> int:
+    """Новая версия каталога и запись о пакете изменений"""
+    db = get_db()
+    bump_version('catalogue')
+    version = get_versions('catalogue')['catalogue'][0]
+    db.execute(
+        '''INSERT INTO catalogue_changes (version, kind, details, affected, user_id)
+           VALUES (?, ?, ?, ?, ?)''',
+        (version, kind, json.dumps(details, ensure_ascii=False), affected, user_id)
+    )
+    return version
+
+
+def reprice(mode: str, value: float, fields: str = 'price',
+            category_ids: Optional[List[int]] = None, product_ids: Optional[List[int]] = None,
+            user_id: Optional[int] = None) -> Dict[str, int]:
+    """Изменить цены отобранных товаров на процент ('percent') или на сумму ('absolute')"""
+    if fields not in PRICE_FIELDS:
+        raise RepriceError('Неизвестное поле цены')
+    if mode == 'percent':
+        if value <= -100:
+            raise RepriceError('Снижение цены должно быть меньше 100%')
+        expression, factor = 'ROUND({field} * ?, 2)', 1 + value / 100
+    elif mode == 'absolute':
+        expression, factor = 'ROUND({field} + ?, 2)', value
+    else:
+        raise RepriceError('Неизвестный способ изменения цены')
+
+    where, params = _filter_sql(category_ids, product_ids)
+    affected = 0
+    price_fields = PRICE_FIELDS[fields]
+    with savepoint('reprice') as db:
+        # Пропущенные товары считаются до изменения (и один раз, даже если не подошли обе цены)
+        not_positive = ' OR '.join(
+            f'({field} IS NOT NULL AND {expression.format(field=field)} <= 0)' for field in price_fields
+        )
+        skipped = db.execute(
+            f'SELECT COUNT(*) FROM products WHERE {where} AND ({not_positive})',
+            [*params, *(factor for _ in price_fields)]
+        ).fetchone()[0]
+        for field in price_fields:
+            new_value = expression.format(field=field)
+            # Цены, которые стали бы нулевыми или отрицательными, не меняются
+            cursor = db.execute(
+                f'''UPDATE products SET {field} = {new_value}, updated_at = CURRENT_TIMESTAMP
+                    WHERE {where} AND {field} IS NOT NULL AND {new_value} > 0''',
+                [factor, *params, factor]
+            )
+            affected = max(affected, cursor.rowcount)
+
+        version = _record_change('reprice', {
+            'mode': mode, 'value': value, 'fields': fields,
+            'category_ids': category_ids or [], 'product_ids': product_ids or [],
+        }, affected, user_id)
+    return {'affected': affected, 'skipped': skipped, 'version': version}
+
+
+def reprice_from_file(path: str, category_ids: Optional[List[int]] = None,
+                      user_id: Optional[int] = None) -> Dict[str, int]:
+    """Установить цены из файла (колонки: id или артикул, цена, опт. цена).
+
+    skipped - строки с ошибками и строки, для которых нет живого товара
+    (неизвестный артикул или ID, удаленный товар, товар вне категорий)
+    """
+    rows = []
+    errors = 0
+    for _, row in iter_rows(path):
+        try:
+            product_id = int(row['id']) if _text(row.get('id')) else None
+            price = _price(row.get('price'))
+            wholesale_price = _price(row.get('wholesale_price'))
+        except (TypeError, ValueError):
+            errors += 1
+            continue
+        sku = _text(row.get('sku'))
+        if (product_id is None and sku is None) or (price is None and wholesale_price is None) \
+                or (price is not None and price <= 0) or (wholesale_price is not None and wholesale_price <= 0):
+            errors += 1
+            continue
+        rows.append((product_id, sku, price, wholesale_price))
+
+    where, params = _filter_sql(category_ids)
+    db = get_db()
+    db.execute('''CREATE TEMP TABLE IF NOT EXISTS price_file (
+                      product_id INTEGER, sku TEXT, price REAL, wholesale_price REAL)''')
+    with savepoint('price_file'):
+        db.execute('DELETE FROM price_file')
+        db.executemany('INSERT INTO price_file VALUES (?, ?, ?, ?)', rows)
+        db.execute('''UPDATE price_file SET product_id = (
+                          SELECT id FROM products WHERE products.sku = price_file.sku)
+                      WHERE product_id IS NULL''')
+        cursor = db.execute(
+            f'''UPDATE products
+                SET price = COALESCE(f.price, products.price),
+                    wholesale_price = COALESCE(f.wholesale_price, products.wholesale_price),
+                    updated_at = CURRENT_TIMESTAMP
+                FROM price_file f
+                WHERE f.product_id = products.id AND {where}''',
+            params
+        )
+        affected = cursor.rowcount
+        # Не найден артикул, неизвестный или удаленный ID, товар вне выбранных категорий
+        unmatched = db.execute(
+            f'''SELECT COUNT(*) FROM price_file f
+                WHERE NOT EXISTS (SELECT 1 FROM products WHERE products.id = f.product_id AND {where})''',
+            params
+        ).fetchone()[0]
+        db.execute('DELETE FROM price_file')
+
+        version = _record_change('price_file', {
+            'rows': len(rows), 'category_ids': category_ids or [],
+        }, affected, user_id)
+    return {'affected': affected, 'skipped': errors + unmatched, 'version': version}
@@ -0,0 +1,133 @@
+"""Общие фильтры выборок для списков, пакетных операций и отчетов"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+REQUEST_STATUSES = ('pending', 'processing', 'completed')
+
+# История заявок по позициям: рабочие requests/request_items и заявки, перенесенные
+# в заказы (app/orders.py). Строка на позицию, у заявки без позиций - одна строка
+# с item_id NULL. У перенесенной заявки номер - orders.request_id, статус
+# 'completed', order_id - номер заказа, price - цена на момент переноса
+# (у рабочих позиций NULL - берется текущая цена товара). Условия по колонкам
+# заявки (id, supplier_id, created_at и т.п.) SQLite переносит в обе ветки UNION
+REQUEST_HISTORY_SQL = '''(
+    SELECT r.id, r.shop_id, r.supplier_id, r.status, r.created_at, r.updated_at, NULL as order_id,
+           ri.id as item_id, ri.product_id, ri.quantity, NULL as price
+    FROM requests r
+    LEFT JOIN request_items ri ON ri.request_id = r.id
+    UNION ALL
+    SELECT o.request_id, o.shop_id, o.supplier_id, 'completed', o.created_at, o.updated_at, o.id,
+           oi.id, oi.product_id, oi.quantity, oi.price
+    FROM orders o
+    LEFT JOIN order_items oi ON oi.order_id = o.id
+    WHERE o.request_id IS NOT NULL
+)'''
+
+# Запросы списков, общие для маршрутов и каталога планов (app.planner)
+REQUEST_LIST_SQL = '''
+    SELECT r.*, sh.name as shop_name, s.name as supplier_name,
+           COUNT(ri.id) as items_count
+    FROM requests r
+    JOIN shops sh ON r.shop_id = sh.id
+    JOIN suppliers s ON r.supplier_id = s.id
+    LEFT JOIN request_items ri ON r.id = ri.request_id
+    WHERE {where}
+    GROUP BY r.id, sh.id, s.id
+    ORDER BY r.created_at DESC
+'''
+
+SHOP_REQUESTS_SQL = '''
+    SELECT r.*, COUNT(ri.id) as items_count
+    FROM requests r
+    LEFT JOIN request_items ri ON r.id = ri.request_id
+    WHERE r.shop_id = ?
+    GROUP BY r.id
+    ORDER BY r.created_at DESC
+'''
+
+# Вместе с заявками, перенесенными в заказы; ?1 - ID товара в обеих ветках
+PRODUCT_RECENT_REQUESTS_SQL = '''
+    SELECT r.id, r.status, r.created_at as created_at, NULL as order_id, s.name as supplier_name,
+           ri.quantity, shop.name as shop_name
+    FROM requests r
+    JOIN request_items ri ON r.id = ri.request_id
+    JOIN shops shop ON r.shop_id = shop.id
+    JOIN suppliers s ON shop.supplier_id = s.id
+    WHERE ri.product_id = ?1
+    UNION ALL
+    SELECT o.request_id, 'completed', o.created_at, o.id, s.name, oi.quantity, shop.name
+    FROM order_items oi
+    JOIN orders o ON o.id = oi.order_id
+    JOIN shops shop ON o.shop_id = shop.id
+    JOIN suppliers s ON shop.supplier_id = s.id
+    WHERE oi.product_id = ?1 AND o.request_id IS NOT NULL
+    ORDER BY created_at DESC
+    LIMIT 10
+'''
+
+
+def _int(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _date(value: Any) -> Optional[str]:
+    try:
+        return date.fromisoformat(value).isoformat() if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def next_day(value: str) -> str:
+    """Исключающая верхняя граница для включительного фильтра по дате"""
+    return (date.fromisoformat(value) + timedelta(days=1)).isoformat()
+
+
+def timestamp_ago(**delta: float) -> str:
+    """Момент в прошлом в формате CURRENT_TIMESTAMP (UTC); вместо datetime('now', ...) в SQL"""
+    return (datetime.utcnow() - timedelta(**delta)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def parse_request_filters(source: Mapping[str, Any]) -> Dict[str, Any]:
+    """Фильтр заявок из request.args/request.form; неверные значения отбрасываются"""
+    filters = {
+        'status': source.get('status') if source.get('status') in REQUEST_STATUSES else None,
+        'supplier_id': _int(source.get('supplier_id')),
+        'shop_id': _int(source.get('shop_id')),
+        'date_from': _date(source.get('date_from')),
+        'date_to': _date(source.get('date_to')),
+    }
+    return {key: value for key, value in filters.items() if value is not None}
+
+
+def parse_report_filters(source: Mapping[str, Any]) -> Dict[str, Any]:
+    """Фильтр отчетов: фильтр заявок и категория товара"""
+    filters = parse_request_filters(source)
+    category_id = _int(source.get('category_id'))
+    if category_id is not None:
+        filters['category_id'] = category_id
+    return filters
+
+
+def request_filter_sql(filters: Dict[str, Any], ids: Optional[List[int]] = None,
+                       alias: str = '') -> Tuple[str, List[Any]]:
+    """WHERE-условие по таблице requests: (sql, параметры)"""
+    prefix = f'{alias}.' if alias else ''
+    conditions, params = [], []
+    if ids is not None:
+        conditions.append(f'{prefix}id IN ({", ".join("?" for _ in ids) or "NULL"})')
+        params.extend(ids)
+    for field in ('status', 'supplier_id', 'shop_id'):
+        if filters.get(field) is not None:
+            conditions.append(f'{prefix}{field} = ?')
+            params.append(filters[field])
+    # created_at хранится как 'YYYY-MM-DD HH:MM:SS', границы дат включительно
+    if filters.get('date_from'):
+        conditions.append(f'{prefix}created_at >= ?')
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        conditions.append(f'{prefix}created_at < ?')
+        params.append(next_day(filters['date_to']))
+    return (' AND '.join(conditions) or '1 = 1'), params
@@ -0,0 +1,216 @@
+"""Ограничение частоты попыток входа (token bucket).
+
+Состояние корзин хранится в отдельном SQLite-файле, поэтому лимиты
+общие для всех воркеров Gunicorn и не конкурируют за блокировки с app.db.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+from flask import Flask, current_app, request
+from typing import Dict, List, Optional, Tuple
+
+_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS buckets (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        locked_until REAL NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS metrics (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    );
+'''
+
+METRIC_NAMES = ('allowed', 'rejected', 'lockouts', 'successes')
+
+
+def parse_rate(value: str) -> Tuple[int, float]:
+    """Разбор лимита вида "5/300": 5 попыток, восполняемых за 300 секунд"""
+    capacity, period = value.split('/', 1)
+    return int(capacity), float(period)
+
+
+class LoginRateLimiter:
+    def __init__(self, path: str, ip_rate: Tuple[int, float], email_rate: Tuple[int, float],
+                 lockout_seconds: float):
+        self.path = path
+        self.rates = {'ip': ip_rate, 'email': email_rate}
+        self.lockout_seconds = lockout_seconds
+        self._local = threading.local()
+        # Ошибки хранилища считаются в памяти процесса: записать их в само хранилище нельзя
+        self.store_errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Подключение к хранилищу: одно на поток, пересоздается после fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(_SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def hit(self, keys: List[Tuple[str, str]]) -> float:
+        """Списать попытку со всех корзин.
+
+        Возвращает 0, если попытка разрешена, иначе количество секунд
+        до окончания блокировки.
+        """
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                retry_after = self._hit(conn, keys, now)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            # Недоступное хранилище не должно блокировать вход
+            self.store_errors += 1
+            current_app.logger.warning('Login rate limiter store error: %s', e)
+            return 0.0
+
+        if random.random() < 0.01:
+            self.prune(now)
+        return retry_after
+
+    def _hit(self, conn: sqlite3.Connection, keys: List[Tuple[str, str]], now: float) -> float:
+        rows = {}
+        for kind, key in keys:
+            rows[key] = conn.execute(
+                'SELECT tokens, updated_at, locked_until FROM buckets WHERE key = ?', (key,)
+            ).fetchone()
+
+        # Быстрый отказ: ключ уже заблокирован, корзины не трогаем
+        locked_until = max((row[2] for row in rows.values() if row), default=0.0)
+        if locked_until > now:
+            self._incr(conn, 'rejected')
+            return locked_until - now
+
+        retry_after = 0.0
+        for kind, key in keys:
+            capacity, period = self.rates[kind]
+            row = rows[key]
+            if row:
+                tokens = min(capacity, row[0] + (now - row[1]) * capacity / period)
+            else:
+                tokens = float(capacity)
+
+            if tokens < 1:
+                locked = now + self.lockout_seconds
+                retry_after = max(retry_after, self.lockout_seconds)
+                self._incr(conn, 'lockouts')
+            else:
+                tokens -= 1
+                locked = 0.0
+
+            conn.execute(
+                '''INSERT INTO buckets (key, tokens, updated_at, locked_until) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens,
+                       updated_at = excluded.updated_at, locked_until = excluded.locked_until''',
+                (key, tokens, now, locked)
+            )
+
+        self._incr(conn, 'rejected' if retry_after else 'allowed')
+        return retry_after
+
+    @staticmethod
+    def _incr(conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            '''INSERT INTO metrics (name, value) VALUES (?, 1)
+               ON CONFLICT(name) DO UPDATE SET value = value + 1''',
+            (name,)
+        )
+
+    def reset(self, keys: List[Tuple[str, str]]) -> None:
+        """Сбросить корзину email после успешного входа.
+
+        Корзина IP не сбрасывается: одна известная пара логин/пароль
+        не должна открывать перебор остальных учетных записей.
+        """
+        try:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'DELETE FROM buckets WHERE key = ?',
+                [(key,) for kind, key in keys if kind == 'email']
+            )
+            self._incr(conn, 'successes')
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            self.store_errors += 1
+            current_app.logger.warning('Login rate limiter store error: %s', e)
+
+    def prune(self, now: Optional[float] = None) -> None:
+        """Удалить полностью восполненные и незаблокированные корзины"""
+        now = now or time.time()
+        longest_period = max(period for _, period in self.rates.values())
+        try:
+            self._connect().execute(
+                'DELETE FROM buckets WHERE locked_until < ? AND updated_at < ?',
+                (now, now - longest_period)
+            )
+        except sqlite3.Error:
+            pass
+
+    def metrics(self) -> Dict[str, int]:
+        """Счетчики лимитера и число активных блокировок"""
+        conn = self._connect()
+        stats = {name: 0 for name in METRIC_NAMES}
+        stats.update(dict(conn.execute('SELECT name, value FROM metrics').fetchall()))
+        stats['tracked_keys'] = conn.execute('SELECT COUNT(*) FROM buckets').fetchone()[0]
+        stats['locked_keys'] = conn.execute(
+            'SELECT COUNT(*) FROM buckets WHERE locked_until > ?', (time.time(),)
+        ).fetchone()[0]
+        stats['store_errors'] = self.store_errors
+        return stats
+
+
+def client_ip() -> str:
+    """IP клиента с учетом X-Real-IP от nginx"""
+    if current_app.config['LOGIN_RATELIMIT_TRUST_PROXY']:
+        real_ip = request.headers.get('X-Real-IP')
+        if real_ip:
+            return real_ip.strip()
+    return request.remote_addr or 'unknown'
+
+
+def login_keys(email: str) -> List[Tuple[str, str]]:
+    """Ключи корзин для попытки входа: по IP и по email"""
+    return [
+        ('ip', 'ip:' + client_ip()),
+        ('email', 'email:' + email.strip().lower()[:254]),
+    ]
+
+
+def get_login_limiter() -> Optional[LoginRateLimiter]:
+    return current_app.extensions.get('login_limiter')
+
+
+def init_app(app: Flask) -> None:
+    app.config.setdefault('LOGIN_RATELIMIT_ENABLED', os.environ.get('LOGIN_RATELIMIT_ENABLED', '1') == '1')
+    app.config.setdefault('LOGIN_RATELIMIT_DATABASE', os.environ.get('LOGIN_RATELIMIT_DATABASE', 'ratelimit.db'))
+    app.config.setdefault('LOGIN_RATELIMIT_IP', os.environ.get('LOGIN_RATELIMIT_IP', '20/300'))
+    app.config.setdefault('LOGIN_RATELIMIT_EMAIL', os.environ.get('LOGIN_RATELIMIT_EMAIL', '5/300'))
+    app.config.setdefault('LOGIN_LOCKOUT_SECONDS', int(os.environ.get('LOGIN_LOCKOUT_SECONDS', '900')))
+    # X-Real-IP подделывается клиентом, если приложение доступно не только через nginx:
+    # доверять заголовку только за прокси, который его перезаписывает (nginx.conf)
+    app.config.setdefault('LOGIN_RATELIMIT_TRUST_PROXY', os.environ.get('LOGIN_RATELIMIT_TRUST_PROXY', '0') == '1')
+
+    if not app.config['LOGIN_RATELIMIT_ENABLED']:
+        return
+
+    app.extensions['login_limiter'] = LoginRateLimiter(
+        app.config['LOGIN_RATELIMIT_DATABASE'],
+        ip_rate=parse_rate(app.config['LOGIN_RATELIMIT_IP']),
+        email_rate=parse_rate(app.config['LOGIN_RATELIMIT_EMAIL']),
+        lockout_seconds=app.config['LOGIN_LOCKOUT_SECONDS'],
+    )
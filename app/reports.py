@@ -0,0 +1,156 @@
+"""Декларативные отчеты для выгрузки в Excel/CSV.
+
+Отчет описывается запросом, колонками и набором поддерживаемых
+фильтров: каждый фильтр - это SQL-условие с одним параметром, которое
+подставляется в WHERE (по индексированным колонкам, без функций над
+колонкой). Новый отчет - новая запись в REPORTS, без изменений в admin.py.
+"""
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Sequence, Tuple
+from app.models import get_db
+from app.queries import REQUEST_HISTORY_SQL, next_day
+
+# Условия для дат: граница date_to включительно, колонка без функций (работает индекс)
+DATE_FROM = '{} >= ?'
+DATE_TO = '{} < ?'
+# Значения фильтров, которые подставляются в SQL не как есть
+PARAM_CONVERTERS: Dict[str, Callable[[Any], Any]] = {'date_to': next_day}
+
+
+class Report:
+    def __init__(self, name: str, title: str, sql: str, columns: Sequence[Tuple[str, str]],
+                 filters: Mapping[str, str], group_by: str = '', order_by: str = '',
+                 column_widths: Sequence[int] = (), where: str = ''):
+        self.name = name
+        self.title = title
+        self.sql = sql
+        self.columns = list(columns)
+        self.filters = dict(filters)
+        self.group_by = group_by
+        self.order_by = order_by
+        self.column_widths = column_widths
+        # Условие без параметров, которое добавляется всегда (например, только живые строки)
+        self.where = where
+
+    @property
+    def headers(self) -> List[str]:
+        return [header for header, _ in self.columns]
+
+    def build(self, values: Mapping[str, Any]) -> Tuple[str, List[Any]]:
+        """SQL с условиями только по поддерживаемым фильтрам"""
+        conditions, params = [self.where] if self.where else [], []
+        for name, condition in self.filters.items():
+            if values.get(name) is not None:
+                conditions.append(condition)
+                convert = PARAM_CONVERTERS.get(name)
+                params.append(convert(values[name]) if convert else values[name])
+        sql = self.sql
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        if self.group_by:
+            sql += f' GROUP BY {self.group_by}'
+        if self.order_by:
+            sql += f' ORDER BY {self.order_by}'
+        return sql, params
+
+    def rows(self, values: Mapping[str, Any]) -> Iterator[List[Any]]:
+        """Строки отчета по мере чтения курсора"""
+        sql, params = self.build(values)
+        keys = [key for _, key in self.columns]
+        for row in get_db(readonly=True).execute(sql, params):
+            yield [row[key] for key in keys]
+
+
+REPORTS: Dict[str, Report] = {report.name: report for report in (
+    Report(
+        'products', 'Товары',
+        '''SELECT p.name, p.sku, p.price, p.wholesale_price, c.name as category
+           FROM products p
+           LEFT JOIN categories c ON p.category_id = c.id''',
+        [('Название', 'name'), ('Артикул', 'sku'), ('Цена', 'price'),
+         ('Опт. цена', 'wholesale_price'), ('Категория', 'category')],
+        {'category_id': 'p.category_id = ?'},
+        order_by='p.name',
+        column_widths=(40, 14, 12, 12, 20),
+        where='p.deleted_at IS NULL',
+    ),
+    Report(
+        'shops', 'Магазины',
+        '''SELECT sh.name, s.name as supplier_name, sh.business_type, sh.created_at
+           FROM shops sh
+           LEFT JOIN suppliers s ON sh.supplier_id = s.id''',
+        [('Магазин', 'name'), ('Торговый', 'supplier_name'), ('Тип', 'business_type'),
+         ('Создан', 'created_at')],
+        {'supplier_id': 'sh.supplier_id = ?', 'shop_id': 'sh.id = ?',
+         'date_from': DATE_FROM.format('sh.created_at'), 'date_to': DATE_TO.format('sh.created_at')},
+        order_by='sh.name',
+        column_widths=(30, 25, 12, 20),
+        where='sh.deleted_at IS NULL',
+    ),
+    Report(
+        'requests', 'Заявки',
+        f'''SELECT r.id, r.status, r.created_at, r.updated_at, r.order_id, sh.name as shop_name,
+                   s.name as supplier_name, COUNT(r.item_id) as lines, COALESCE(SUM(r.quantity), 0) as quantity
+            FROM {REQUEST_HISTORY_SQL} r
+            JOIN shops sh ON r.shop_id = sh.id
+            JOIN suppliers s ON r.supplier_id = s.id''',
+        [('№', 'id'), ('Статус', 'status'), ('Создана', 'created_at'), ('Изменена', 'updated_at'),
+         ('Заказ', 'order_id'), ('Магазин', 'shop_name'), ('Торговый', 'supplier_name'),
+         ('Позиций', 'lines'), ('Количество', 'quantity')],
+        {'status': 'r.status = ?', 'supplier_id': 'r.supplier_id = ?', 'shop_id': 'r.shop_id = ?',
+         'date_from': DATE_FROM.format('r.created_at'), 'date_to': DATE_TO.format('r.created_at')},
+        group_by='r.id, r.order_id, sh.id, s.id',
+        order_by='r.created_at DESC',
+        column_widths=(8, 12, 20, 20, 8, 25, 25, 10, 12),
+    ),
+    Report(
+        'request_lines', 'Позиции заявок',
+        f'''SELECT r.id as request_id, r.status, r.created_at, sh.name as shop_name,
+                   s.name as supplier_name, c.name as category, p.sku, p.name as product_name,
+                   r.quantity, COALESCE(r.price, p.price) as price,
+                   r.quantity * COALESCE(r.price, p.price) as total
+            FROM {REQUEST_HISTORY_SQL} r
+            JOIN shops sh ON r.shop_id = sh.id
+            JOIN suppliers s ON r.supplier_id = s.id
+            JOIN products p ON r.product_id = p.id
+            LEFT JOIN categories c ON p.category_id = c.id''',
+        [('Заявка', 'request_id'), ('Статус', 'status'), ('Создана', 'created_at'),
+         ('Магазин', 'shop_name'), ('Торговый', 'supplier_name'), ('Категория', 'category'),
+         ('Артикул', 'sku'), ('Товар', 'product_name'), ('Количество', 'quantity'),
+         ('Цена', 'price'), ('Сумма', 'total')],
+        {'status': 'r.status = ?', 'supplier_id': 'r.supplier_id = ?', 'shop_id': 'r.shop_id = ?',
+         'category_id': 'p.category_id = ?',
+         'date_from': DATE_FROM.format('r.created_at'), 'date_to': DATE_TO.format('r.created_at')},
+        order_by='r.created_at DESC, p.name',
+        column_widths=(8, 12, 20, 25, 25, 20, 14, 40, 10, 12, 14),
+    ),
+    Report(
+        'supplier_activity', 'Активность торговых',
+        f'''SELECT s.name, u.email, COUNT(DISTINCT r.shop_id) as shops_count,
+                   COUNT(DISTINCT r.id) as requests_count, COUNT(r.item_id) as lines,
+                   COALESCE(SUM(r.quantity), 0) as quantity, MAX(r.created_at) as last_request
+            FROM {REQUEST_HISTORY_SQL} r
+            JOIN suppliers s ON r.supplier_id = s.id
+            JOIN users u ON s.user_id = u.id
+            LEFT JOIN products p ON r.product_id = p.id''',
+        [('Торговый', 'name'), ('Email', 'email'), ('Магазинов с заявками', 'shops_count'),
+         ('Заявок', 'requests_count'), ('Позиций', 'lines'), ('Количество', 'quantity'),
+         ('Последняя заявка', 'last_request')],
+        {'status': 'r.status = ?', 'supplier_id': 'r.supplier_id = ?', 'shop_id': 'r.shop_id = ?',
+         'category_id': 'p.category_id = ?',
+         'date_from': DATE_FROM.format('r.created_at'), 'date_to': DATE_TO.format('r.created_at')},
+        group_by='s.id, u.id',
+        order_by='requests_count DESC',
+        column_widths=(25, 30, 12, 10, 10, 12, 20),
+    ),
+    Report(
+        'audit_logs', 'Журнал действий',
+        '''SELECT l.created_at, u.email, l.action, l.entity, l.entity_id, l.details
+           FROM logs l
+           LEFT JOIN users u ON l.user_id = u.id''',
+        [('Время', 'created_at'), ('Пользователь', 'email'), ('Действие', 'action'),
+         ('Объект', 'entity'), ('ID', 'entity_id'), ('Подробности', 'details')],
+        {'date_from': DATE_FROM.format('l.created_at'), 'date_to': DATE_TO.format('l.created_at')},
+        order_by='l.created_at DESC',
+        column_widths=(20, 30, 14, 12, 8, 60),
+    ),
+)}
@@ -1,10 +1,20 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify, make_response, send_file, abort
 from flask_login import login_required, current_user
 from functools import wraps
-from app.models import User, Supplier, Shop, Category, Product, Request, get_db, log_action
+from app.models import User, Supplier, Shop, Category, Product, Request, Order, get_db, log_action
+from app.ratelimit import get_login_limiter
+from app.jobs import submit_job, get_job
+from app import analytics, importer, orders, pdf, planner, pricing
+from app.blocking import run_blocking
+from app.reports import REPORTS
+from app.exports import add_request_styles, csv_response, requests_xlsx_response, xlsx_response
+from app.queries import (PRODUCT_RECENT_REQUESTS_SQL, REQUEST_HISTORY_SQL, REQUEST_LIST_SQL,
+                         parse_report_filters, parse_request_filters, request_filter_sql)
+from app.http_cache import conditional, completed_request_validator, catalogue_validator, product_validator, PRIVATE_SHORT
 import csv
 import io
-from openpyxl import Workbook
+import os
+import uuid
 from typing import Any, Dict, List, Optional, Union
 from werkzeug.wrappers import Response
 
@@ -23,20 +33,30 @@ def admin_required(f: Any) -> Any:
 @login_required
 @admin_required
 def dashboard() -> str:
-    db = get_db()
+    db = get_db(readonly=True)
     
     # Статистика
     stats = {
         'users_count': db.execute('SELECT COUNT(*) FROM users').fetchone()[0],
         'suppliers_count': db.execute('SELECT COUNT(*) FROM suppliers').fetchone()[0],
-        'shops_count': db.execute('SELECT COUNT(*) FROM shops').fetchone()[0],
-        'products_count': db.execute('SELECT COUNT(*) FROM products').fetchone()[0],
+        'shops_count': db.execute('SELECT COUNT(*) FROM shops WHERE deleted_at IS NULL').fetchone()[0],
+        'products_count': db.execute('SELECT COUNT(*) FROM products WHERE deleted_at IS NULL').fetchone()[0],
         'orders_count': db.execute('SELECT COUNT(*) FROM orders').fetchone()[0],
-        'requests_count': db.execute('SELECT COUNT(*) FROM requests WHERE status = "pending"').fetchone()[0]
+        'requests_count': db.execute("SELECT COUNT(*) FROM requests WHERE status = 'pending'").fetchone()[0]
     }
     
     return render_template('admin/dashboard.html', stats=stats)
 
+@admin_bp.route('/security/login-limiter')
+@login_required
+@admin_required
+def login_limiter_metrics() -> Response:
+    """Метрики ограничения попыток входа"""
+    limiter = get_login_limiter()
+    if not limiter:
+        return jsonify({'enabled': False})
+    return jsonify(dict(limiter.metrics(), enabled=True))
+
 @admin_bp.route('/users')
 @login_required
 @admin_required
@@ -100,15 +120,17 @@ def supplier_detail(supplier_id: int):
     # Получаем магазины Торговыйа
     shops = Shop.get_by_supplier_id(supplier_id)
     
-    # Получаем статистику
+    # Получаем статистику (допускается небольшое отставание)
+    stats_db = get_db(readonly=True)
     stats = {
         'shops_count': len(shops),
-        'pending_requests': db.execute(
+        'pending_requests': stats_db.execute(
             'SELECT COUNT(*) FROM requests WHERE supplier_id = ? AND status = ?',
             (supplier_id, 'pending')
         ).fetchone()[0],
-        'total_requests': db.execute(
-            'SELECT COUNT(*) FROM requests WHERE supplier_id = ?',
+        # Вместе с заявками, перенесенными в заказы
+        'total_requests': stats_db.execute(
+            f'SELECT COUNT(DISTINCT id) FROM {REQUEST_HISTORY_SQL} WHERE supplier_id = ?',
             (supplier_id,)
         ).fetchone()[0]
     }
@@ -149,11 +171,8 @@ def edit_supplier(supplier_id: int):
             flash('Пользователь с таким email уже существует', 'error')
             return render_template('admin/edit_supplier.html', supplier=supplier_data)
         
-        # Обновляем данные Торговыйа
-        db.execute(
-            'UPDATE suppliers SET name = ?, info = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-            (name, info, supplier_id)
-        )
+        # Обновляем данные Торговыйа (версия 'suppliers' покрывает и смену email)
+        Supplier.update(supplier_id, name, info)
         
         # Обновляем email пользователя
         db.execute(
@@ -161,8 +180,6 @@ def edit_supplier(supplier_id: int):
             (email, supplier_data['user_id'])
         )
         
-        db.commit()
-        
         log_action(current_user.id, 'update', 'supplier', supplier_id)
         flash('Данные Торговыйа успешно обновлены', 'success')
         return redirect(url_for('admin.supplier_detail', supplier_id=supplier_id))
@@ -201,16 +218,7 @@ def edit_shop(shop_id: int):
 @login_required
 @admin_required
 def delete_shop(shop_id: int):
-    db = get_db()
-    
-    # Проверяем, есть ли связанные заявки
-    requests_count = db.execute('SELECT COUNT(*) FROM requests WHERE shop_id = ?', (shop_id,)).fetchone()[0]
-    
-    if requests_count > 0:
-        flash('Нельзя удалить магазин, у которого есть заявки', 'error')
-        return redirect(url_for('admin.shops'))
-    
-    # Удаляем магазин
+    # Мягкое удаление: заявки и заказы магазина остаются, строку уберет collect-garbage
     Shop.delete(shop_id)
     log_action(current_user.id, 'delete', 'shop', shop_id)
     flash('Магазин успешно удален', 'success')
@@ -267,7 +275,6 @@ def add_product():
                 allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
                 if '.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in allowed_extensions:
                     import os
-                    import uuid
                     from werkzeug.utils import secure_filename
                     from flask import current_app
                     
@@ -297,9 +304,106 @@ def add_product():
     categories = Category.get_all()
     return render_template('admin/add_product.html', categories=categories)
 
+@admin_bp.route('/products/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_products():
+    """Массовый импорт товаров из CSV/XLSX"""
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename:
+            flash('Выберите файл для импорта', 'error')
+            return render_template('admin/import_products.html')
+        
+        extension = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
+        if extension not in ('csv', 'xlsx'):
+            flash('Поддерживаются только файлы CSV и XLSX', 'error')
+            return render_template('admin/import_products.html')
+        
+        path = os.path.join(importer.imports_folder(), f'{uuid.uuid4().hex}.{extension}')
+        file.save(path)
+        
+        job_id = submit_job('product_import', importer.import_products, path, current_user.id,
+                            user_id=current_user.id)
+        flash('Импорт запущен', 'success')
+        return redirect(url_for('admin.import_status', job_id=job_id))
+    
+    return render_template('admin/import_products.html')
+
+@admin_bp.route('/products/reprice', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def reprice_products():
+    """Массовое изменение цен: процент, сумма или файл цен"""
+    categories = Category.get_all()
+    if request.method == 'POST':
+        mode = request.form.get('mode', 'percent')
+        category_ids = [int(c) for c in request.form.getlist('category_ids') if c]
+        product_ids = [int(p) for p in request.form.getlist('product_ids') if p]
+        try:
+            if mode == 'file':
+                file = request.files.get('file')
+                extension = file.filename.rsplit('.', 1)[-1].lower() if file and '.' in file.filename else ''
+                if extension not in ('csv', 'xlsx'):
+                    raise pricing.RepriceError('Загрузите файл цен в формате CSV или XLSX')
+                path = os.path.join(importer.imports_folder(), f'{uuid.uuid4().hex}.{extension}')
+                file.save(path)
+                try:
+                    result = pricing.reprice_from_file(path, category_ids, user_id=current_user.id)
+                finally:
+                    os.remove(path)
+            else:
+                value = float(request.form['value'].replace(',', '.'))
+                result = pricing.reprice(mode, value, request.form.get('fields', 'price'),
+                                         category_ids, product_ids, user_id=current_user.id)
+        except (KeyError, ValueError) as e:
+            message = str(e) if isinstance(e, pricing.RepriceError) else 'Укажите корректное значение'
+            flash(message, 'error')
+            return render_template('admin/reprice_products.html', categories=categories)
+        
+        log_action(current_user.id, 'reprice', 'catalogue', result['version'])
+        flash(f'Цены обновлены у {result["affected"]} товаров, пропущено: {result["skipped"]}', 'success')
+        return redirect(url_for('admin.products'))
+    
+    return render_template('admin/reprice_products.html', categories=categories)
+
+@admin_bp.route('/products/import/<int:job_id>')
+@login_required
+@admin_required
+def import_status(job_id: int):
+    """Прогресс и итоги импорта"""
+    job = get_job(job_id)
+    if not job or job['kind'] != 'product_import':
+        flash('Задача импорта не найдена', 'error')
+        return redirect(url_for('admin.import_products'))
+    return render_template('admin/import_products.html', job=job)
+
+@admin_bp.route('/products/import/<int:job_id>/errors')
+@login_required
+@admin_required
+def import_errors(job_id: int) -> Response:
+    """Скачать отчет об ошибках импорта"""
+    job = get_job(job_id)
+    report_path = job and job['result'] and job['result'].get('error_report')
+    if not report_path or not os.path.exists(report_path):
+        abort(404)
+    return send_file(report_path, mimetype='text/csv', as_attachment=True,
+                     download_name=f'import_{job_id}_errors.csv')
+
+@admin_bp.route('/jobs/<int:job_id>')
+@login_required
+@admin_required
+def job_status(job_id: int) -> Response:
+    """Состояние фоновой задачи (JSON для опроса прогресса)"""
+    job = get_job(job_id)
+    if not job:
+        abort(404)
+    return jsonify(job)
+
 @admin_bp.route('/products/<int:product_id>')
 @login_required
 @admin_required
+@conditional(product_validator)
 def product_detail(product_id):
     """Детальный просмотр товара"""
     product = Product.get_by_id(product_id)
@@ -307,43 +411,16 @@ def product_detail(product_id):
         flash('Товар не найден', 'error')
         return redirect(url_for('admin.products'))
     
-    # Получить статистику по товару
+    # Количество заявок и общее количество - из сводной таблицы спроса
     db = get_db()
-    
-    # Количество заявок с этим товаром
-    requests_count = db.execute(
-        '''SELECT COUNT(DISTINCT r.id) 
-           FROM requests r
-           JOIN request_items ri ON r.id = ri.request_id
-           WHERE ri.product_id = ?''',
-        (product_id,)
-    ).fetchone()[0]
-    
-    # Общее количество запрошенного товара
-    total_quantity = db.execute(
-        '''SELECT COALESCE(SUM(ri.quantity), 0) 
-           FROM request_items ri
-           WHERE ri.product_id = ?''',
-        (product_id,)
-    ).fetchone()[0]
+    demand = analytics.product_demand(product_id)
     
     # Последние заявки с этим товаром
-    recent_requests = db.execute(
-        '''SELECT r.id, r.status, r.created_at, s.name as supplier_name,
-                  ri.quantity, shop.name as shop_name
-           FROM requests r
-           JOIN request_items ri ON r.id = ri.request_id
-           JOIN shops shop ON r.shop_id = shop.id
-           JOIN suppliers s ON shop.supplier_id = s.id
-           WHERE ri.product_id = ?
-           ORDER BY r.created_at DESC
-           LIMIT 10''',
-        (product_id,)
-    ).fetchall()
+    recent_requests = db.execute(PRODUCT_RECENT_REQUESTS_SQL, (product_id,)).fetchall()
     
     stats = {
-        'requests_count': requests_count,
-        'total_quantity': total_quantity,
+        'requests_count': demand['requests_count'],
+        'total_quantity': demand['total_quantity'],
         'recent_requests': recent_requests
     }
     
@@ -439,22 +516,174 @@ def delete_product(product_id):
 @admin_required
 def requests():
     db = get_db()
-    requests = db.execute('''
-        SELECT r.*, sh.name as shop_name, s.name as supplier_name,
-               COUNT(ri.id) as items_count
-        FROM requests r
-        JOIN shops sh ON r.shop_id = sh.id
-        JOIN suppliers s ON r.supplier_id = s.id
-        LEFT JOIN request_items ri ON r.id = ri.request_id
-        GROUP BY r.id
-        ORDER BY r.created_at DESC
-    ''').fetchall()
+    filters = parse_request_filters(request.args)
+    where, params = request_filter_sql(filters, alias='r')
+    requests = db.execute(REQUEST_LIST_SQL.format(where=where), params).fetchall()
     
-    return render_template('admin/requests.html', requests=requests)
+    return render_template('admin/requests.html', requests=requests, filters=filters,
+                           suppliers=Supplier.get_all(), shops=Shop.get_all())
+
+PICKING_HEADERS = ['Категория', 'Артикул', 'Товар', 'Количество', 'Заявок', 'Цена', 'Опт. цена', 'Сумма']
+
+def _picking_selection() -> tuple:
+    """Фильтр листа сборки: отмеченные заявки, без отметок - по умолчанию все ожидающие"""
+    filters = parse_request_filters(request.args)
+    ids = None
+    if request.args.get('scope') != 'filter' and request.args.getlist('request_ids'):
+        ids = [int(i) for i in request.args.getlist('request_ids') if i.isdigit()]
+    # Отмеченные заявки попадают в лист в любом статусе
+    if ids is None and 'status' not in request.args:
+        filters['status'] = 'pending'
+    return filters, ids
+
+@admin_bp.route('/picking')
+@login_required
+@admin_required
+def picking_list() -> str:
+    """Сводный лист сборки по выбранным заявкам"""
+    filters, ids = _picking_selection()
+    where, params = request_filter_sql(filters, ids, alias='r')
+    items = Request.get_picking_list(where, params).fetchall()
+    return render_template('admin/picking_list.html', items=items, filters=filters, selected=ids,
+                           suppliers=Supplier.get_all(), shops=Shop.get_all())
+
+@admin_bp.route('/picking/export/<file_format>')
+@login_required
+@admin_required
+def export_picking_list(file_format: str) -> Response:
+    """Выгрузка листа сборки в CSV или XLSX"""
+    filters, ids = _picking_selection()
+    where, params = request_filter_sql(filters, ids, alias='r')
+    rows = (
+        (item['category_name'], item['sku'], item['product_name'], item['total_quantity'],
+         item['requests_count'], item['price'], item['wholesale_price'], item['total_price'])
+        for item in Request.get_picking_list(where, params)
+    )
+    if file_format == 'csv':
+        return csv_response(PICKING_HEADERS, rows, 'picking_list.csv')
+    if file_format == 'xlsx':
+        return xlsx_response('Лист сборки', PICKING_HEADERS, rows, 'picking_list.xlsx',
+                             column_widths=(20, 14, 40, 12, 10, 12, 12, 14))
+    if file_format == 'pdf':
+        return _pdf_response('picking', pdf.picking_key(filters, ids), 'picking_list.pdf', filters, ids)
+    abort(404)
+
+def _pdf_response(kind: str, key: str, filename: str, *args: Any) -> Response:
+    """PDF из кеша; большой документ собирается фоновой задачей"""
+    cache = pdf.get_cache()
+    if cache.get(key) is None:
+        load, draw = pdf.DOCUMENTS[kind]
+        data = load(*args)
+        if data is None:
+            abort(404)
+        if len(data['items']) > current_app.config['PDF_JOB_ROWS']:
+            job_id = submit_job('pdf', pdf.build_job, kind, key, *args, user_id=current_user.id)
+            return redirect(url_for('admin.document_status', job_id=job_id, filename=filename))
+        run_blocking(cache.build, key, draw, data)
+    return send_file(cache.path(key), mimetype='application/pdf', download_name=filename)
+
+@admin_bp.route('/documents/<int:job_id>')
+@login_required
+@admin_required
+def document_status(job_id: int) -> Union[str, Response]:
+    """Прогресс сборки PDF; готовый документ отдается из кеша"""
+    job = get_job(job_id)
+    if not job or job['kind'] != 'pdf':
+        abort(404)
+    filename = request.args.get('filename', f'document_{job_id}.pdf')
+    if request.args.get('download') and job['status'] == 'completed':
+        path = pdf.get_cache().get(job['result']['key'])
+        if path is None:
+            flash('Документ устарел, сформируйте его заново', 'error')
+            return redirect(url_for('admin.requests'))
+        return send_file(path, mimetype='application/pdf', download_name=filename)
+    return render_template('admin/document_job.html', job=job, filename=filename)
+
+@admin_bp.route('/requests/export')
+@login_required
+@admin_required
+def export_requests() -> Response:
+    """Выгрузка многих заявок в одну книгу: общий лист или лист на каждого торгового"""
+    from datetime import datetime
+
+    filters = parse_request_filters(request.args)
+    ids = None
+    if request.args.get('scope') != 'filter':
+        ids = [int(i) for i in request.args.getlist('request_ids') if i.isdigit()]
+        if not ids:
+            flash('Выберите заявки', 'error')
+            return redirect(url_for('admin.requests', **filters))
+
+    by_supplier = request.args.get('layout') == 'suppliers'
+    where, params = request_filter_sql(filters, ids, alias='r')
+    items = Request.get_export_items(where, params, by_supplier=by_supplier)
+    filename = f'Requests_{datetime.now().strftime("%Y%m%d")}.xlsx'
+    return requests_xlsx_response(items, filename, by_supplier=by_supplier)
+
+@admin_bp.route('/requests/batch', methods=['POST'])
+@login_required
+@admin_required
+def batch_requests() -> Response:
+    """Пакетная смена статуса или удаление: выбранные заявки или все по фильтру"""
+    action = request.form.get('action')
+    filters = parse_request_filters(request.form)
+    if request.form.get('scope') == 'filter':
+        ids = None
+    else:
+        ids = [int(i) for i in request.form.getlist('request_ids') if i.isdigit()]
+    back = redirect(url_for('admin.requests', **filters))
+    
+    if ids is not None and not ids:
+        flash('Выберите заявки', 'error')
+        return back
+    if ids is None and not filters:
+        flash('Задайте фильтр: пакетная операция над всеми заявками запрещена', 'error')
+        return back
+    
+    where, params = request_filter_sql(filters, ids)
+    if action == 'convert':
+        # Аудит пишет convert_requests
+        affected = orders.convert_requests(where, params, current_user.id)
+        flash(f'Завершенных заявок перенесено в заказы: {len(affected)}', 'success')
+        return back
+    if action == 'delete':
+        affected = Request.batch_delete(where, params)
+        message = f'Удалено заявок: {len(affected)}'
+    elif action in ('pending', 'processing', 'completed'):
+        affected = Request.batch_update_status(where, params, action)
+        message = f'Статус изменен у заявок: {len(affected)}'
+    else:
+        flash('Неизвестная операция', 'error')
+        return back
+    
+    # Одна запись аудита на пакет; изменения и аудит коммитятся вместе при закрытии запроса (close_db)
+    log_action(current_user.id, 'batch_delete' if action == 'delete' else 'batch_update', 'request',
+               details={'action': action, 'filters': filters, 'selected': ids, 'affected': affected})
+    planner.analyze_after_bulk(('requests', 'request_items'), len(affected))
+    flash(message, 'success')
+    return back
+
+@admin_bp.route('/orders')
+@login_required
+@admin_required
+def orders_list() -> str:
+    """Заказы, созданные из завершенных заявок"""
+    return render_template('admin/orders.html', orders=Order.get_all())
+
+@admin_bp.route('/orders/<int:order_id>')
+@login_required
+@admin_required
+def order_detail(order_id: int) -> Union[str, Response]:
+    order = Order.get_by_id(order_id)
+    if not order:
+        flash('Заказ не найден', 'error')
+        return redirect(url_for('admin.orders_list'))
+    return render_template('admin/order_detail.html', order=order, items=Order.get_items(order_id))
 
 @admin_bp.route('/requests/<int:request_id>')
 @login_required
 @admin_required
+@conditional(completed_request_validator)
 def request_detail(request_id: int) -> Union[str, Response]:
     db = get_db()
     
@@ -469,16 +698,22 @@ def request_detail(request_id: int) -> Union[str, Response]:
     ''', (request_id,)).fetchone()
     
     if not request_info:
+        # Перенесенную в заказ заявку открываем как заказ
+        order = Order.get_by_request_id(request_id)
+        if order:
+            flash(f'Заявка #{request_id} перенесена в заказ #{order["id"]}', 'info')
+            return redirect(url_for('admin.order_detail', order_id=order['id']))
         flash('Заявка не найдена', 'error')
         return redirect(url_for('admin.requests'))
     
-    # Получаем детальную информацию о товарах
+    # Получаем детальную информацию о товарах (удаленные из каталога товары остаются в заявке)
     items = db.execute('''
         SELECT ri.*, 
                p.name as product_name, 
                p.price, 
                p.wholesale_price,
                p.description as product_description,
+               p.deleted_at as product_deleted_at,
                c.name as category_name
         FROM request_items ri
         JOIN products p ON ri.product_id = p.id
@@ -579,6 +814,7 @@ def remove_request_item(request_id, product_id):
 @admin_bp.route('/products/api')
 @login_required
 @admin_required
+@conditional(catalogue_validator, cache_control=PRIVATE_SHORT)
 def products_api():
     """API для получения списка товаров"""
     products = Product.get_all()
@@ -598,7 +834,6 @@ def products_api():
 def export_request(request_id: int) -> Union[str, Response]:
     """Экспорт заявки в Excel"""
     from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
     from openpyxl.utils import get_column_letter
     from datetime import datetime
     import io
@@ -635,27 +870,19 @@ def export_request(request_id: int) -> Union[str, Response]:
     
     # Создаем Excel файл
     wb = Workbook()
+    add_request_styles(wb)
     ws = wb.active
     ws.title = f"Заявка_{request_id}"
     
-    # Стили
-    header_font = Font(bold=True, size=14, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    title_font = Font(bold=True, size=16)
-    border = Border(left=Side(style='thin'), right=Side(style='thin'), 
-                   top=Side(style='thin'), bottom=Side(style='thin'))
-    center_alignment = Alignment(horizontal='center', vertical='center')
-    
     # Заголовок документа
     ws.merge_cells('A1:E1')
     ws['A1'] = f"ЗАЯВКА #{request_id}"
-    ws['A1'].font = title_font
-    ws['A1'].alignment = center_alignment
+    ws['A1'].style = 'request_title'
     
     # Информация о заявке
     row = 3
     ws[f'A{row}'] = "Информация о заявке"
-    ws[f'A{row}'].font = Font(bold=True, size=12)
+    ws[f'A{row}'].style = 'request_section'
     row += 1
     
     info_data = [
@@ -667,7 +894,7 @@ def export_request(request_id: int) -> Union[str, Response]:
     for label, value in info_data:
         ws[f'A{row}'] = label
         ws[f'B{row}'] = value
-        ws[f'A{row}'].font = Font(bold=True)
+        ws[f'A{row}'].style = 'request_label'
         row += 1
     
     # Пустая строка
@@ -675,17 +902,13 @@ def export_request(request_id: int) -> Union[str, Response]:
     
     # Заголовок таблицы товаров
     ws[f'A{row}'] = "Товары в заявке"
-    ws[f'A{row}'].font = Font(bold=True, size=12)
+    ws[f'A{row}'].style = 'request_section'
     row += 1
     
     # Заголовки таблицы
     headers = ['Товар', 'Количество', 'Цена за ед.', 'Сумма', '% от общей суммы']
     for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=row, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-        cell.alignment = center_alignment
+        ws.cell(row=row, column=col, value=header).style = 'request_header'
     
     row += 1
     
@@ -698,6 +921,8 @@ def export_request(request_id: int) -> Union[str, Response]:
         total_cost += item_total
         total_quantity += item['quantity']
     
+    # Цена и сумма - по правому краю, количество и процент - по центру
+    column_styles = ['request_cell', 'request_center', 'request_right', 'request_right', 'request_center']
     for item in items:
         item_total = item['price'] * item['quantity']
         percentage = (item_total / total_cost * 100) if total_cost > 0 else 0
@@ -711,31 +936,16 @@ def export_request(request_id: int) -> Union[str, Response]:
         ]
         
         for col, value in enumerate(data, 1):
-            cell = ws.cell(row=row, column=col, value=value)
-            cell.border = border
-            if col in [3, 4]:  # Цена и сумма
-                cell.alignment = Alignment(horizontal='right')
-            elif col in [2, 5]:  # Количество и процент
-                cell.alignment = center_alignment
+            ws.cell(row=row, column=col, value=value).style = column_styles[col - 1]
         
         row += 1
     
-    # Итоговая строка
-    ws[f'A{row}'] = "ИТОГО:"
-    ws[f'A{row}'].font = Font(bold=True)
-    ws[f'B{row}'] = f"{total_quantity} шт."
-    ws[f'B{row}'].font = Font(bold=True)
-    ws[f'B{row}'].alignment = center_alignment
-    ws[f'D{row}'] = f"{total_cost:.0f} ₸"
-    ws[f'D{row}'].font = Font(bold=True)
-    ws[f'D{row}'].alignment = Alignment(horizontal='right')
-    ws[f'E{row}'] = "100%"
-    ws[f'E{row}'].font = Font(bold=True)
-    ws[f'E{row}'].alignment = center_alignment
-    
-    # Применяем границы к итоговой строке
-    for col in range(1, 6):
-        ws.cell(row=row, column=col).border = border
+    # Итоговая строка (с границами по всем колонкам)
+    totals = ["ИТОГО:", f"{total_quantity} шт.", None, f"{total_cost:.0f} ₸", "100%"]
+    total_styles = ['request_total', 'request_total_center', 'request_total', 'request_total_right',
+                    'request_total_center']
+    for col, value in enumerate(totals, 1):
+        ws.cell(row=row, column=col, value=value).style = total_styles[col - 1]
     
     # Автоподбор ширины колонок
     for col in range(1, 6):
@@ -746,9 +956,9 @@ def export_request(request_id: int) -> Union[str, Response]:
                 max_length = max(max_length, len(str(cell.value)))
         ws.column_dimensions[column_letter].width = min(max_length + 2, 30)
     
-    # Сохраняем в память
+    # Сохраняем в память (упаковка в zip - в пуле блокирующих операций)
     output = io.BytesIO()
-    wb.save(output)
+    run_blocking(wb.save, output)
     output.seek(0)
     
     # Создаем ответ
@@ -761,6 +971,17 @@ def export_request(request_id: int) -> Union[str, Response]:
     
     return response
 
+@admin_bp.route('/requests/<int:request_id>/pdf')
+@login_required
+@admin_required
+def request_pdf(request_id: int) -> Response:
+    """Заявка в PDF для печати"""
+    key = pdf.request_key(request_id)
+    if key is None:
+        flash('Заявка не найдена', 'error')
+        return redirect(url_for('admin.requests'))
+    return _pdf_response('request', key, f'Request_{request_id}.pdf', request_id)
+
 @admin_bp.route('/requests/<int:request_id>/delete', methods=['POST'])
 @login_required
 @admin_required
@@ -783,9 +1004,7 @@ def delete_request(request_id):
 @login_required
 @admin_required
 def mark_request_processed(request_id: int) -> Response:
-    db = get_db()
-    db.execute('UPDATE requests SET status = "completed" WHERE id = ?', (request_id,))
-    db.commit()
+    Request.update_status(request_id, 'completed')
     
     log_action(current_user.id, 'update', 'request', request_id)
     flash('Заявка отмечена как обработанная', 'success')
@@ -795,9 +1014,7 @@ def mark_request_processed(request_id: int) -> Response:
 @login_required
 @admin_required
 def reopen_request(request_id: int) -> Response:
-    db = get_db()
-    db.execute('UPDATE requests SET status = "pending" WHERE id = ?', (request_id,))
-    db.commit()
+    Request.update_status(request_id, 'pending')
     
     log_action(current_user.id, 'update', 'request', request_id)
     flash('Заявка возвращена в обработку для редактирования', 'success')
@@ -807,62 +1024,38 @@ def reopen_request(request_id: int) -> Response:
 @login_required
 @admin_required
 def reports() -> str:
-    return render_template('admin/reports.html')
+    return render_template('admin/reports.html', reports=REPORTS, filters=parse_report_filters(request.args),
+                           suppliers=Supplier.get_all(), categories=Category.get_all())
+
+@admin_bp.route('/reports/analytics')
+@login_required
+@admin_required
+def analytics_report() -> str:
+    """Спрос: топ товаров, динамика по дням и объем по торговым"""
+    filters = parse_request_filters(request.args)
+    date_from, date_to = filters.get('date_from'), filters.get('date_to')
+    days = min(max(request.args.get('days', 30, type=int), 7), 365)
+    return render_template(
+        'admin/analytics.html',
+        filters=filters, days=days,
+        top_products=analytics.top_products(20, date_from, date_to),
+        trend=analytics.demand_trend(days),
+        suppliers=analytics.supplier_volume(date_from, date_to),
+    )
 
+@admin_bp.route('/reports/export')
 @admin_bp.route('/reports/export/<report_type>')
 @login_required
 @admin_required
-def export_report(report_type: str) -> Response:
-    db = get_db()
-    
-    if report_type == 'products':
-        data = db.execute('''
-            SELECT p.name, p.price, p.wholesale_price,
-                   c.name as category
-            FROM products p
-            LEFT JOIN categories c ON p.category_id = c.id
-            ORDER BY p.name
-        ''').fetchall()
-        
-        filename = 'products_report.xlsx'
-        headers = ['Название', 'Цена', 'Опт. цена', 'Категория']
-    
-    elif report_type == 'shops':
-        data = db.execute('''
-            SELECT sh.name, s.name as supplier_name, sh.created_at
-            FROM shops sh
-            LEFT JOIN suppliers s ON sh.supplier_id = s.id
-            ORDER BY sh.name
-        ''').fetchall()
-        
-        filename = 'shops_report.xlsx'
-        headers = ['Магазин', 'Торговый', 'Создан']
-    
-    else:
+def export_report(report_type: Optional[str] = None) -> Response:
+    """Выгрузка отчета из реестра app/reports.py с фильтрами из query string"""
+    report = REPORTS.get(report_type or request.args.get('report', ''))
+    if report is None:
         flash('Неизвестный тип отчета', 'error')
         return redirect(url_for('admin.reports'))
     
-    # Создание Excel файла
-    wb = Workbook()
-    ws = wb.active
-    ws.title = report_type.title()
-    
-    # Заголовки
-    for col, header in enumerate(headers, 1):
-        ws.cell(row=1, column=col, value=header)
-    
-    # Данные
-    for row, item in enumerate(data, 2):
-        for col, value in enumerate(item, 1):
-            ws.cell(row=row, column=col, value=value)
-    
-    # Создание ответа
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    
-    return response
\ No newline at end of file
+    filters = parse_report_filters(request.args)
+    if request.args.get('format') == 'csv':
+        return csv_response(report.headers, report.rows(filters), f'{report.name}_report.csv')
+    return xlsx_response(report.title, report.headers, report.rows(filters), f'{report.name}_report.xlsx',
+                         column_widths=report.column_widths)
\ No newline at end of file
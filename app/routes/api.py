@@ -0,0 +1,248 @@
+"""JSON API v1 для интеграций торговых (только чтение).
+
+Авторизация: заголовок `Authorization: Bearer <токен>`, токены
+выпускаются в профиле торгового. Списки отдаются страницами по ключу
+(updated_at, id): `next_cursor` из ответа передается в `cursor`.
+`updated_since` возвращает только измененные записи, в качестве
+следующего значения можно использовать `server_time` из ответа. Это время
+выдачи минус API_SYNC_OVERLAP секунд (как в app/catalogue.py): запись
+из транзакции, которая еще не закоммичена, могла получить updated_at чуть
+раньше момента выдачи. Поэтому часть записей приходит повторно - клиент
+перезаписывает их по id.
+Удаленный магазин приходит с заполненным `deleted_at`.
+
+Удаленные и перенесенные в заказы заявки из `/requests` пропадают, их
+отдает `/requests/removed` (те же updated_since и cursor, `removed_at`
+вместо `updated_at`): клиент удаляет у себя заявки с этими ID, для
+`kind=archived` заявка продолжается заказом `order_id`. Записи хранятся
+столько же, сколько журнал изменений (prune-request-changes, по
+умолчанию 30 дней) - клиент, не синхронизировавшийся дольше, должен
+заново загрузить `/requests` целиком, без updated_since.
+"""
+import base64
+import json
+import os
+from datetime import datetime, timezone
+from flask import Blueprint, current_app, g, jsonify, request
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.models import ApiToken, get_db
+from app.queries import REQUEST_STATUSES, timestamp_ago
+
+api_bp = Blueprint('api', __name__)
+
+
+@api_bp.record_once
+def init_app(state: Any) -> None:
+    state.app.config.setdefault('API_SYNC_OVERLAP', int(os.environ.get('API_SYNC_OVERLAP', '120')))
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+class ApiError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api_bp.errorhandler(ApiError)
+def handle_api_error(error: ApiError) -> Any:
+    response = jsonify({'error': error.message})
+    response.status_code = error.status
+    if error.status == 401:
+        response.headers['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+@api_bp.errorhandler(404)
+def handle_not_found(error: Any) -> Any:
+    return jsonify({'error': 'Не найдено'}), 404
+
+
+def token_required(f: Callable[..., Any]) -> Callable[..., Any]:
+    @wraps(f)
+    def decorated_function(*args: Any, **kwargs: Any) -> Any:
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        row = ApiToken.get_by_token(token.strip()) if scheme.lower() == 'bearer' and token else None
+        if row is None:
+            raise ApiError('Требуется действующий API-токен', 401)
+        g.api_supplier_id = row['supplier_id']
+        ApiToken.mark_used(row['id'])
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def _encode_cursor(updated_at: Any, row_id: int) -> str:
+    # Время в формате CURRENT_TIMESTAMP, даже если драйвер вернул datetime
+    if isinstance(updated_at, datetime):
+        updated_at = updated_at.strftime('%Y-%m-%d %H:%M:%S')
+    return base64.urlsafe_b64encode(json.dumps([str(updated_at), row_id]).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(value: str) -> Tuple[str, int]:
+    try:
+        updated_at, row_id = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+        return str(updated_at), int(row_id)
+    except (ValueError, TypeError):
+        raise ApiError('Неверный cursor')
+
+
+def _parse_since(value: str) -> str:
+    """ISO 8601 -> формат CURRENT_TIMESTAMP в SQLite (UTC)"""
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ApiError('Неверный формат updated_since, ожидается ISO 8601')
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _int_arg(name: str) -> Optional[int]:
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(f'Параметр {name} должен быть числом')
+
+
+def paginate(table: str, columns: str, conditions: List[str], params: List[Any],
+             serialize: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+    """Страница по ключу (updated_at, id) с учетом updated_since и cursor"""
+    limit = _int_arg('limit') or DEFAULT_LIMIT
+    limit = max(1, min(limit, MAX_LIMIT))
+    conditions, params = list(conditions), list(params)
+
+    # Граница включительно: updated_at хранится с точностью до секунды
+    if request.args.get('updated_since'):
+        conditions.append('updated_at >= ?')
+        params.append(_parse_since(request.args['updated_since']))
+    if request.args.get('cursor'):
+        conditions.append('(updated_at, id) > (?, ?)')
+        params.extend(_decode_cursor(request.args['cursor']))
+
+    # С запасом: незакоммиченная запись могла получить updated_at раньше этого момента
+    server_time = timestamp_ago(seconds=current_app.config['API_SYNC_OVERLAP'])
+    rows = get_db().execute(
+        f'''SELECT {columns} FROM {table}
+            WHERE {' AND '.join(conditions) or '1 = 1'}
+            ORDER BY updated_at, id
+            LIMIT ?''',
+        (*params, limit + 1)
+    ).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]['updated_at'], rows[-1]['id'])
+    return {'data': [serialize(row) for row in rows], 'next_cursor': next_cursor, 'server_time': server_time}
+
+
+def _shop(row: Any) -> Dict[str, Any]:
+    return {key: row[key] for key in ('id', 'name', 'info', 'business_type', 'created_at', 'updated_at',
+                                      'deleted_at')}
+
+
+def _request(row: Any) -> Dict[str, Any]:
+    return {key: row[key] for key in ('id', 'shop_id', 'status', 'created_at', 'updated_at')}
+
+
+def _removed_request(row: Any) -> Dict[str, Any]:
+    return {'id': row['request_id'], 'kind': row['kind'], 'order_id': row['order_id'],
+            'removed_at': row['updated_at']}
+
+
+def _items_by_request(request_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """Позиции сразу для всей страницы заявок одним запросом"""
+    items: Dict[int, List[Dict[str, Any]]] = {request_id: [] for request_id in request_ids}
+    if not request_ids:
+        return items
+    rows = get_db().execute(
+        f'''SELECT ri.request_id, ri.product_id, p.sku, p.name as product_name, ri.quantity, p.price
+            FROM request_items ri
+            JOIN products p ON p.id = ri.product_id
+            WHERE ri.request_id IN ({', '.join('?' for _ in request_ids)})
+            ORDER BY ri.request_id, p.name''',
+        request_ids
+    ).fetchall()
+    for row in rows:
+        items[row['request_id']].append({
+            'product_id': row['product_id'],
+            'sku': row['sku'],
+            'name': row['product_name'],
+            'quantity': row['quantity'],
+            'price': row['price'],
+        })
+    return items
+
+
+@api_bp.route('/shops')
+@token_required
+def shops() -> Any:
+    """Магазины торгового"""
+    return jsonify(paginate('shops', 'id, name, info, business_type, created_at, updated_at, deleted_at',
+                            ['supplier_id = ?'], [g.api_supplier_id], _shop))
+
+
+@api_bp.route('/requests')
+@token_required
+def requests() -> Any:
+    """Заявки торгового; include=items добавляет позиции"""
+    conditions, params = ['supplier_id = ?'], [g.api_supplier_id]
+    status = request.args.get('status')
+    if status:
+        if status not in REQUEST_STATUSES:
+            raise ApiError('Неизвестный статус')
+        conditions.append('status = ?')
+        params.append(status)
+    shop_id = _int_arg('shop_id')
+    if shop_id is not None:
+        conditions.append('shop_id = ?')
+        params.append(shop_id)
+
+    page = paginate('requests', 'id, shop_id, status, created_at, updated_at', conditions, params, _request)
+    if request.args.get('include') == 'items':
+        items = _items_by_request([item['id'] for item in page['data']])
+        for item in page['data']:
+            item['items'] = items[item['id']]
+    return jsonify(page)
+
+
+@api_bp.route('/requests/<int:request_id>')
+@token_required
+def request_detail(request_id: int) -> Any:
+    """Заявка с позициями"""
+    row = get_db().execute(
+        'SELECT id, shop_id, status, created_at, updated_at FROM requests WHERE id = ? AND supplier_id = ?',
+        (request_id, g.api_supplier_id)
+    ).fetchone()
+    if row is None:
+        raise ApiError('Заявка не найдена', 404)
+    data = _request(row)
+    data['items'] = _items_by_request([request_id])[request_id]
+    return jsonify(data)
+
+
+@api_bp.route('/requests/removed')
+@token_required
+def removed_requests() -> Any:
+    """Удаленные и перенесенные в заказы заявки из журнала request_changes"""
+    changes = '''(SELECT rc.id, rc.request_id, rc.supplier_id, rc.kind, rc.created_at AS updated_at,
+                         o.id AS order_id
+                  FROM request_changes rc
+                  LEFT JOIN orders o ON o.request_id = rc.request_id AND rc.kind = 'archived'
+                  WHERE rc.kind IN ('deleted', 'archived'))'''
+    return jsonify(paginate(changes, 'id, request_id, kind, updated_at, order_id',
+                            ['supplier_id = ?'], [g.api_supplier_id], _removed_request))
+
+
+@api_bp.route('/request-statuses')
+@token_required
+def request_statuses() -> Any:
+    """Только статусы заявок - самый легкий запрос для синхронизации"""
+    return jsonify(paginate('requests', 'id, status, updated_at', ['supplier_id = ?'], [g.api_supplier_id],
+                            lambda row: {'id': row['id'], 'status': row['status'], 'updated_at': row['updated_at']}))
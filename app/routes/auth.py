@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models import User
+from app.ratelimit import get_login_limiter, login_keys
+import math
 from typing import Union
 from werkzeug.wrappers import Response
 
@@ -18,9 +20,23 @@ def login():
         email = request.form['email']
         password = request.form['password']
         
+        # Ограничение попыток: отказ до поиска пользователя и проверки хеша
+        limiter = get_login_limiter()
+        keys = login_keys(email)
+        if limiter:
+            retry_after = limiter.hit(keys)
+            if retry_after:
+                minutes = max(1, math.ceil(retry_after / 60))
+                flash(f'Слишком много попыток входа. Повторите через {minutes} мин.', 'error')
+                response = make_response(render_template('auth/login.html'), 429)
+                response.headers['Retry-After'] = str(math.ceil(retry_after))
+                return response
+        
         user = User.get_by_email(email)
         
         if user and user.check_password(password):
+            if limiter:
+                limiter.reset(keys)
             login_user(user)
             
             if user.role == 'admin':
@@ -1,8 +1,58 @@
-from flask import Blueprint, redirect, url_for
-from flask_login import login_required
+from flask import Blueprint, Response, current_app, redirect, request, url_for
+from flask_login import current_user, login_required
+from app import catalogue, events
+from app.models import Supplier
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
 def index():
-    return redirect(url_for('auth.login'))
\ No newline at end of file
+    return redirect(url_for('auth.login'))
+
+@main_bp.route('/catalogue')
+@login_required
+def catalogue_changes() -> Response:
+    """Каталог для кеша в браузере: полный снимок или изменения после ?since=<версия>"""
+    data = catalogue.changes(request.args.get('since'))
+    body, mimetype = catalogue.encode(data, request.headers.get('Accept', ''))
+    response = Response(body, mimetype=mimetype)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept')
+    return response
+
+@main_bp.route('/events/requests')
+@login_required
+def request_events() -> Response:
+    """Лента изменений заявок (SSE): админ видит все, торговый - только свои"""
+    if not current_app.config['REQUEST_FEED_ENABLED']:
+        # 204 останавливает переподключения EventSource
+        return Response(status=204)
+    supplier_id = None
+    if current_user.role != 'admin':
+        supplier = Supplier.get_by_user_id(current_user.id)
+        if not supplier:
+            return Response(status=403)
+        supplier_id = supplier.id
+    
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    after_id = int(cursor) if cursor and cursor.isdigit() else None
+    
+    config = current_app.config
+    feed = events.get_feed()
+    if not feed.acquire_stream(config['REQUEST_FEED_MAX_STREAMS']):
+        # Все места заняты: поток воркера не держим, EventSource переподключится позже
+        response = Response(f'retry: {events.BUSY_RETRY_MS}\n\n', mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Retry-After'] = str(events.BUSY_RETRY_MS // 1000)
+        return response
+    # Генератор работает без контекста запроса: подключение g.db закрывается сразу
+    response = Response(
+        events.stream(feed, after_id, supplier_id,
+                      config['REQUEST_FEED_HEARTBEAT'], config['REQUEST_FEED_MAX_DURATION']),
+        mimetype='text/event-stream'
+    )
+    # Место освобождается и при обрыве до начала потока (генератор еще не запущен)
+    response.call_on_close(feed.release_stream)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,8 +1,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
 from functools import wraps
-from app.models import Supplier, Shop, Product, Category, Request, get_db, log_action
-from typing import Any, Union
+from app.models import Supplier, Shop, Product, Category, Request, Order, ApiToken, get_db, log_action
+from app.http_cache import conditional, completed_request_validator
+from app.queries import SHOP_REQUESTS_SQL
+from typing import Any, Dict, Union
 from werkzeug.wrappers import Response
 
 supplier_bp = Blueprint('supplier', __name__)
@@ -16,6 +18,24 @@ def supplier_required(f: Any) -> Any:
         return f(*args, **kwargs)
     return decorated_function
 
+def form_items() -> Dict[int, int]:
+    """Позиции заявки из формы в формате products[ID] = quantity"""
+    items = {}
+    for key, quantity in request.form.items():
+        if key.startswith('products[') and key.endswith(']') and quantity and int(quantity) > 0:
+            # Извлекаем product_id из строки вида "products[123]"
+            items[int(key[9:-1])] = int(quantity)
+    return items
+
+def request_not_found(request_id: int, supplier_id: int) -> Response:
+    """Заявки нет: перенесенную в заказ открываем как заказ"""
+    order = Order.get_by_request_id(request_id)
+    if order and order['supplier_id'] == supplier_id:
+        flash(f'Заявка #{request_id} перенесена в заказ #{order["id"]}', 'info')
+        return redirect(url_for('supplier.view_order', order_id=order['id']))
+    flash('Заявка не найдена', 'error')
+    return redirect(url_for('supplier.dashboard'))
+
 @supplier_bp.route('/dashboard')
 @login_required
 @supplier_required
@@ -30,7 +50,7 @@ def dashboard():
     db = get_db()
     stats = {
         'shops_count': len(shops),
-        'products_count': db.execute('SELECT COUNT(*) FROM products').fetchone()[0],
+        'products_count': db.execute('SELECT COUNT(*) FROM products WHERE deleted_at IS NULL').fetchone()[0],
         'pending_requests': db.execute(
             '''SELECT COUNT(*) FROM requests 
                WHERE supplier_id = ? AND status = ?''', 
@@ -54,7 +74,7 @@ def profile():
     db = get_db()
     stats = {
         'shops_count': len(shops),
-        'products_count': db.execute('SELECT COUNT(*) FROM products').fetchone()[0],
+        'products_count': db.execute('SELECT COUNT(*) FROM products WHERE deleted_at IS NULL').fetchone()[0],
         'pending_requests': db.execute(
             '''SELECT COUNT(*) FROM requests 
                WHERE supplier_id = ? AND status = ?''', 
@@ -94,10 +114,11 @@ def change_password():
         new_password = request.form['new_password']
         confirm_password = request.form['confirm_password']
         
-        from werkzeug.security import check_password_hash, generate_password_hash
+        from werkzeug.security import generate_password_hash
+        from app.blocking import run_blocking
         
         # Проверяем текущий пароль
-        if not check_password_hash(current_user.password, current_password):
+        if not current_user.check_password(current_password):
             flash('Текущий пароль введен неверно', 'error')
             return render_template('supplier/change_password.html')
         
@@ -113,13 +134,44 @@ def change_password():
         
         # Обновляем пароль
         from app.models import User
-        User.update_password(current_user.id, generate_password_hash(new_password))
+        User.update_password(current_user.id, run_blocking(generate_password_hash, new_password))
         log_action(current_user.id, 'update', 'user_password', current_user.id)
         flash('Пароль успешно изменен', 'success')
         return redirect(url_for('supplier.profile'))
     
     return render_template('supplier/change_password.html')
 
+@supplier_bp.route('/profile/api-tokens', methods=['GET', 'POST'])
+@login_required
+@supplier_required
+def api_tokens():
+    """Токены JSON API для интеграций с кассами магазинов"""
+    supplier = Supplier.get_by_user_id(current_user.id)
+    if not supplier:
+        flash('Профиль Торговыйа не найден', 'error')
+        return redirect(url_for('auth.login'))
+    
+    new_token = None
+    if request.method == 'POST':
+        name = request.form.get('name', '').strip() or 'Интеграция'
+        token_id, new_token = ApiToken.create(supplier.id, name)
+        log_action(current_user.id, 'create', 'api_token', token_id)
+        flash('Токен создан. Скопируйте его сейчас: повторно он не показывается', 'success')
+    
+    return render_template('supplier/api_tokens.html', tokens=ApiToken.get_by_supplier_id(supplier.id),
+                           new_token=new_token)
+
+@supplier_bp.route('/profile/api-tokens/<int:token_id>/revoke', methods=['POST'])
+@login_required
+@supplier_required
+def revoke_api_token(token_id: int) -> Response:
+    supplier = Supplier.get_by_user_id(current_user.id)
+    if supplier:
+        ApiToken.revoke(token_id, supplier.id)
+        log_action(current_user.id, 'revoke', 'api_token', token_id)
+        flash('Токен отозван', 'success')
+    return redirect(url_for('supplier.api_tokens'))
+
 @supplier_bp.route('/shops')
 @login_required
 @supplier_required
@@ -153,7 +205,7 @@ def shop_detail(shop_id):
     supplier = Supplier.get_by_user_id(current_user.id)
     db = get_db()
     shop = db.execute(
-        'SELECT * FROM shops WHERE id = ? AND supplier_id = ?',
+        'SELECT * FROM shops WHERE id = ? AND supplier_id = ? AND deleted_at IS NULL',
         (shop_id, supplier.id)
     ).fetchone()
     
@@ -171,7 +223,7 @@ def shop_requests(shop_id):
     supplier = Supplier.get_by_user_id(current_user.id)
     db = get_db()
     shop = db.execute(
-        'SELECT * FROM shops WHERE id = ? AND supplier_id = ?',
+        'SELECT * FROM shops WHERE id = ? AND supplier_id = ? AND deleted_at IS NULL',
         (shop_id, supplier.id)
     ).fetchone()
     
@@ -179,16 +231,11 @@ def shop_requests(shop_id):
         flash('Магазин не найден', 'error')
         return redirect(url_for('supplier.shops'))
     
-    requests = db.execute('''
-        SELECT r.*, COUNT(ri.id) as items_count
-        FROM requests r
-        LEFT JOIN request_items ri ON r.id = ri.request_id
-        WHERE r.shop_id = ?
-        GROUP BY r.id
-        ORDER BY r.created_at DESC
-    ''', (shop_id,)).fetchall()
+    requests = db.execute(SHOP_REQUESTS_SQL, (shop_id,)).fetchall()
+    # Завершенные заявки переносятся в заказы (app/orders.py) и пропадают из списка
+    orders = Order.get_by_shop(shop_id)
     
-    return render_template('supplier/shop_requests.html', shop=shop, requests=requests)
+    return render_template('supplier/shop_requests.html', shop=shop, requests=requests, orders=orders)
 
 @supplier_bp.route('/shops/<int:shop_id>/requests/create', methods=['GET', 'POST'])
 @login_required
@@ -198,7 +245,7 @@ def create_request(shop_id):
     supplier = Supplier.get_by_user_id(current_user.id)
     db = get_db()
     shop = db.execute(
-        'SELECT * FROM shops WHERE id = ? AND supplier_id = ?',
+        'SELECT * FROM shops WHERE id = ? AND supplier_id = ? AND deleted_at IS NULL',
         (shop_id, supplier.id)
     ).fetchone()
     
@@ -207,32 +254,17 @@ def create_request(shop_id):
         return redirect(url_for('supplier.shops'))
     
     if request.method == 'POST':
-        # Создаем заявку
-        cursor = db.execute(
-            'INSERT INTO requests (shop_id, supplier_id) VALUES (?, ?)',
-            (shop_id, supplier.id)
-        )
-        request_id = cursor.lastrowid
-        
-        # Добавляем товары в заявку
-        # Обрабатываем данные в формате products[ID] = quantity
-        for key, quantity in request.form.items():
-            if key.startswith('products[') and key.endswith(']') and quantity and int(quantity) > 0:
-                # Извлекаем product_id из строки вида "products[123]"
-                product_id = key[9:-1]  # убираем "products[" и "]"
-                db.execute(
-                    'INSERT INTO request_items (request_id, product_id, quantity) VALUES (?, ?, ?)',
-                    (request_id, int(product_id), int(quantity))
-                )
-        
-        db.commit()
+        items = form_items()
+        if Product.unavailable_ids(items):
+            flash('Некоторые товары удалены из каталога, обновите страницу и проверьте заявку', 'error')
+            return redirect(url_for('supplier.create_request', shop_id=shop_id))
+        request_id = Request.create(shop_id, supplier.id, items)
         log_action(current_user.id, 'create', 'request', request_id)
         flash('Заявка успешно создана', 'success')
         return redirect(url_for('supplier.shop_requests', shop_id=shop_id))
     
-    # Получаем все глобальные товары созданные админом
-    products = Product.get_all()
-    return render_template('supplier/create_request.html', shop=shop, products=products)
+    # Карточки товаров строятся в браузере из каталога в IndexedDB (app/catalogue.py)
+    return render_template('supplier/create_request.html', shop=shop, products_count=Product.count())
 
 @supplier_bp.route('/requests/<int:request_id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -243,41 +275,41 @@ def edit_request(request_id):
     request_info = Request.get_by_id(request_id)
     
     if not request_info or request_info['supplier_id'] != supplier.id:
-        flash('Заявка не найдена', 'error')
-        return redirect(url_for('supplier.dashboard'))
+        return request_not_found(request_id, supplier.id)
     
     # Можно редактировать только заявки в статусе pending
     if request_info['status'] != 'pending':
         flash('Нельзя редактировать заявку в статусе "' + request_info['status'] + '"', 'error')
         return redirect(url_for('supplier.shop_requests', shop_id=request_info['shop_id']))
     
+    # Текущие товары в заявке; удаленные из каталога показываются отдельно от сетки
+    current_items = Request.get_items(request_id)
+    deleted_items = [item for item in current_items if item['product_deleted_at']]
+    
     if request.method == 'POST':
+        items = form_items()
+        # Удаленные из каталога товары можно оставить в заявке, но не добавить заново
+        if Product.unavailable_ids(items) - {item['product_id'] for item in deleted_items}:
+            flash('Некоторые товары удалены из каталога, обновите страницу и проверьте заявку', 'error')
+            return redirect(url_for('supplier.edit_request', request_id=request_id))
+        
         # Очищаем все товары из заявки
         db = get_db()
         db.execute('DELETE FROM request_items WHERE request_id = ?', (request_id,))
         
         # Добавляем товары заново
-        for key, quantity in request.form.items():
-            if key.startswith('products[') and key.endswith(']') and quantity and int(quantity) > 0:
-                product_id = key[9:-1]
-                db.execute(
-                    'INSERT INTO request_items (request_id, product_id, quantity) VALUES (?, ?, ?)',
-                    (request_id, int(product_id), int(quantity))
-                )
+        db.executemany(
+            'INSERT INTO request_items (request_id, product_id, quantity) VALUES (?, ?, ?)',
+            [(request_id, product_id, quantity) for product_id, quantity in items.items()]
+        )
         
         # Обновляем время изменения заявки
-        db.execute(
-            'UPDATE requests SET updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-            (request_id,)
-        )
-        db.commit()
+        Request.touch(request_id)
         
         log_action(current_user.id, 'update', 'request', request_id)
         flash('Заявка успешно обновлена', 'success')
         return redirect(url_for('supplier.shop_requests', shop_id=request_info['shop_id']))
     
-    # Получаем текущие товары в заявке
-    current_items = Request.get_items(request_id)
     current_products = {item['product_id']: item['quantity'] for item in current_items}
     
     # Получаем все доступные товары
@@ -286,19 +318,34 @@ def edit_request(request_id):
     return render_template('supplier/edit_request.html', 
                          request=request_info, 
                          products=products, 
+                         deleted_items=deleted_items,
                          current_products=current_products)
 
+@supplier_bp.route('/orders/<int:order_id>')
+@login_required
+@supplier_required
+def view_order(order_id: int) -> Union[str, Response]:
+    """Заказ, созданный из завершенной заявки"""
+    supplier = Supplier.get_by_user_id(current_user.id)
+    order = Order.get_by_id(order_id)
+    
+    if not order or order['supplier_id'] != supplier.id:
+        flash('Заказ не найден', 'error')
+        return redirect(url_for('supplier.dashboard'))
+    
+    return render_template('supplier/view_order.html', order=order, items=Order.get_items(order_id))
+
 @supplier_bp.route('/requests/<int:request_id>/view')
 @login_required
 @supplier_required
+@conditional(completed_request_validator)
 def view_request(request_id):
     """Просмотр заявки"""
     supplier = Supplier.get_by_user_id(current_user.id)
     request_info = Request.get_by_id(request_id)
     
     if not request_info or request_info['supplier_id'] != supplier.id:
-        flash('Заявка не найдена', 'error')
-        return redirect(url_for('supplier.dashboard'))
+        return request_not_found(request_id, supplier.id)
     
     # Получаем товары в заявке
     items = Request.get_items(request_id)
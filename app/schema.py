@@ -0,0 +1,310 @@
+"""Изменения схемы БД поверх init_db.py.
+
+Все изменения идемпотентны: они применяются при каждом запуске
+init_db.py (deploy.sh) и при старте приложения.
+"""
+import os
+import re
+import sqlite3
+
+SCHEMA_UPGRADES = '''
+    -- Версии наборов данных (каталог и т.п.) для инвалидации кешей
+    CREATE TABLE IF NOT EXISTS versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    -- Фоновые задачи (импорт и т.п.)
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued'
+            CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+        total INTEGER,
+        processed INTEGER NOT NULL DEFAULT 0,
+        errors_count INTEGER NOT NULL DEFAULT 0,
+        result TEXT,
+        error TEXT,
+        created_by INTEGER,
+        worker_pid INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (created_by) REFERENCES users (id)
+    );
+    
+    -- Пакетные изменения каталога (массовая переоценка): одна запись на версию
+    CREATE TABLE IF NOT EXISTS catalogue_changes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        version INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        details TEXT,
+        affected INTEGER NOT NULL DEFAULT 0,
+        user_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+    
+    -- Спрос по товару, торговому и дню (поддерживается триггерами ниже)
+    CREATE TABLE IF NOT EXISTS demand_daily (
+        product_id INTEGER NOT NULL,
+        supplier_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        quantity INTEGER NOT NULL DEFAULT 0,
+        lines INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (product_id, supplier_id, day)
+    ) WITHOUT ROWID;
+    
+    -- Токены JSON API торговых (хранится только SHA-256 токена)
+    CREATE TABLE IF NOT EXISTS api_tokens (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        supplier_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        token_hash TEXT NOT NULL UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_used_at TIMESTAMP,
+        revoked_at TIMESTAMP,
+        FOREIGN KEY (supplier_id) REFERENCES suppliers (id)
+    );
+    
+    -- Журнал изменений заявок (только добавление) для ленты событий
+    CREATE TABLE IF NOT EXISTS request_changes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        request_id INTEGER NOT NULL,
+        supplier_id INTEGER NOT NULL,
+        shop_id INTEGER NOT NULL,
+        kind TEXT NOT NULL CHECK (kind IN ('created', 'status', 'items', 'deleted', 'archived')),
+        status TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    CREATE INDEX IF NOT EXISTS idx_request_changes_created ON request_changes (created_at);
+    CREATE INDEX IF NOT EXISTS idx_request_changes_supplier ON request_changes (supplier_id, created_at);
+    
+    -- Заявки, которые сейчас переносятся в заказы (заполняется и очищается в одной транзакции)
+    CREATE TABLE IF NOT EXISTS archiving_requests (
+        request_id INTEGER PRIMARY KEY
+    );
+    
+    -- Эталонные планы запросов из каталога app/planner.py
+    CREATE TABLE IF NOT EXISTS query_plans (
+        name TEXT PRIMARY KEY,
+        plan TEXT NOT NULL,
+        captured_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    -- Удаленные записи (только ID) для синхронизации кешей (app/catalogue.py, app/cleanup.py)
+    CREATE TABLE IF NOT EXISTS tombstones (
+        entity TEXT NOT NULL,
+        entity_id INTEGER NOT NULL,
+        deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (entity, entity_id)
+    ) WITHOUT ROWID;
+    
+    CREATE INDEX IF NOT EXISTS idx_tombstones_deleted ON tombstones (entity, deleted_at);
+    
+    CREATE INDEX IF NOT EXISTS idx_demand_daily_day ON demand_daily (day);
+    CREATE INDEX IF NOT EXISTS idx_demand_daily_supplier ON demand_daily (supplier_id, day);
+'''
+
+# Триггер пересоздается, только если его нет или текст в sqlite_master отличается (sync_triggers)
+TRIGGERS = '''
+    CREATE TRIGGER demand_on_item_insert AFTER INSERT ON request_items
+    BEGIN
+        INSERT INTO demand_daily (product_id, supplier_id, day, quantity, lines)
+        SELECT NEW.product_id, r.supplier_id, date(r.created_at), NEW.quantity, 1
+        FROM requests r WHERE r.id = NEW.request_id
+        ON CONFLICT (product_id, supplier_id, day) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            lines = lines + 1;
+    END;
+    
+    CREATE TRIGGER demand_on_item_update AFTER UPDATE OF quantity ON request_items
+    BEGIN
+        UPDATE demand_daily SET quantity = quantity + NEW.quantity - OLD.quantity
+        WHERE product_id = NEW.product_id
+          AND (supplier_id, day) = (SELECT supplier_id, date(created_at) FROM requests WHERE id = NEW.request_id);
+    END;
+    
+    CREATE TRIGGER demand_on_item_delete AFTER DELETE ON request_items
+    -- Перенос заявки в заказы не уменьшает спрос: история остается в order_items
+    WHEN NOT EXISTS (SELECT 1 FROM archiving_requests WHERE request_id = OLD.request_id)
+    BEGIN
+        UPDATE demand_daily SET quantity = quantity - OLD.quantity, lines = lines - 1
+        WHERE product_id = OLD.product_id
+          AND (supplier_id, day) = (SELECT supplier_id, date(created_at) FROM requests WHERE id = OLD.request_id);
+        DELETE FROM demand_daily WHERE product_id = OLD.product_id AND lines <= 0;
+    END;
+    
+    -- Мягкое удаление (deleted_at) и физическое удаление живой строки оставляют tombstone;
+    -- очистка уже помеченных строк (app/cleanup.py) время tombstone не сдвигает
+    CREATE TRIGGER tombstone_on_product_delete AFTER DELETE ON products
+    WHEN OLD.deleted_at IS NULL
+    BEGIN
+        INSERT INTO tombstones (entity, entity_id) VALUES ('product', OLD.id)
+        ON CONFLICT (entity, entity_id) DO UPDATE SET deleted_at = CURRENT_TIMESTAMP;
+    END;
+    
+    CREATE TRIGGER tombstone_on_product_soft_delete AFTER UPDATE OF deleted_at ON products
+    WHEN OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL
+    BEGIN
+        INSERT INTO tombstones (entity, entity_id) VALUES ('product', OLD.id)
+        ON CONFLICT (entity, entity_id) DO UPDATE SET deleted_at = CURRENT_TIMESTAMP;
+    END;
+    
+    CREATE TRIGGER tombstone_on_shop_soft_delete AFTER UPDATE OF deleted_at ON shops
+    WHEN OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL
+    BEGIN
+        INSERT INTO tombstones (entity, entity_id) VALUES ('shop', OLD.id)
+        ON CONFLICT (entity, entity_id) DO UPDATE SET deleted_at = CURRENT_TIMESTAMP;
+    END;
+'''
+
+# Выполняется после добавления колонок
+INDEXES = '''
+    -- Артикул поставщика: ключ для обновления товаров при импорте
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_products_sku ON products (sku) WHERE sku IS NOT NULL;
+    
+    -- Заказ, созданный из заявки (не более одного)
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_request ON orders (request_id) WHERE request_id IS NOT NULL;
+    CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at);
+    CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id);
+    
+    -- Последние заявки по товару (карточка товара)
+    CREATE INDEX IF NOT EXISTS idx_request_items_product ON request_items (product_id, request_id);
+    
+    -- Фильтры отчетов и списка заявок (даты, статус, торговый, магазин)
+    CREATE INDEX IF NOT EXISTS idx_request_items_request ON request_items (request_id);
+    CREATE INDEX IF NOT EXISTS idx_requests_created ON requests (created_at);
+    CREATE INDEX IF NOT EXISTS idx_requests_status_created ON requests (status, created_at);
+    CREATE INDEX IF NOT EXISTS idx_requests_supplier_created ON requests (supplier_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_requests_shop ON requests (shop_id);
+    CREATE INDEX IF NOT EXISTS idx_products_category ON products (category_id);
+    -- Изменения каталога с версии клиента (app/catalogue.py)
+    CREATE INDEX IF NOT EXISTS idx_products_updated ON products (updated_at);
+    CREATE INDEX IF NOT EXISTS idx_logs_created ON logs (created_at);
+    
+    -- Инкрементальная синхронизация API: (updated_at, id) по торговому
+    CREATE INDEX IF NOT EXISTS idx_requests_supplier_updated ON requests (supplier_id, updated_at, id);
+    CREATE INDEX IF NOT EXISTS idx_shops_supplier_updated ON shops (supplier_id, updated_at, id);
+    
+    -- Мягкое удаление: рабочие списки читают только живые строки (deleted_at IS NULL),
+    -- очистка - только удаленные; ссылки на товар и магазин проверяются перед очисткой
+    CREATE INDEX IF NOT EXISTS idx_products_live_created ON products (created_at) WHERE deleted_at IS NULL;
+    CREATE INDEX IF NOT EXISTS idx_products_live_category ON products (category_id, name) WHERE deleted_at IS NULL;
+    CREATE INDEX IF NOT EXISTS idx_shops_live_supplier ON shops (supplier_id, created_at) WHERE deleted_at IS NULL;
+    CREATE INDEX IF NOT EXISTS idx_products_deleted ON products (deleted_at) WHERE deleted_at IS NOT NULL;
+    CREATE INDEX IF NOT EXISTS idx_shops_deleted ON shops (deleted_at) WHERE deleted_at IS NOT NULL;
+    CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items (product_id);
+    CREATE INDEX IF NOT EXISTS idx_orders_shop ON orders (shop_id);
+    -- История заявок по торговому (отчеты, карточка торгового), см. REQUEST_HISTORY_SQL
+    CREATE INDEX IF NOT EXISTS idx_orders_supplier_created ON orders (supplier_id, created_at);
+'''
+
+
+def add_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+    """Добавить колонку, если ее еще нет"""
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    if column not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def sync_triggers(conn: sqlite3.Connection) -> None:
+    """Создать недостающие и пересоздать измененные триггеры из TRIGGERS.
+
+    Все в одной транзакции BEGIN IMMEDIATE: запись из другого процесса не
+    попадает между DROP и CREATE и не проходит мимо триггера. Совпадающие
+    триггеры не трогаются, поэтому обычный запуск ничего не пишет.
+    """
+    wanted = {match.group(2): match.group(1)
+              for match in re.finditer(r'(CREATE TRIGGER (\w+)\b.*?\n\s*END);', TRIGGERS, re.S)}
+    existing = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall())
+    if all(existing.get(name) == sql for name, sql in wanted.items()):
+        return
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Перечитываем под блокировкой: другой процесс мог успеть обновить триггеры
+        existing = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall())
+        for name, sql in wanted.items():
+            if existing.get(name) != sql:
+                conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+                conn.execute(sql)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def drop_request_reference(conn: sqlite3.Connection) -> None:
+    """Убрать REFERENCES requests у orders.request_id в уже обновленных БД.
+
+    Заявка удаляется при переносе в заказ, колонка хранит только номер
+    исходной заявки. SQLite не удаляет ограничения через ALTER TABLE,
+    поэтому таблица перестраивается (orders_new -> копия строк -> DROP ->
+    RENAME, затем индексы и триггеры) в одной транзакции BEGIN IMMEDIATE.
+    """
+    if not any(row[2] == 'requests' for row in conn.execute('PRAGMA foreign_key_list(orders)')):
+        return
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Под блокировкой: таблицу мог уже перестроить другой процесс
+        if not any(row[2] == 'requests' for row in conn.execute('PRAGMA foreign_key_list(orders)')):
+            conn.rollback()
+            return
+        table_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'orders'").fetchone()[0]
+        dependents = [row[0] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = 'orders' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+        )]
+        sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'orders'").fetchone()
+
+        conn.execute(table_sql.replace('CREATE TABLE orders', 'CREATE TABLE orders_new', 1)
+                              .replace(' REFERENCES requests (id)', ''))
+        conn.execute('INSERT INTO orders_new SELECT * FROM orders')
+        conn.execute('DROP TABLE orders')
+        conn.execute('ALTER TABLE orders_new RENAME TO orders')
+        for sql in dependents:
+            conn.execute(sql)
+        # Номера заказов не переиспользуются (AUTOINCREMENT)
+        if sequence is not None:
+            conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'orders'", (sequence[0],))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def upgrade_schema(conn: sqlite3.Connection) -> None:
+    """Применить изменения схемы к открытому подключению"""
+    conn.executescript(SCHEMA_UPGRADES)
+    # Колонка используется Shop.create, но отсутствует в init_db.py
+    add_column(conn, 'shops', 'business_type', 'TEXT')
+    add_column(conn, 'products', 'sku', 'TEXT')
+    add_column(conn, 'logs', 'details', 'TEXT')
+    # Номер исходной заявки, без внешнего ключа: сама заявка удаляется при переносе
+    add_column(conn, 'orders', 'request_id', 'INTEGER')
+    drop_request_reference(conn)
+    add_column(conn, 'orders', 'supplier_id', 'INTEGER REFERENCES suppliers (id)')
+    add_column(conn, 'products', 'deleted_at', 'TIMESTAMP')
+    add_column(conn, 'shops', 'deleted_at', 'TIMESTAMP')
+    conn.executescript(INDEXES)
+    sync_triggers(conn)
+    conn.commit()
+    
+    # Первичное заполнение сводной таблицы для уже существующих заявок
+    if not conn.execute('SELECT 1 FROM demand_daily LIMIT 1').fetchone() \
+            and conn.execute('SELECT 1 FROM request_items UNION ALL SELECT 1 FROM order_items LIMIT 1').fetchone():
+        from app.analytics import rebuild_demand_rollup
+        rebuild_demand_rollup(conn)
+
+
+def upgrade_database(path: str) -> None:
+    """Применить изменения схемы к файлу БД, если он уже создан"""
+    if not os.path.exists(path):
+        return
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        # WAL сохраняется в файле БД: чтение не ждет записи в соседних потоках и воркерах
+        conn.execute('PRAGMA journal_mode=WAL')
+        upgrade_schema(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,99 @@
+// Каталог товаров в IndexedDB: с сервера приходят только изменения после сохраненной версии
+// (см. app/catalogue.py). Без IndexedDB каталог каждый раз загружается целиком.
+const CatalogueCache = (function () {
+    const DB_NAME = 'melochy-catalogue';
+    const DB_VERSION = 1;
+
+    function request(req) {
+        return new Promise((resolve, reject) => {
+            req.onsuccess = () => resolve(req.result);
+            req.onerror = () => reject(req.error);
+        });
+    }
+
+    function openDb() {
+        if (!window.indexedDB) {
+            return Promise.resolve(null);
+        }
+        const req = indexedDB.open(DB_NAME, DB_VERSION);
+        req.onupgradeneeded = () => {
+            req.result.createObjectStore('products', { keyPath: 'id' });
+            req.result.createObjectStore('meta');
+        };
+        return request(req).catch(() => null);
+    }
+
+    function fetchChanges(url, since) {
+        const query = since ? '?since=' + encodeURIComponent(since) : '';
+        return fetch(url + query, { headers: { 'Accept': 'application/json' }, credentials: 'same-origin' })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('catalogue: HTTP ' + response.status);
+                }
+                return response.json();
+            });
+    }
+
+    function toObjects(data) {
+        return data.products.map(row => {
+            const product = {};
+            data.columns.forEach((column, index) => { product[column] = row[index]; });
+            return product;
+        });
+    }
+
+    function apply(db, data) {
+        const tx = db.transaction(['products', 'meta'], 'readwrite');
+        const products = tx.objectStore('products');
+        const meta = tx.objectStore('meta');
+        if (data.full) {
+            products.clear();
+        }
+        // Сначала удаления, затем новые и измененные товары
+        data.deleted.forEach(id => products.delete(id));
+        toObjects(data).forEach(product => products.put(product));
+        return request(meta.get('state')).then(state => {
+            meta.put({
+                version: data.version,
+                categories: data.categories || (state && state.categories) || []
+            }, 'state');
+            return new Promise((resolve, reject) => {
+                tx.oncomplete = resolve;
+                tx.onerror = () => reject(tx.error);
+            });
+        });
+    }
+
+    function readAll(db) {
+        const tx = db.transaction(['products', 'meta'], 'readonly');
+        return Promise.all([
+            request(tx.objectStore('products').getAll()),
+            request(tx.objectStore('meta').get('state'))
+        ]).then(([products, state]) => ({ products: products, categories: (state && state.categories) || [] }));
+    }
+
+    function result(products, categories) {
+        const names = new Map(categories.map(([id, name]) => [id, name]));
+        products.forEach(product => { product.category_name = names.get(product.category_id) || null; });
+        // Новые товары первыми, как в списке каталога на сервере
+        products.sort((a, b) => b.id - a.id);
+        return products;
+    }
+
+    // Товары каталога (с category_name); при ошибке сети - последняя сохраненная копия
+    function load(url) {
+        return openDb().then(db => {
+            if (!db) {
+                return fetchChanges(url, null).then(data => result(toObjects(data), data.categories));
+            }
+            return request(db.transaction('meta', 'readonly').objectStore('meta').get('state'))
+                .then(state => fetchChanges(url, state && state.version))
+                .then(data => apply(db, data))
+                .catch(error => console.warn('Каталог не обновлен, используется сохраненная копия', error))
+                .then(() => readAll(db))
+                .then(data => result(data.products, data.categories));
+        });
+    }
+
+    return { load: load };
+})();
@@ -0,0 +1,434 @@
+// Глобальная карта выбранных товаров: ID товара -> количество
+let selectedProducts = new Map();
+let allProducts = []; // Массив для хранения всех товаров
+
+// Функция поиска и фильтрации товаров
+function searchProducts() {
+    const searchTerm = document.getElementById('product-search').value.toLowerCase().trim();
+    const clearBtn = document.getElementById('clear-search');
+    const productsGrid = document.getElementById('products-grid');
+    const productsCount = document.getElementById('products-count');
+
+    // Показываем/скрываем кнопку очистки
+    if (searchTerm) {
+        clearBtn.style.display = 'flex';
+    } else {
+        clearBtn.style.display = 'none';
+    }
+
+    let visibleCount = 0;
+
+    // Фильтруем товары
+    const productCards = productsGrid.querySelectorAll('.product-card');
+    productCards.forEach(card => {
+        const productName = card.querySelector('.product-name').textContent.toLowerCase();
+        const productDescription = card.querySelector('.product-description');
+        const description = productDescription ? productDescription.textContent.toLowerCase() : '';
+
+        const isVisible = productName.includes(searchTerm) || description.includes(searchTerm);
+
+        if (isVisible) {
+            card.style.display = 'block';
+            visibleCount++;
+        } else {
+            card.style.display = 'none';
+        }
+    });
+
+    // Обновляем счетчик
+    productsCount.textContent = visibleCount;
+
+    // Показываем сообщение, если ничего не найдено
+    const noResultsMsg = document.getElementById('no-results-message');
+    if (visibleCount === 0 && searchTerm) {
+        if (!noResultsMsg) {
+            const messageDiv = document.createElement('div');
+            messageDiv.id = 'no-results-message';
+            messageDiv.className = 'no-results-message';
+            messageDiv.innerHTML = `
+                <div class="no-results-content">
+                    <i class="fas fa-search"></i>
+                    <h3>Товары не найдены</h3>
+                    <p>По запросу "${searchTerm}" товары не найдены</p>
+                    <button type="button" onclick="clearSearch()" class="btn btn-primary">
+                        <i class="fas fa-times"></i> Очистить поиск
+                    </button>
+                </div>
+            `;
+            productsGrid.appendChild(messageDiv);
+        }
+    } else if (noResultsMsg) {
+        noResultsMsg.remove();
+    }
+}
+
+// Функция очистки поиска
+function clearSearch() {
+    const searchInput = document.getElementById('product-search');
+    const clearBtn = document.getElementById('clear-search');
+    const noResultsMsg = document.getElementById('no-results-message');
+
+    searchInput.value = '';
+    clearBtn.style.display = 'none';
+
+    if (noResultsMsg) {
+        noResultsMsg.remove();
+    }
+
+    searchProducts();
+    searchInput.focus();
+}
+
+// Функция изменения количества товара
+function updateQuantity(productId, change) {
+    const currentQty = selectedProducts.get(productId) || 0;
+    const newQty = Math.max(0, currentQty + change);
+
+    // Обновляем карту выбранных товаров
+    if (newQty === 0) {
+        selectedProducts.delete(productId);
+    } else {
+        selectedProducts.set(productId, newQty);
+    }
+
+    // Находим карточку товара
+    const productCard = document.querySelector(`[data-product-id="${productId}"]`);
+    if (!productCard) return;
+
+    // Обновляем отображение количества
+    const quantityDisplay = productCard.querySelector('.quantity-number');
+    if (quantityDisplay) {
+        quantityDisplay.textContent = newQty;
+    }
+
+    // Обновляем состояние карточки
+    if (newQty > 0) {
+        productCard.classList.add('selected');
+    } else {
+        productCard.classList.remove('selected');
+    }
+
+    // Обновляем кнопки (обе кнопки минус)
+    const minusButtons = productCard.querySelectorAll('.quantity-btn.minus');
+    const plusButtons = productCard.querySelectorAll('.quantity-btn.plus');
+
+    minusButtons.forEach(btn => {
+        btn.disabled = newQty <= 0;
+    });
+
+    // Обновляем скрытые поля и итоги
+    updateHiddenInputs();
+    updateSummary();
+}
+
+// Функция обновления скрытых полей формы
+function updateHiddenInputs() {
+    // Удаляем все существующие скрытые поля
+    const existingInputs = document.querySelectorAll('.hidden-product-input');
+    existingInputs.forEach(input => input.remove());
+
+    // Создаем новые скрытые поля для выбранных товаров
+    const form = document.querySelector('form');
+    if (!form) return;
+
+    selectedProducts.forEach((quantity, productId) => {
+        const input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = `products[${productId}]`;
+        input.value = quantity;
+        input.className = 'hidden-product-input';
+        form.appendChild(input);
+    });
+}
+
+// Функция обновления блока итогов
+function updateSummary() {
+    const totalItems = Array.from(selectedProducts.values()).reduce((sum, qty) => sum + qty, 0);
+    const totalProducts = selectedProducts.size;
+    let totalRetailPrice = 0;
+    let totalWholesalePrice = 0;
+
+    // Обновляем счетчики в итогах
+    const totalItemsElement = document.getElementById('totalItems');
+    const totalProductsElement = document.getElementById('totalProducts');
+    const totalRetailElement = document.getElementById('totalRetailPrice');
+    const totalWholesaleElement = document.getElementById('totalWholesalePrice');
+
+    if (totalItemsElement) totalItemsElement.textContent = totalItems;
+    if (totalProductsElement) totalProductsElement.textContent = totalProducts;
+
+    // Обновляем список выбранных товаров и считаем стоимость
+    const selectedList = document.getElementById('selectedProductsList');
+    if (selectedList) {
+        selectedList.innerHTML = '';
+
+        selectedProducts.forEach((quantity, productId) => {
+            const productCard = document.querySelector(`[data-product-id="${productId}"]`);
+            if (productCard) {
+                const productName = productCard.querySelector('.product-name')?.textContent || 'Товар';
+                const shopElement = productCard.querySelector('.product-shop');
+                const shopName = shopElement ? shopElement.textContent.replace('📍 ', '') : 'Магазин';
+
+                // Извлекаем цены из карточки товара
+                const priceDiv = productCard.querySelector('.product-price');
+                let retailPrice = 0;
+                let wholesalePrice = 0;
+
+                if (priceDiv) {
+                    // Извлекаем розничную цену из <strong> элемента
+                    const strongElement = priceDiv.querySelector('strong');
+                    if (strongElement) {
+                        const priceText = strongElement.textContent;
+                        retailPrice = parseFloat(priceText.replace(/[^\d.,]/g, '').replace(',', '.')) || 0;
+                    }
+
+                    // Извлекаем оптовую цену из <small> элемента
+                    const smallElement = priceDiv.querySelector('small');
+                    if (smallElement) {
+                        const wholesalePriceText = smallElement.textContent;
+                        wholesalePrice = parseFloat(wholesalePriceText.replace(/[^\d.,]/g, '').replace(',', '.')) || 0;
+                    } else {
+                        // Если оптовой цены нет, делаем скидку 15% от розничной
+                        wholesalePrice = retailPrice * 0.85;
+                    }
+                }                    // Добавляем к общей стоимости
+                totalRetailPrice += retailPrice * quantity;
+                totalWholesalePrice += wholesalePrice * quantity;
+
+                const itemElement = document.createElement('div');
+                itemElement.className = 'selected-product-item';
+                itemElement.innerHTML = `
+                <div class="selected-product-info">
+                    <h5>${productName}</h5>
+                    <small>${shopName}</small>
+                </div>
+                <div class="selected-product-qty">${quantity} шт.</div>
+            `;
+                selectedList.appendChild(itemElement);
+            }
+        });
+    }
+
+    // Обновляем отображение цен
+    if (totalRetailElement) {
+        totalRetailElement.textContent = totalRetailPrice.toFixed(2) + ' ₸';
+    }
+    if (totalWholesaleElement) {
+        totalWholesaleElement.textContent = totalWholesalePrice.toFixed(2) + ' ₸';
+    }
+
+    // Показываем/скрываем блок итогов
+    const summaryBlock = document.querySelector('.request-summary');
+    if (summaryBlock) {
+        summaryBlock.style.display = totalItems > 0 ? 'block' : 'none';
+    }
+
+    // Активируем/деактивируем кнопку отправки
+    const submitBtn = document.querySelector('button[type="submit"]');
+    if (submitBtn) {
+        submitBtn.disabled = totalItems === 0;
+
+        // Обновляем текст кнопки
+        if (totalItems > 0) {
+            submitBtn.innerHTML = `<i class="fas fa-paper-plane"></i> Отправить заявку (${totalItems} товаров)`;
+        } else {
+            submitBtn.innerHTML = `<i class="fas fa-paper-plane"></i> Выберите товары`;
+        }
+    }
+}
+
+// Функция очистки всех выборов
+function clearAllSelections() {
+    if (selectedProducts.size === 0) return;
+
+    if (confirm('Очистить все выбранные товары?')) {
+        selectedProducts.clear();
+
+        // Обновляем все карточки
+        document.querySelectorAll('.product-card').forEach(card => {
+            card.classList.remove('selected');
+            const quantityDisplay = card.querySelector('.quantity-number');
+            if (quantityDisplay) {
+                quantityDisplay.textContent = '0';
+            }
+
+            // Деактивируем все кнопки минус
+            const minusButtons = card.querySelectorAll('.quantity-btn.minus');
+            minusButtons.forEach(btn => {
+                btn.disabled = true;
+            });
+        });
+
+        updateHiddenInputs();
+        updateSummary();
+    }
+}
+
+// Функция поиска товаров
+function filterProducts() {
+    const searchInput = document.getElementById('productSearch');
+    if (!searchInput) return;
+
+    const searchTerm = searchInput.value.toLowerCase().trim();
+    const productCards = document.querySelectorAll('.product-card');
+
+    productCards.forEach(card => {
+        const productName = card.querySelector('.product-name')?.textContent.toLowerCase() || '';
+        const productDescription = card.querySelector('.product-description')?.textContent.toLowerCase() || '';
+        const shopName = card.querySelector('.product-shop')?.textContent.toLowerCase() || '';
+
+        const isVisible = productName.includes(searchTerm) ||
+            productDescription.includes(searchTerm) ||
+            shopName.includes(searchTerm);
+
+        card.style.display = isVisible ? 'block' : 'none';
+    });
+}
+
+// Форматирование цены как в шаблонах ("%.0f")
+function formatPrice(value) {
+    return Math.round(value) + ' ₸';
+}
+
+// Карточка товара из шаблона <template id="product-card-template">
+function renderProductCard(template, product) {
+    const card = template.content.firstElementChild.cloneNode(true);
+    card.dataset.productId = product.id;
+
+    const [image, noImage] = card.querySelectorAll('.product-image');
+    if (product.image_url) {
+        const img = image.querySelector('img');
+        img.src = product.image_url;
+        img.alt = product.name;
+        img.loading = 'lazy';
+        noImage.remove();
+    } else {
+        image.remove();
+    }
+
+    card.querySelector('.product-name').textContent = product.name;
+    const description = card.querySelector('.product-description');
+    if (product.description) {
+        description.textContent = product.description + (product.description.length >= 60 ? '...' : '');
+    } else {
+        description.remove();
+    }
+
+    card.querySelector('.product-price strong').textContent = formatPrice(product.price);
+    const wholesale = card.querySelector('.product-price small');
+    if (product.wholesale_price) {
+        wholesale.textContent = 'Опт: ' + formatPrice(product.wholesale_price);
+    } else {
+        wholesale.remove();
+    }
+
+    const category = card.querySelector('.product-category');
+    if (product.category_name) {
+        category.querySelector('span').textContent = product.category_name;
+    } else {
+        category.remove();
+    }
+
+    card.querySelectorAll('.quantity-btn').forEach(btn => {
+        btn.addEventListener('click', () => updateQuantity(product.id, Number(btn.dataset.step)));
+    });
+    return card;
+}
+
+// Сетка товаров из каталога в IndexedDB
+function renderCatalogue() {
+    const grid = document.getElementById('products-grid');
+    const template = document.getElementById('product-card-template');
+    if (!grid || !template) return Promise.resolve();
+
+    return CatalogueCache.load(grid.dataset.catalogueUrl).then(products => {
+        const fragment = document.createDocumentFragment();
+        products.forEach(product => fragment.appendChild(renderProductCard(template, product)));
+        grid.replaceChildren(fragment);
+        document.getElementById('products-count').textContent = products.length;
+    });
+}
+
+// Инициализация при загрузке страницы
+document.addEventListener('DOMContentLoaded', function () {
+    console.log('🛒 Инициализация системы заявок Торговыйа');
+
+    // Карточки товаров (кнопки "минус" в шаблоне изначально неактивны)
+    renderCatalogue().then(searchProducts);
+
+    // Обновляем начальное состояние
+    updateSummary();
+
+    // Обработчик отправки формы
+    const form = document.querySelector('form');
+    if (form) {
+        form.addEventListener('submit', function (e) {
+            if (selectedProducts.size === 0) {
+                e.preventDefault();
+                alert('❗ Пожалуйста, выберите хотя бы один товар для заявки');
+                return false;
+            }
+
+            // Финальное обновление скрытых полей
+            updateHiddenInputs();
+
+            // Показываем подтверждение
+            const totalItems = Array.from(selectedProducts.values()).reduce((sum, qty) => sum + qty, 0);
+            if (!confirm(`Отправить заявку на ${totalItems} товаров?`)) {
+                e.preventDefault();
+                return false;
+            }
+
+            // Показываем индикатор загрузки
+            const submitBtn = this.querySelector('button[type="submit"]');
+            if (submitBtn) {
+                submitBtn.disabled = true;
+                submitBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Отправка...';
+            }
+        });
+    }
+
+    // Добавляем поиск товаров
+    const searchInput = document.getElementById('product-search');
+    const clearSearchBtn = document.getElementById('clear-search');
+
+    if (searchInput) {
+        searchInput.addEventListener('input', searchProducts);
+        searchInput.addEventListener('keyup', function(e) {
+            if (e.key === 'Enter') {
+                e.preventDefault();
+                searchProducts();
+            }
+            if (e.key === 'Escape') {
+                clearSearch();
+            }
+        });
+    }
+
+    if (clearSearchBtn) {
+        clearSearchBtn.addEventListener('click', clearSearch);
+    }
+
+    console.log('✅ Система заявок готова к работе');
+});
+
+// Обработка клавиатурных сокращений
+document.addEventListener('keydown', function (e) {
+    // Ctrl+Enter для отправки формы
+    if (e.ctrlKey && e.key === 'Enter') {
+        const submitBtn = document.querySelector('button[type="submit"]');
+        if (submitBtn && !submitBtn.disabled) {
+            submitBtn.click();
+        }
+    }
+
+    // Escape для очистки поиска
+    if (e.key === 'Escape') {
+        const searchInput = document.getElementById('productSearch');
+        if (searchInput && searchInput.value) {
+            searchInput.value = '';
+            filterProducts();
+            searchInput.focus();
+        }
+    }
+});
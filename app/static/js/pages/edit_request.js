@@ -0,0 +1,120 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const productCards = document.querySelectorAll('.product-card');
+
+    productCards.forEach(card => {
+        const quantity = currentProducts[card.dataset.productId];
+        if (quantity) {
+            card.querySelector('.quantity-input').value = quantity;
+        }
+    });
+    const selectedCountElement = document.getElementById('selected-count');
+    const submitButton = document.getElementById('submit-request');
+    const searchInput = document.getElementById('product-search');
+    const clearSearchButton = document.getElementById('clear-search');
+    const productsCountElement = document.getElementById('products-count');
+
+    function updateSelectedCount() {
+        let selectedCount = 0;
+        productCards.forEach(card => {
+            const quantityInput = card.querySelector('.quantity-input');
+            if (quantityInput && parseInt(quantityInput.value) > 0) {
+                selectedCount++;
+            }
+        });
+        selectedCountElement.textContent = selectedCount;
+        submitButton.disabled = selectedCount === 0;
+    }
+
+    function updateCardAppearance(card) {
+        const quantityInput = card.querySelector('.quantity-input');
+        const quantity = parseInt(quantityInput.value) || 0;
+
+        if (quantity > 0) {
+            card.classList.add('selected');
+        } else {
+            card.classList.remove('selected');
+        }
+    }
+
+    // Обработчики количества
+    productCards.forEach(card => {
+        const productId = card.dataset.productId;
+        const quantityInput = card.querySelector('.quantity-input');
+        const plusBtn = card.querySelector('.plus');
+        const minusBtn = card.querySelector('.minus');
+
+        plusBtn.addEventListener('click', () => {
+            let currentValue = parseInt(quantityInput.value) || 0;
+            quantityInput.value = currentValue + 1;
+            updateCardAppearance(card);
+            updateSelectedCount();
+        });
+
+        minusBtn.addEventListener('click', () => {
+            let currentValue = parseInt(quantityInput.value) || 0;
+            if (currentValue > 0) {
+                quantityInput.value = currentValue - 1;
+                updateCardAppearance(card);
+                updateSelectedCount();
+            }
+        });
+
+        quantityInput.addEventListener('input', () => {
+            let value = parseInt(quantityInput.value) || 0;
+            if (value < 0) {
+                quantityInput.value = 0;
+                value = 0;
+            }
+            updateCardAppearance(card);
+            updateSelectedCount();
+        });
+
+        // Клик по карточке для добавления товара
+        card.addEventListener('click', (e) => {
+            if (!e.target.closest('.quantity-controls')) {
+                let currentValue = parseInt(quantityInput.value) || 0;
+                quantityInput.value = currentValue + 1;
+                updateCardAppearance(card);
+                updateSelectedCount();
+            }
+        });
+
+        // Инициализация состояния карточки
+        updateCardAppearance(card);
+    });
+
+    // Поиск товаров
+    searchInput.addEventListener('input', function() {
+        const searchTerm = this.value.toLowerCase().trim();
+        let visibleCount = 0;
+
+        productCards.forEach(card => {
+            const productName = card.querySelector('.product-name').textContent.toLowerCase();
+            const productDescription = card.querySelector('.product-description p');
+            const description = productDescription ? productDescription.textContent.toLowerCase() : '';
+
+            if (productName.includes(searchTerm) || description.includes(searchTerm)) {
+                card.style.display = 'block';
+                visibleCount++;
+            } else {
+                card.style.display = 'none';
+            }
+        });
+
+        productsCountElement.textContent = visibleCount;
+        clearSearchButton.style.display = searchTerm ? 'block' : 'none';
+    });
+
+    clearSearchButton.addEventListener('click', function() {
+        searchInput.value = '';
+        productCards.forEach(card => {
+            card.style.display = 'block';
+        });
+        productsCountElement.textContent = productCards.length;
+        this.style.display = 'none';
+        searchInput.focus();
+    });
+
+    // Инициализация
+    updateSelectedCount();
+});
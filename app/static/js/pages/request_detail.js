@@ -0,0 +1,197 @@
+function printRequest() {
+    // Скрываем элементы управления перед печатью
+    const actionButtons = document.querySelectorAll('.btn, button');
+    actionButtons.forEach(btn => {
+        if (!btn.closest('.print-friendly')) {
+            btn.style.display = 'none';
+        }
+    });
+
+    // Открываем диалог печати
+    window.print();
+
+    // Восстанавливаем элементы после печати
+    setTimeout(() => {
+        actionButtons.forEach(btn => {
+            btn.style.display = '';
+        });
+    }, 100);
+}
+
+function exportRequest(event) {
+    const requestId = document.querySelector('.request-detail').dataset.requestId;
+
+// Показываем индикатор загрузки
+const btn = event.target;
+const originalText = btn.innerHTML;
+btn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Экспорт...';
+btn.disabled = true;
+
+// Отправляем запрос на экспорт
+fetch(`/admin/requests/${requestId}/export`, {
+    method: 'GET',
+    headers: {
+        'Content-Type': 'application/json',
+    }
+})
+    .then(response => {
+        if (!response.ok) {
+            throw new Error('Ошибка при экспорте');
+        }
+        return response.blob();
+    })
+    .then(blob => {
+        // Создаем ссылку для скачивания
+        const url = window.URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.style.display = 'none';
+        a.href = url;
+        a.download = `Заявка_${requestId}_${new Date().toISOString().split('T')[0]}.xlsx`;
+        document.body.appendChild(a);
+        a.click();
+        window.URL.revokeObjectURL(url);
+        document.body.removeChild(a);
+
+        // Показываем уведомление об успехе
+        showNotification('Заявка успешно экспортирована!', 'success');
+    })
+    .catch(error => {
+        console.error('Ошибка экспорта:', error);
+        showNotification('Ошибка при экспорте заявки', 'error');
+    })
+    .finally(() => {
+        // Восстанавливаем кнопку
+        btn.innerHTML = originalText;
+        btn.disabled = false;
+    });
+}
+
+function showNotification(message, type = 'info') {
+    // Создаем уведомление
+    const notification = document.createElement('div');
+    notification.className = `notification ${type}`;
+    notification.style.cssText = `
+        position: fixed;
+        top: 20px;
+        right: 20px;
+        padding: 15px 20px;
+        border-radius: 8px;
+        color: white;
+        font-weight: 500;
+        z-index: 10000;
+        max-width: 300px;
+        box-shadow: 0 4px 12px rgba(0,0,0,0.3);
+        transition: all 0.3s ease;
+    `;
+
+    // Устанавливаем цвет в зависимости от типа
+    switch (type) {
+        case 'success':
+            notification.style.background = '#28a745';
+            break;
+        case 'error':
+            notification.style.background = '#dc3545';
+            break;
+        default:
+            notification.style.background = '#17a2b8';
+    }
+
+    notification.textContent = message;
+    document.body.appendChild(notification);
+
+    // Удаляем уведомление через 5 секунд
+    setTimeout(() => {
+        notification.style.opacity = '0';
+        notification.style.transform = 'translateX(100%)';
+        setTimeout(() => {
+            if (notification.parentNode) {
+                notification.parentNode.removeChild(notification);
+            }
+        }, 300);
+    }, 5000);
+}
+
+// Улучшенная функция печати с предпросмотром
+function printRequestAdvanced() {
+    const printWindow = window.open('', '_blank');
+    const printContent = document.cloneNode(true);
+
+    // Удаляем ненужные элементы
+    const elementsToRemove = printContent.querySelectorAll('.btn, button, .navbar, .request-actions-card');
+    elementsToRemove.forEach(el => el.remove());
+
+    printWindow.document.write(`
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Заявка #${document.querySelector('.request-detail').dataset.requestId}</title>
+            <meta charset="utf-8">
+            <style>
+                body { font-family: Arial, sans-serif; margin: 20px; }
+                .request-detail { max-width: 800px; margin: 0 auto; }
+                table { width: 100%; border-collapse: collapse; margin: 15px 0; }
+                th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+                th { background-color: #f5f5f5; font-weight: bold; }
+                .header { text-align: center; margin-bottom: 30px; }
+                .info-grid { display: grid; grid-template-columns: repeat(2, 1fr); gap: 15px; margin: 20px 0; }
+                .info-item { padding: 10px; border: 1px solid #eee; }
+                .info-item label { font-weight: bold; display: block; margin-bottom: 5px; }
+            </style>
+        </head>
+        <body>
+            ${printContent.querySelector('.request-detail').outerHTML}
+        </body>
+        </html>
+    `);
+
+    printWindow.document.close();
+    printWindow.focus();
+    printWindow.print();
+}
+
+function showAddItemForm() {
+    const form = document.getElementById('add-item-form');
+    const productSelect = document.getElementById('product_id');
+    const quantityInput = document.getElementById('quantity');
+
+    // Загружаем список товаров, если еще не загружен
+    if (productSelect.children.length === 1) {
+        loadProducts(productSelect);
+    }
+
+    form.style.display = 'block';
+    quantityInput.value = '1';
+    productSelect.focus();
+}
+
+function hideAddItemForm() {
+    const form = document.getElementById('add-item-form');
+    form.style.display = 'none';
+
+    // Очищаем форму
+    document.getElementById('product_id').value = '';
+    document.getElementById('quantity').value = '';
+}
+
+function loadProducts(selectElement) {
+    // В реальном приложении это был бы AJAX запрос к /api/products
+    // Для простоты добавим статический список
+    fetch('/admin/products/api')
+        .then(response => response.json())
+        .then(products => {
+            products.forEach(product => {
+                const option = document.createElement('option');
+                option.value = product.id;
+                option.textContent = `${product.name} - ${product.price}₸`;
+                selectElement.appendChild(option);
+            });
+        })
+        .catch(error => {
+            console.error('Ошибка загрузки товаров:', error);
+            // Fallback - показываем сообщение об ошибке
+            const option = document.createElement('option');
+            option.value = '';
+            option.textContent = 'Ошибка загрузки товаров';
+            selectElement.appendChild(option);
+        });
+}
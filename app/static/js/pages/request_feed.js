@@ -0,0 +1,45 @@
+// Лента изменений заявок: обновляет статусы в таблице и предлагает перезагрузить список
+(function () {
+    const container = document.querySelector('[data-request-feed]');
+    if (!container || !window.EventSource) {
+        return;
+    }
+
+    const STATUS_LABELS = {
+        pending: 'Ожидает',
+        processing: 'В обработке',
+        completed: 'Завершена'
+    };
+    const STATUS_ICONS = {
+        pending: 'fa-clock',
+        processing: 'fa-spinner',
+        completed: 'fa-check'
+    };
+
+    const notice = document.getElementById('request-feed-notice');
+    const source = new EventSource(container.dataset.requestFeed);
+
+    source.addEventListener('request', function (event) {
+        const change = JSON.parse(event.data);
+        const shopId = container.dataset.shopId;
+        if (shopId && String(change.shop_id) !== shopId) {
+            return;
+        }
+
+        const badge = document.querySelector('[data-request-status="' + change.request_id + '"]');
+        if (change.kind === 'status' && badge) {
+            // Цвет задает класс status-<статус>, иконка (если есть) сохраняется
+            const icon = badge.querySelector('i');
+            const label = STATUS_LABELS[change.status] || change.status;
+            badge.textContent = icon ? ' ' + label : label;
+            if (icon) {
+                icon.className = 'fas ' + (STATUS_ICONS[change.status] || 'fa-circle');
+                badge.prepend(icon);
+            }
+            badge.classList.remove('status-pending', 'status-processing', 'status-completed');
+            badge.classList.add('status-' + change.status);
+        } else if (notice) {
+            notice.style.display = '';
+        }
+    });
+})();
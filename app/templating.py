@@ -0,0 +1,69 @@
+"""Кеш байткода Jinja и прогрев шаблонов.
+
+Скомпилированные шаблоны хранятся на диске и общие для всех воркеров,
+поэтому после перезапуска воркера (--max-requests) шаблоны не
+компилируются заново.
+"""
+import os
+import shutil
+import time
+import click
+from flask import Flask
+from jinja2 import FileSystemBytecodeCache
+
+
+def warm_templates(app: Flask) -> int:
+    """Загрузить все шаблоны в кеш окружения Jinja"""
+    env = app.jinja_env
+    names = env.list_templates(extensions=['html'])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def init_app(app: Flask) -> None:
+    is_production = os.environ.get('FLASK_ENV') == 'production'
+    app.config.setdefault('JINJA_CACHE_DIR', os.environ.get(
+        'JINJA_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache')))
+    app.config.setdefault('JINJA_WARMUP', is_production)
+    if is_production:
+        # В продакшене шаблоны меняются только при деплое
+        app.config['TEMPLATES_AUTO_RELOAD'] = False
+
+    cache_dir = app.config['JINJA_CACHE_DIR']
+    os.makedirs(cache_dir, exist_ok=True)
+    # jinja_options нужно задать до первого обращения к app.jinja_env
+    app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(cache_dir))
+
+    @app.cli.command('precompile-templates')
+    @click.option('--clear', is_flag=True, help='Очистить кеш байткода перед сборкой')
+    def precompile_templates(clear: bool) -> None:
+        """Скомпилировать все шаблоны в кеш байткода и вывести отчет о времени"""
+        if clear:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            os.makedirs(cache_dir, exist_ok=True)
+
+        env = app.jinja_env
+        # Окружение без кеша шаблонов: каждая загрузка идет через байткод
+        cold_env = env.overlay(cache_size=0)
+        total_compile = total_load = 0.0
+
+        click.echo(f'{"Шаблон":<40} {"компиляция, мс":>15} {"из байткода, мс":>16}')
+        for name in env.list_templates(extensions=['html']):
+            source, filename, _ = env.loader.get_source(env, name)
+
+            started = time.perf_counter()
+            env.compile(source, name, filename)
+            compile_ms = (time.perf_counter() - started) * 1000
+
+            env.get_template(name)
+            started = time.perf_counter()
+            cold_env.get_template(name)
+            load_ms = (time.perf_counter() - started) * 1000
+
+            total_compile += compile_ms
+            total_load += load_ms
+            click.echo(f'{name:<40} {compile_ms:>15.1f} {load_ms:>16.1f}')
+
+        click.echo(f'{"ИТОГО":<40} {total_compile:>15.1f} {total_load:>16.1f}')
+        click.echo(f'Кеш байткода: {cache_dir}')
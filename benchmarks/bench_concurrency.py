@@ -0,0 +1,117 @@
+"""Бенчмарк конкурентности: синхронные воркеры против gthread.
+
+Запускает Gunicorn на временной БД в двух режимах. Пока несколько
+клиентов выгружают тяжелый отчет (XLSX по всем позициям заявок),
+другой клиент открывает легкую страницу; сравнивается ее задержка и
+общее число обработанных запросов.
+
+Запуск: python benchmarks/bench_concurrency.py
+"""
+import http.cookiejar
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from common import PROJECT_DIR, make_app
+
+SLOW_URL = '/admin/reports/export/request_lines?format=xlsx'
+FAST_URL = '/login'
+SLOW_CLIENTS = 6
+DURATION = 15
+MODES = [
+    ('sync, 3 воркера', {'GUNICORN_WORKER_CLASS': 'sync'}),
+    ('gthread, 3x8', {'GUNICORN_WORKER_CLASS': 'gthread', 'GUNICORN_THREADS': '8'}),
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, env):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(PROJECT_DIR, 'gunicorn.conf.py'),
+         '--pythonpath', PROJECT_DIR, 'wsgi:application'],
+        env=dict(os.environ, GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_TIMEOUT='120',
+                 LOGIN_RATELIMIT_ENABLED='0', **env),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}{FAST_URL}', timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+def admin_opener(base):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    data = urllib.parse.urlencode({'email': 'admin@example.com', 'password': 'admin123'}).encode()
+    opener.open(base + '/login', data=data, timeout=30).read()
+    return opener
+
+
+def run_mode(env):
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    process = start_server(port, env)
+    try:
+        stop = time.time() + DURATION
+        slow_done = []
+        fast_latencies = []
+
+        def slow_client():
+            opener = admin_opener(base)
+            while time.time() < stop:
+                opener.open(base + SLOW_URL, timeout=120).read()
+                slow_done.append(1)
+
+        def fast_client():
+            while time.time() < stop:
+                started = time.perf_counter()
+                urllib.request.urlopen(base + FAST_URL, timeout=120).read()
+                fast_latencies.append((time.perf_counter() - started) * 1000)
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=slow_client) for _ in range(SLOW_CLIENTS)]
+        threads.append(threading.Thread(target=fast_client))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        process.terminate()
+        process.wait()
+
+    fast_latencies.sort()
+    return {
+        'slow': len(slow_done),
+        'fast': len(fast_latencies),
+        'p50': statistics.median(fast_latencies),
+        'p95': fast_latencies[min(len(fast_latencies) - 1, int(len(fast_latencies) * 0.95))],
+    }
+
+
+def main():
+    # Тестовые данные в app.db временной директории, Gunicorn запускается в ней же
+    make_app()
+
+    print(f'{"Режим":<18} {"выгрузок":>9} {"страниц":>9} {"p50, мс":>9} {"p95, мс":>9}')
+    for title, env in MODES:
+        result = run_mode(env)
+        print(f'{title:<18} {result["slow"]:>9} {result["fast"]:>9} '
+              f'{result["p50"]:>9.1f} {result["p95"]:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
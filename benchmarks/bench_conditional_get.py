@@ -0,0 +1,32 @@
+"""Бенчмарк условных GET: полный ответ против 304 Not Modified.
+
+Запуск: python benchmarks/bench_conditional_get.py
+"""
+from common import login, make_app, timed
+
+REPEAT = 200
+
+
+def main():
+    app = make_app()
+    client = login(app.test_client())
+
+    with app.app_context():
+        from app.models import get_db
+        completed_id = get_db().execute(
+            "SELECT id FROM requests WHERE status = 'completed' LIMIT 1"
+        ).fetchone()[0]
+
+    urls = ['/admin/products/api', '/admin/products/1', f'/admin/requests/{completed_id}']
+
+    print(f'{"URL":<32} {"200, мс":>10} {"304, мс":>10} {"ускорение":>10}')
+    for url in urls:
+        etag = client.get(url).headers['ETag']
+        full = timed(lambda: client.get(url), REPEAT)
+        cached = timed(lambda: client.get(url, headers={'If-None-Match': etag}), REPEAT)
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+        print(f'{url:<32} {full:>10.2f} {cached:>10.2f} {full / cached:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Бенчмарк холодного старта: импорт wsgi и запуск Gunicorn.
+
+1. `python -X importtime -c "import wsgi"` на временной БД: время импорта
+   wsgi (вместе с create_app), самые тяжелые модули и проверка, что
+   тяжелые библиотеки (openpyxl, reportlab, msgpack) не загружаются при
+   старте - они импортируются внутри функций, которые их используют.
+2. Время от запуска Gunicorn до первого ответа с --preload и без него.
+
+Код выхода 1, если импорт дольше STARTUP_BUDGET_MS (по умолчанию 600 мс)
+или загружен тяжелый модуль - скрипт можно запускать перед деплоем.
+С --imports-only выполняется только проверка тяжелых модулей (один импорт
+на пустой временной директории, без Gunicorn) - ее запускает deploy.sh.
+
+Запуск: python benchmarks/bench_startup.py [--imports-only]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from bench_concurrency import free_port, start_server
+from common import PROJECT_DIR, seed_database
+
+BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', '600'))
+LAZY_MODULES = ('openpyxl', 'reportlab', 'msgpack')
+RUNS = 5
+MODES = [
+    ('без preload', {'GUNICORN_PRELOAD': '0'}),
+    ('preload', {'GUNICORN_PRELOAD': '1'}),
+]
+
+
+def import_profile():
+    """Модули и их время импорта (мкс) для `import wsgi` в новом процессе"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import wsgi'],
+        env=dict(os.environ, PYTHONPATH=PROJECT_DIR), capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+
+def gunicorn_ready_ms(env):
+    """Время от запуска Gunicorn до первого ответа, мс"""
+    started = time.perf_counter()
+    process = start_server(free_port(), dict(env, GUNICORN_WORKERS='3'))
+    elapsed = (time.perf_counter() - started) * 1000
+    process.terminate()
+    process.wait()
+    return elapsed
+
+
+def lazy_modules_loaded(profile):
+    """Тяжелые модули, загруженные при импорте wsgi"""
+    return sorted(name for name in profile if name.split('.')[0] in LAZY_MODULES)
+
+
+def check_imports():
+    """Быстрая проверка для деплоя: код выхода 1, если тяжелый модуль загружен при старте"""
+    os.chdir(tempfile.mkdtemp(prefix='melochy-imports-'))
+    loaded = lazy_modules_loaded(import_profile())
+    if loaded:
+        print(f'При старте загружены тяжелые модули: {", ".join(loaded[:10])}')
+        sys.exit(1)
+    print(f'Тяжелые модули при старте не загружаются ({", ".join(LAZY_MODULES)})')
+
+
+def main():
+    if '--imports-only' in sys.argv[1:]:
+        check_imports()
+        return
+    os.chdir(tempfile.mkdtemp(prefix='melochy-bench-'))
+    seed_database(requests=200)
+    os.environ['LOGIN_RATELIMIT_ENABLED'] = '0'
+
+    profiles = [import_profile() for _ in range(RUNS)]
+    wsgi_ms = statistics.median(profile['wsgi'][1] for profile in profiles) / 1000
+    last = profiles[-1]
+
+    print(f'Импорт wsgi (медиана из {RUNS}): {wsgi_ms:.0f} мс, бюджет {BUDGET_MS:.0f} мс')
+    print(f'\n{"Модуль":<40} {"свое, мс":>9} {"всего, мс":>10}')
+    heaviest = sorted(last.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (own, cumulative) in heaviest[:15]:
+        print(f'{name:<40} {own / 1000:>9.1f} {cumulative / 1000:>10.1f}')
+
+    loaded = lazy_modules_loaded(last)
+
+    print(f'\n{"Gunicorn":<18} {"до ответа, мс":>14}')
+    for title, env in MODES:
+        print(f'{title:<18} {gunicorn_ready_ms(env):>14.0f}')
+
+    failed = False
+    if loaded:
+        print(f'\nПри старте загружены тяжелые модули: {", ".join(loaded[:10])}')
+        failed = True
+    if wsgi_ms > BUDGET_MS:
+        print(f'\nИмпорт wsgi дольше бюджета: {wsgi_ms:.0f} > {BUDGET_MS:.0f} мс')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
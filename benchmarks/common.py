@@ -0,0 +1,84 @@
+"""Общие утилиты бенчмарков: временная БД с тестовыми данными"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+
+def seed_database(products=2000, suppliers=20, shops_per_supplier=5, requests=3000, items_per_request=15):
+    """Создать app.db в текущей директории и наполнить ее тестовыми данными"""
+    from init_db import init_db
+    init_db()
+
+    random.seed(42)
+    conn = sqlite3.connect('app.db')
+    from werkzeug.security import generate_password_hash
+    password = generate_password_hash('secret1')
+
+    for i in range(1, suppliers + 1):
+        cursor = conn.execute(
+            "INSERT INTO users (email, password, role) VALUES (?, ?, 'supplier')",
+            (f'supplier{i}@example.com', password)
+        )
+        conn.execute('INSERT INTO suppliers (user_id, name) VALUES (?, ?)', (cursor.lastrowid, f'Торговый {i}'))
+        for j in range(shops_per_supplier):
+            conn.execute(
+                'INSERT INTO shops (supplier_id, name, business_type) VALUES (?, ?, ?)',
+                (i, f'Магазин {i}-{j}', 'ИП')
+            )
+
+    conn.executemany(
+        'INSERT INTO products (category_id, name, description, price, wholesale_price) VALUES (?, ?, ?, ?, ?)',
+        [(random.randint(1, 5), f'Товар {i}', f'Описание товара {i}', random.randint(100, 10000), None)
+         for i in range(products)]
+    )
+
+    shops_count = suppliers * shops_per_supplier
+    statuses = ['pending', 'processing', 'completed']
+    for request_id in range(1, requests + 1):
+        shop_id = random.randint(1, shops_count)
+        supplier_id = (shop_id - 1) // shops_per_supplier + 1
+        conn.execute(
+            'INSERT INTO requests (id, shop_id, supplier_id, status, created_at) VALUES (?, ?, ?, ?, ?)',
+            (request_id, shop_id, supplier_id, random.choice(statuses),
+             f'2026-{random.randint(1, 9):02d}-{random.randint(1, 28):02d} 12:00:00')
+        )
+        conn.executemany(
+            'INSERT INTO request_items (request_id, product_id, quantity) VALUES (?, ?, ?)',
+            [(request_id, product_id, random.randint(1, 50))
+             for product_id in random.sample(range(1, products + 1), items_per_request)]
+        )
+    conn.commit()
+    conn.close()
+
+
+def make_app(**seed_options):
+    """Создать приложение на временной БД с тестовыми данными"""
+    workdir = tempfile.mkdtemp(prefix='melochy-bench-')
+    os.chdir(workdir)
+    seed_database(**seed_options)
+
+    from app import create_app
+    app = create_app()
+    app.testing = True
+    return app
+
+
+def login(client, email='admin@example.com', password='admin123'):
+    response = client.post('/login', data={'email': email, 'password': password})
+    assert response.status_code == 302, 'login failed'
+    return client
+
+
+def timed(func, repeat):
+    """Среднее время вызова func в миллисекундах"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) * 1000 / repeat
@@ -27,9 +27,9 @@ check_status() {
 # Создаем бэкап базы данных
 log "Создание бэкапа базы данных..."
 mkdir -p $BACKUP_DIR
-DATE=$(date +%Y%m%d_%H%M%S)
 if [ -f "$PROJECT_DIR/app.db" ]; then
-    cp $PROJECT_DIR/app.db $BACKUP_DIR/app_backup_${DATE}.db
+    # Онлайн-копия через backup API (cp не копирует данные из app.db-wal)
+    (cd $PROJECT_DIR && FLASK_APP=wsgi.py BACKUP_DIR=$BACKUP_DIR venv/bin/flask backup-db --keep 30)
     check_status "Бэкап базы данных"
 fi
 
@@ -60,12 +60,28 @@ if [ -f "init_db.py" ]; then
     check_status "Обновление базы данных"
 fi
 
+# Тяжелые библиотеки (openpyxl, reportlab, msgpack) должны импортироваться
+# внутри функций, а не при старте каждого воркера
+log "Проверка импортов при старте..."
+python benchmarks/bench_startup.py --imports-only
+check_status "Проверка импортов при старте"
+
 # Собираем статические файлы (если нужно)
 log "Проверка статических файлов..."
 if [ ! -d "app/static" ]; then
     mkdir -p app/static
 fi
 
+# Сборка статики: бандлы с хешами в именах и сжатые копии для nginx
+log "Сборка статических файлов..."
+FLASK_APP=wsgi.py flask build-assets
+check_status "Сборка статических файлов"
+
+# Предкомпиляция шаблонов в общий кеш байткода
+log "Предкомпиляция шаблонов..."
+FLASK_APP=wsgi.py flask precompile-templates --clear
+check_status "Предкомпиляция шаблонов"
+
 # Устанавливаем правильные права доступа
 log "Установка прав доступа..."
 sudo chown -R www-data:www-data $PROJECT_DIR
@@ -0,0 +1,58 @@
+"""Конфигурация Gunicorn.
+
+По умолчанию воркеры gthread: несколько потоков в каждом процессе,
+поэтому долгие выгрузки, импорт и потоки SSE не занимают воркер целиком.
+Прежний режим (синхронные воркеры) - GUNICORN_WORKER_CLASS=sync.
+
+С GUNICORN_PRELOAD=1 приложение создается один раз в мастер-процессе
+до fork: воркеры стартуют сразу и делят память страниц с мастером.
+Подключения к БД, пулы потоков и фоновые потоки создаются лениво и
+привязаны к PID процесса, поэтому после fork каждый воркер открывает
+свои. Новый код при preload подхватывается только полным перезапуском
+(supervisorctl restart), HUP перезапускает воркеры со старым кодом.
+
+Запуск: gunicorn -c gunicorn.conf.py wsgi:application
+"""
+import gc
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:5000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('GUNICORN_WORKERS', '3'))
+# Gunicorn сам переключает sync на gthread при threads > 1, поэтому потоки - только для gthread
+threads = int(os.environ.get('GUNICORN_THREADS', '8')) if worker_class == 'gthread' else 1
+
+# Для gthread таймаут считается по активности процесса, а не отдельного
+# запроса: долгий поток SSE или выгрузка не приводят к перезапуску воркера
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 2
+
+max_requests = 1000
+max_requests_jitter = 100
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def when_ready(server):
+    if preload_app:
+        # Объекты приложения не двигает сборщик мусора: страницы мастера не копируются в воркерах
+        gc.freeze()
+
+
+def pre_request(worker, req):
+    # Перезапуск по max_requests откладывается, пока в воркере идут фоновые задачи (импорт
+    # каталога): их потоки завершаются вместе с процессом. POST может сам запустить задачу,
+    # поэтому воркер перезапускается только на другом запросе
+    if worker.nr + 1 >= worker.max_requests and getattr(worker, 'wsgi', None) is not None:
+        from app.jobs import running_jobs
+        if req.method == 'POST' or running_jobs():
+            worker.max_requests = worker.nr + 2
+
+
+def worker_exit(server, worker):
+    # Воркеры перезапускаются каждые ~1000 запросов: обновляем статистику планировщика SQLite
+    app = getattr(worker, 'wsgi', None)
+    if app is not None:
+        from app.planner import optimize_database
+        optimize_database(app)
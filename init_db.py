@@ -2,10 +2,13 @@ import os
 import sqlite3
 from datetime import datetime
 from werkzeug.security import generate_password_hash
+from app.schema import upgrade_database
 
 def init_db():
     """Инициализация базы данных"""
     if os.path.exists('app.db'):
+        # Существующая БД: только применяем изменения схемы
+        upgrade_database('app.db')
         return
     
     conn = sqlite3.connect('app.db')
@@ -189,6 +192,7 @@ def init_db():
     
     conn.commit()
     conn.close()
+    upgrade_database('app.db')
     print("База данных инициализирована успешно!")
 
 if __name__ == '__main__':